@@ -0,0 +1,149 @@
+"""
+===================================
+HASH ALIGNMENT
+===================================
+hash_alignment.py
+
+Aligns two sequences of perceptual hashes (per-frame dHashes or per-second
+audio fingerprints) so the parts a new release shares with an old one, or
+an episode with the segment library, can be reused instead of encoded or
+transcribed again.
+"""
+
+DIFF_FRAME_DISTANCE = 4          # dHash bits two frames may differ by and still match (re-encode noise)
+DIFF_FRAME_MIN_RUN = 12          # Consecutive matching frames needed to anchor a new matched run
+DIFF_MAX_CANDIDATES = 32         # Re-anchor candidates checked per frame, nearest the expected position first
+DIFF_MAX_BUCKET = 64             # Band index entries shared by more positions than this are not used as anchors
+DIFF_MIN_COPY_FRAMES = 24        # Shorter reusable spans are re-encoded instead of spliced
+
+
+def hash_distances(a, b):
+    """Per-element Hamming distance between two equal-length uint64 hash arrays."""
+    import numpy as np
+    
+    diff = np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64))
+    return np.unpackbits(diff.view(np.uint8)).reshape(len(diff), 64).sum(axis=1)
+
+
+def align_hashes(old, new, max_distance, min_run):
+    """
+    Find the runs of `new` that repeat runs of `old`, tolerating hash noise.
+    
+    Two entries match when their Hamming distance is at most max_distance.
+    A matched run is extended for as long as both sequences keep matching;
+    after a mismatch the next anchor must match for min_run consecutive
+    entries. Candidate anchors come from a banded index (two hashes within
+    3 bits always share one quarter of their bits exactly, looser matches
+    nearly always do) and the ones nearest the expected position are tried first, so repeated
+    content (black frames, silence) does not pull the alignment around.
+    Low-entropy hashes (almost all bits equal) only anchor at the expected
+    position and index buckets holding more than DIFF_MAX_BUCKET positions
+    are skipped, which keeps the scan linear; a new run is extended
+    backwards from its anchor so it still covers the black or static frames
+    in front of it.
+    
+    Returns:
+        List of (new_start, new_end, old_start) runs, ordered by new_start
+    """
+    import heapq
+    
+    old = [int(v) for v in old]
+    new = [int(v) for v in new]
+    bits = max(max(old, default=0), max(new, default=0)).bit_length()
+    band_bits = max((bits + 3) // 4, 1)
+    mask = (1 << band_bits) - 1
+    
+    def informative(value):
+        ones = bin(value).count("1")
+        return bits // 8 < ones < bits - bits // 8
+    
+    index = [{} for _ in range(4)]
+    for position, value in enumerate(old):
+        if informative(value):
+            for band in range(4):
+                index[band].setdefault((value >> (band * band_bits)) & mask, []).append(position)
+    index = [{key: positions for key, positions in band.items() if len(positions) <= DIFF_MAX_BUCKET}
+             for band in index]
+    
+    def close(i, j):
+        return bin(old[i] ^ new[j]).count("1") <= max_distance
+    
+    runs = []
+    expected = 0
+    j = 0
+    while j < len(new):
+        if runs and runs[-1][1] == j:
+            i = runs[-1][2] + j - runs[-1][0]
+            if i < len(old) and close(i, j):
+                runs[-1][1] = j + 1
+                j += 1
+                continue
+            expected = i
+        
+        candidates = set()
+        if informative(new[j]):
+            for band in range(4):
+                candidates.update(index[band].get((new[j] >> (band * band_bits)) & mask, ()))
+        elif expected < len(old):
+            candidates.add(expected)   # Black or static footage only anchors in place
+        anchor = None
+        for i in heapq.nsmallest(DIFF_MAX_CANDIDATES, candidates, key=lambda p: abs(p - expected)):
+            length = 0
+            while (length < min_run and i + length < len(old) and j + length < len(new)
+                   and close(i + length, j + length)):
+                length += 1
+            if length == min_run or (length and j + length == len(new)):
+                anchor = i
+                break
+        
+        if anchor is None:
+            expected += 1
+        else:
+            back = 0
+            floor = runs[-1][1] if runs else 0
+            while j - back > floor and anchor - back > 0 and close(anchor - back - 1, j - back - 1):
+                back += 1
+            runs.append([j - back, j + 1, anchor - back])
+        j += 1
+    return [tuple(run) for run in runs]
+
+
+def plan_video_splice(runs, keyframes, new_frames, old_frames):
+    """
+    Turn aligned frame runs into an ordered list of output segments.
+    
+    Inside each matched run the v1 output is reused between the first and
+    last keyframes the run contains (the v1 end of stream counts as one);
+    the frames before and after those keyframes, and every unmatched range,
+    are encoded from the new source.
+    
+    Returns:
+        List of ('copy', old_first_frame, frame_count) and
+        ('encode', new_first_frame, frame_count) tuples in output order
+    """
+    import bisect
+    
+    positions = sorted(index for index, _ in keyframes) + [old_frames]
+    segments = []
+    
+    def add_encode(first, end):
+        if end <= first:
+            return
+        if segments and segments[-1][0] == "encode" and sum(segments[-1][1:]) == first:
+            segments[-1] = ("encode", segments[-1][1], end - segments[-1][1])
+        else:
+            segments.append(("encode", first, end - first))
+    
+    cursor = 0
+    for new_start, new_end, old_start in runs:
+        old_end = old_start + new_end - new_start
+        k = bisect.bisect_left(positions, old_start)
+        copy_start = positions[k] if k < len(positions) else old_frames
+        copy_end = positions[bisect.bisect_right(positions, old_end) - 1]
+        if copy_end - copy_start < DIFF_MIN_COPY_FRAMES:
+            continue  # Left for the next add_encode() to cover
+        add_encode(cursor, new_start + copy_start - old_start)
+        segments.append(("copy", copy_start, copy_end - copy_start))
+        cursor = new_start + copy_end - old_start
+    add_encode(cursor, new_frames)
+    return segments
@@ -0,0 +1,369 @@
+"""
+===================================
+PERSISTENT JOB QUEUE
+===================================
+job_queue.py
+
+One JSON file per job, moved between pending/, running/, done/ and failed/
+with atomic renames, so the queue survives restarts and crashes and can
+live on a share used by several machines. A running job's file mtime is
+its lease: the owner touches it every heartbeat, and any worker may put
+a job whose lease expired (dead worker) back in pending/.
+
+A job scope tracks the stage processes a worker thread launches for its
+job (main_app's launcher registers them), so a worker that loses its
+lease can stop them.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from storage import write_json_atomic
+
+QUEUE_STATES = ('pending', 'running', 'done', 'failed')
+QUEUE_LEASE_SECONDS = 180        # A running job without a heartbeat this long is reclaimed
+QUEUE_HEARTBEAT_SECONDS = 30
+QUEUE_POLL_SECONDS = 10          # Idle workers check for new jobs this often
+
+_STAGE_JOB = threading.local()
+# Held while a stage process is reaped or signalled, so run_stage_command's
+# os.wait4() and a cancelling heartbeat never race on the same child
+STAGE_REAP_LOCK = threading.Lock()
+
+
+@contextmanager
+def job_scope():
+    """
+    Track the stage processes this thread launches for one queue job.
+    
+    cancel_job_scope() kills them and makes later launches and publishes in
+    the scope fail, so a worker that lost its lease stops the job.
+    """
+    scope = {"procs": [], "cancelled": threading.Event(), "reason": None, "lock": threading.Lock()}
+    _STAGE_JOB.scope = scope
+    try:
+        yield scope
+    finally:
+        _STAGE_JOB.scope = None
+
+
+def current_job_scope():
+    """The job scope of the calling thread, or None."""
+    return getattr(_STAGE_JOB, "scope", None)
+
+
+def cancel_job_scope(scope, reason):
+    """Stop a job: kill its running stage processes and refuse new ones."""
+    with scope["lock"]:
+        scope["reason"] = reason
+        scope["cancelled"].set()
+        procs = list(scope["procs"])
+    for proc in procs:
+        with STAGE_REAP_LOCK:
+            if proc.poll() is None:
+                proc.kill()
+
+
+def queue_open(queue_dir):
+    """Create the queue folders if needed and return queue_dir."""
+    for state in QUEUE_STATES:
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+    return queue_dir
+
+
+def _queue_path(queue_dir, state, job_id):
+    return os.path.join(queue_dir, state, f"{job_id}.json")
+
+
+def queue_worker_name():
+    """Identify this worker process in job leases."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def queue_server_time(queue_dir):
+    """
+    Current time as seen by the queue's file system.
+    
+    Leases are compared against file mtimes set by the file server, so use
+    its clock rather than this machine's to tolerate clock skew between nodes.
+    """
+    clock = os.path.join(queue_dir, ".clock")
+    with open(clock, "a"):
+        pass
+    os.utime(clock)
+    return os.stat(clock).st_mtime
+
+
+def queue_job_id(rel_path, path):
+    """Stable job id for a file version, identical on every node (relative path + size + mtime)."""
+    import hashlib
+    stat = os.stat(path)
+    key = f"{rel_path}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def queue_enqueue(queue_dir, path, root):
+    """
+    Add a file to the queue unless this version of it is already known.
+    
+    The job stores the path relative to `root`, so nodes that mount the
+    share at different locations resolve it against their own folder.
+    
+    Returns:
+        True if a new job was created
+    """
+    import uuid
+    
+    rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+    job_id = queue_job_id(rel_path, path)
+    if any(os.path.exists(_queue_path(queue_dir, state, job_id)) for state in QUEUE_STATES):
+        return False
+    pending_path = _queue_path(queue_dir, 'pending', job_id)
+    token = uuid.uuid4().hex
+    tmp = f"{pending_path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"id": job_id, "rel_path": rel_path, "enqueued_at": time.time(),
+                   "attempts": 0, "enqueue_token": token}, f, indent=2)
+    if not _publish_no_clobber(tmp, pending_path):
+        return False
+    
+    # A reclaim may have moved the job out of running/ while we checked; if
+    # another copy exists, take ours back with the same rename-based claim
+    # queue_claim uses, so a job that is already known is never overwritten.
+    if any(os.path.exists(_queue_path(queue_dir, state, job_id)) for state in ('running', 'done', 'failed')):
+        claimed = f"{pending_path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.withdraw"
+        try:
+            os.replace(pending_path, claimed)
+        except FileNotFoundError:
+            return False  # Already claimed by a worker
+        with open(claimed, encoding="utf-8") as f:
+            ours = json.load(f).get("enqueue_token") == token
+        if ours or not _publish_no_clobber(claimed, pending_path):
+            if os.path.exists(claimed):
+                os.remove(claimed)
+        return False
+    return True
+
+
+def _publish_no_clobber(tmp, path):
+    """Rename tmp to path unless path exists (atomically); False if it did."""
+    try:
+        if os.name == 'nt':
+            os.rename(tmp, path)   # Never replaces on Windows
+        else:
+            os.link(tmp, path)     # Fails if path exists, unlike rename
+            os.remove(tmp)
+        return True
+    except FileExistsError:
+        os.remove(tmp)
+        return False
+
+
+def resolve_job_path(job, roots):
+    """Find a job's input under this node's folders, or None."""
+    for root in roots:
+        path = os.path.join(root, *job["rel_path"].split('/'))
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def queue_claim(queue_dir):
+    """
+    Atomically move the oldest pending job to running/ and take its lease.
+    
+    The pending file is touched before the rename so the job arrives in
+    running/ with a fresh lease; only one worker's rename can succeed.
+    
+    Returns:
+        Job dict, or None if the queue is empty
+    """
+    pending_dir = os.path.join(queue_dir, 'pending')
+    entries = []
+    for entry in os.scandir(pending_dir):
+        if entry.name.endswith('.json'):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path, entry.name))
+            except FileNotFoundError:
+                continue
+    
+    for _, pending_path, name in sorted(entries):
+        running_path = os.path.join(queue_dir, 'running', name)
+        try:
+            os.utime(pending_path)
+            os.replace(pending_path, running_path)
+            with open(running_path, encoding="utf-8") as f:
+                job = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue  # Claimed by another worker
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["worker"] = queue_worker_name()
+        job["lease"] = f"{job['worker']}:{threading.get_ident()}:{time.time()}"
+        job["started_at"] = time.time()
+        write_json_atomic(running_path, job)
+        return job
+    return None
+
+
+def queue_holds_lease(queue_dir, job):
+    """True while running/ still holds this claim of the job (not a reclaimed or re-claimed copy)."""
+    try:
+        with open(_queue_path(queue_dir, 'running', job["id"]), encoding="utf-8") as f:
+            return json.load(f).get("lease") == job.get("lease")
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        return True   # Being rewritten by a rename right now; check again next beat
+
+
+def start_lease_heartbeat(queue_dir, job, scope=None):
+    """
+    Keep a running job's lease alive from a background thread.
+    
+    If the lease is lost (expired and reclaimed by another worker), the
+    job's scope is cancelled so its stage processes stop.
+    
+    Returns:
+        threading.Event - set it to stop the heartbeat
+    """
+    stop = threading.Event()
+    running_path = _queue_path(queue_dir, 'running', job["id"])
+    
+    def beat():
+        while not stop.wait(QUEUE_HEARTBEAT_SECONDS):
+            try:
+                if not queue_holds_lease(queue_dir, job):
+                    raise FileNotFoundError(running_path)
+                os.utime(running_path)
+            except FileNotFoundError:
+                print(f"⚠️  Lease lost for {job['rel_path']} (reclaimed by another worker), stopping it")
+                if scope:
+                    cancel_job_scope(scope, f"Lease lost for {job['rel_path']}")
+                return
+    
+    threading.Thread(target=beat, daemon=True).start()
+    return stop
+
+
+def _queue_lease(path):
+    """Lease recorded in a job file, or None if it is missing or being rewritten."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("lease")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def queue_finish(queue_dir, job, ok, output=None, error=None):
+    """
+    Record the result of a job and move it to done/ or failed/.
+    
+    Only the lease holder may finish a job. The job file (in running/, or
+    in pending/ if it was reclaimed but not claimed again) must still carry
+    our lease; it is then taken with an atomic rename and checked once more
+    before the result is written, so a worker whose job was re-claimed
+    never overwrites the new owner's state.
+    
+    Returns:
+        True if the result was recorded, False if it was dropped
+    """
+    job.update({"finished_at": time.time(), "output": output, "error": error})
+    target = _queue_path(queue_dir, 'done' if ok else 'failed', job["id"])
+    finishing = (f"{_queue_path(queue_dir, 'running', job['id'])}."
+                 f"{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.finish")
+    for state in ('running', 'pending'):
+        source = _queue_path(queue_dir, state, job["id"])
+        if _queue_lease(source) != job.get("lease"):
+            continue
+        try:
+            os.replace(source, finishing)
+        except FileNotFoundError:
+            continue
+        if _queue_lease(finishing) != job.get("lease"):
+            os.replace(finishing, source)   # Re-claimed between the check and the rename
+            return False
+        write_json_atomic(finishing, job)
+        os.replace(finishing, target)
+        return True
+    return False
+
+
+def queue_reclaim_expired(queue_dir, lease_seconds=QUEUE_LEASE_SECONDS):
+    """Put running jobs whose lease expired (dead or stopped workers) back in pending/."""
+    now = queue_server_time(queue_dir)
+    reclaimed = 0
+    for entry in os.scandir(os.path.join(queue_dir, 'running')):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            if now - entry.stat().st_mtime < lease_seconds:
+                continue
+            os.replace(entry.path, os.path.join(queue_dir, 'pending', entry.name))
+            reclaimed += 1
+        except FileNotFoundError:
+            continue  # Finished or reclaimed by someone else
+    return reclaimed
+
+
+def queue_counts(queue_dir):
+    """Number of jobs in each state."""
+    return {
+        state: sum(1 for e in os.scandir(os.path.join(queue_dir, state)) if e.name.endswith('.json'))
+        for state in QUEUE_STATES
+    }
+
+
+def queue_worker_loop(queue_dir, roots, process, stop_event, worker_id, exit_when_empty=False):
+    """
+    Claim and run jobs until stopped (or until the queue drains).
+    
+    Args:
+        process: Callable(input_path) -> output path, raising on failure
+    
+    Returns:
+        Number of jobs this worker completed
+    """
+    done = 0
+    while not stop_event.is_set():
+        queue_reclaim_expired(queue_dir)
+        job = queue_claim(queue_dir)
+        if job is None:
+            counts = queue_counts(queue_dir)
+            if exit_when_empty and counts["pending"] == 0 and counts["running"] == 0:
+                break
+            stop_event.wait(QUEUE_POLL_SECONDS)
+            continue
+        
+        input_file = resolve_job_path(job, roots)
+        print(f"\n[worker {worker_id}] ▶️  {job['rel_path']} (attempt {job['attempts']})")
+        if input_file is None:
+            queue_finish(queue_dir, job, False, error="Input not found on this node")
+            continue
+        
+        with job_scope() as scope:
+            heartbeat = start_lease_heartbeat(queue_dir, job, scope)
+            try:
+                output = process(input_file)
+                if not queue_holds_lease(queue_dir, job):
+                    cancel_job_scope(scope, f"Lease lost for {job['rel_path']}")
+                if scope["cancelled"].is_set():
+                    raise RuntimeError(scope["reason"])
+                if queue_finish(queue_dir, job, True, output=output):
+                    done += 1
+                    print(f"[worker {worker_id}] ✅ {os.path.basename(output)}")
+                else:
+                    print(f"[worker {worker_id}] ⏹️  {job['rel_path']}: lease lost, result dropped")
+            except Exception as e:
+                if scope["cancelled"].is_set():
+                    # The job belongs to whoever reclaimed it; leave its queue entry alone
+                    print(f"[worker {worker_id}] ⏹️  {job['rel_path']}: {scope['reason']}")
+                else:
+                    queue_finish(queue_dir, job, False, error=str(e))
+                    print(f"[worker {worker_id}] ❌ {job['rel_path']}: {e}")
+            finally:
+                heartbeat.set()
+    return done
@@ -32,8 +32,30 @@ import subprocess
 import os
 import time
 import json
-from glob import glob
-from pathlib import Path
+import tempfile
+import threading
+import socket
+import fnmatch
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import chain, islice
+from queue import SimpleQueue
+
+from storage import get_cache_dir, write_json_atomic
+from job_queue import (
+    STAGE_REAP_LOCK, current_job_scope, queue_open, queue_worker_name, queue_enqueue,
+    queue_counts, queue_worker_loop,
+)
+from scheduler import (
+    HISTORY_LOCK, get_available_cores, encode_stage_key, record_stage_memory, make_scheduler,
+    reserved_resources,
+)
+from hash_alignment import DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN, align_hashes, plan_video_splice
+from segment_library import (
+    SEGMENT_MIN_SECONDS, segment_library_lock, save_library_array, load_segment_library,
+    segment_library_key, match_library_segments, find_shared_spans,
+)
 
 # Check if running in GUI mode (no CLI arguments)
 if len(sys.argv) == 1:
@@ -51,7 +73,130 @@ else:
 
 # ========== CONSTANTS ==========
 LOW_PRIORITY = 0x00004000  # Windows: BELOW_NORMAL_PRIORITY_CLASS
+LOW_PRIORITY_NICENESS = 10       # POSIX: nice increment for background stages
+LOW_PRIORITY_IO_CLASS = ('2', '7')  # Linux ionice: best-effort class, lowest level
+IDLE_PRIORITY = 0x00000040       # Windows: IDLE_PRIORITY_CLASS (archival tier)
+IDLE_PRIORITY_NICENESS = 19
+IDLE_PRIORITY_IO_CLASS = ('3', '0')  # Linux ionice: idle class
 SUPPORTED_VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv']
+# Files this pipeline (and the scripts/) produce - never fed back in
+OUTPUT_SUFFIXES = ('_encoded', '_final', '_subbed', '_av1')
+FOLLOW_IDLE_SECONDS = 30         # Follow mode: a growing input has ended after this long without new data
+PROBE_LOOKAHEAD = 4              # Files probed in the background ahead of the pipeline
+
+# Watch-folder daemon
+WATCH_SETTLE_SECONDS = 30        # A file must stop growing this long before it is queued
+WATCH_POLL_SECONDS = 10          # Stability checks / polling fallback interval
+WATCH_RESCAN_SECONDS = 600       # Full rescan as a safety net when file events are used
+
+# Deadline planner: realtime factors (media seconds per wall second) assumed
+# until measured, and how much faster each SVT-AV1 preset step is.
+DEFAULT_ENCODE_SPEED = {'720': 3.0, '1080': 1.5, '1440': 0.9, 'source': 0.8}  # at preset 8
+DEFAULT_TRANSCRIBE_SPEED = {'cuda': 25.0, 'cpu': 4.0}
+PRESET_SPEED_STEP = 1.3
+PLANNER_FASTEST_PRESET = 12
+PLANNER_CALIBRATION_SECONDS = 20
+PLANNER_CALIBRATION_PRESET = 8
+
+# Pipeline profiler: clip length, and how much faster an alternative scaler
+# must be before it replaces lanczos.
+PROFILE_SAMPLE_SECONDS = 20
+PROFILE_SCALERS = ['lanczos', 'spline', 'bicubic']
+PROFILE_SCALER_MIN_GAIN = 1.15
+
+# Duplicate-frame decimation (anime drawn on twos/threes)
+DECIMATE_FILTER = "mpdecimate"   # Drops frames that barely differ from the last kept one
+
+# Source pre-analysis (telecine / interlace detection)
+ANALYSIS_SAMPLES = 8             # Clips spread over the file, analysed in parallel
+ANALYSIS_SAMPLE_SECONDS = 10
+TELECINE_FILTER = "fieldmatch,yadif=deint=interlaced,decimate"  # Inverse telecine back to 23.976
+DEINTERLACE_FILTER = "bwdif=mode=send_frame"
+FIELD_PROGRESSIVE_MAX_COMBED = 0.05   # Share of combed frames below which a source is progressive
+FIELD_INTERLACED_MIN_COMBED = 0.75    # Above this (without repeated fields) it is true interlaced
+FIELD_TELECINE_MIN_REPEATED = 0.15    # Repeated-field share typical of 3:2 pulldown (~40%)
+
+# Letterbox/pillarbox crop detection
+CROP_DETECT_FILTER = "cropdetect=limit=24:round=2:skip=0:reset=0"
+CROP_SAFETY_PIXELS = 4           # Kept on each cropped side so soft bar edges are never cut
+CROP_MIN_SAVING = 0.02           # Ignore crops that save less than this share of pixels
+
+# Frame statistics index: one decode, per-frame columns shared by the analyses
+FRAME_STATS_VERSION = 1
+FRAME_STATS_WIDTH = 320          # Analysis frames keep the source height (field lines stay intact)
+FRAME_STATS_CHUNK = 32           # Frames processed per NumPy batch
+FRAME_STATS_BLACK_LEVEL = 24     # Rows/columns whose brightest pixel is below this are border
+FRAME_STATS_COMB_THRESHOLD = 12  # A pixel is combed when both neighbouring lines differ this much the same way
+FRAME_STATS_COMBED_SHARE = 0.01  # A frame is combed when this share of its pixels is combed
+FRAME_STATS_MOTION = 0.5         # Mean frame difference below which a frame counts as static
+FRAME_STATS_REPEATED_FIELD = 0.25  # A field is repeated when it changed less than this share of the other
+
+# Native-resolution detection (TV anime is often drawn at 720p-900p and upscaled)
+NATIVE_CANDIDATE_HEIGHTS = [540, 576, 600, 630, 648, 675, 684, 702, 714, 720, 729, 756, 768, 780,
+                            806, 810, 837, 844, 846, 855, 864, 873, 878, 900, 918, 936, 945, 960, 972, 990]
+NATIVE_KERNELS = {               # Production upscalers: (B, C) bicubic, or None = bilinear
+    "bicubic": (1 / 3, 1 / 3),
+    "bilinear": None,
+}
+NATIVE_COLUMNS = 96              # Columns analysed per sampled frame (the rescale check is vertical)
+NATIVE_MAX_ERROR_RATIO = 0.6     # Rescale error must dip below this share of its neighbours'
+NATIVE_MAX_HIGH_FREQUENCY = 0.02  # Max spectral energy share above the native height's Nyquist
+
+# Streaming transcription: ffmpeg decodes 16 kHz mono PCM into a pipe and
+# Whisper is fed fixed-size windows, so memory stays flat for 2-hour movies.
+PCM_SAMPLE_RATE = 16000
+STREAM_WINDOW_SECONDS = 120      # Audio fed to the model per call
+STREAM_CUT_SEARCH_SECONDS = 5    # Look for a quiet cut point near the window end
+STREAM_CUT_FRAME_MS = 50         # Energy frame size used to find that cut point
+STDERR_TAIL_LINES = 20           # ffmpeg error lines kept from streaming decodes
+STREAM_END_TOLERANCE_SECONDS = 1.0  # A failed decode this close to the end still counts as complete
+
+# Cascade transcription: segments from the fast draft model that look
+# unreliable are re-decoded by the larger model (thresholds follow Whisper's).
+CASCADE_LOGPROB_THRESHOLD = -1.0
+CASCADE_COMPRESSION_THRESHOLD = 2.4
+CASCADE_NO_SPEECH_RANGE = (0.3, 0.8)   # Neither clearly speech nor clearly silence
+CASCADE_SPAN_PADDING = 0.5             # Seconds of context around re-decoded spans
+CASCADE_MERGE_GAP = 2.0                # Merge flagged segments closer than this
+
+# Subtitle languages: Whisper/ISO 639-1 code -> (ISO 639-2 code for MKV, display name)
+SUBTITLE_LANGUAGES = {
+    'ja': ('jpn', 'Japanese'),
+    'en': ('eng', 'English'),
+    'es': ('spa', 'Spanish'),
+    'pt': ('por', 'Portuguese'),
+    'fr': ('fra', 'French'),
+    'de': ('deu', 'German'),
+    'it': ('ita', 'Italian'),
+    'ru': ('rus', 'Russian'),
+    'ko': ('kor', 'Korean'),
+    'zh': ('zho', 'Chinese'),
+}
+
+# CPU transcription pool: calibration transcribes a short clip with several
+# workers x threads splits and keeps the one with the best aggregate speed.
+CALIBRATION_SAMPLE_SECONDS = 60
+
+# Live subtitles: a reader thread buffers the decoded audio; each pass takes
+# everything that arrived (at least one step) and re-recognises a sliding
+# window; cues ending this long before the live edge are final.
+LIVE_STEP_SECONDS = 1.0
+LIVE_WINDOW_SECONDS = 15
+LIVE_COMMIT_LAG_SECONDS = 1.5
+LIVE_BUFFER_SECONDS = 60
+LIVE_READ_BYTES = 6400
+LIVE_BENCHMARK_SECONDS = 60
+MIN_THREADS_PER_WORKER = 2
+
+# Proxy-first delivery: the proxy tier is scheduled ahead of archival encodes
+PROXY_PRIORITY = 0
+ARCHIVAL_PRIORITY = 1
+
+# Differential re-processing (v2 releases)
+DIFF_AUDIO_WINDOW_SECONDS = 1.0  # Audio fingerprint resolution
+DIFF_AUDIO_BAND_RANGE = (150, 4000)
+DIFF_AUDIO_DISTANCE = 6          # Of 32 fingerprint bits
+DIFF_AUDIO_MIN_RUN = 3
 
 # ========== HELPER FUNCTIONS ==========
 
@@ -97,6 +242,9 @@ def get_ffprobe_path():
 
 def get_duration(file):
     """Uses ffprobe to extract the total video duration in seconds."""
+    if _PROBE_CACHE.get(file):
+        return _PROBE_CACHE[file]["duration"]
+    
     ffprobe_path = get_ffprobe_path()
     cmd = [
         ffprobe_path, "-v", "error",
@@ -105,239 +253,4100 @@ def get_duration(file):
         file
     ]
     try:
-        return float(subprocess.check_output(cmd).decode().strip())
+        return float(run_stage_capture(cmd, check=True).stdout.decode().strip())
     except:
         return 0
 
 
+def partial_output_path(output_file):
+    """
+    Temporary name a stage writes to before publishing (keeps the container extension).
+    
+    The name carries this host and process, so two workers that briefly
+    hold the same job (an expired lease) never write into the same file.
+    """
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.{socket.gethostname()}-{os.getpid()}.partial{ext}"
+
+
+def publish_output(partial_file, output_file, returncode):
+    """
+    Atomically move a finished stage output into place.
+    
+    Readers (other nodes, media servers, the next stage) never see a
+    half-written file under the final name.
+    
+    Raises:
+        RuntimeError: If the stage failed; the partial file is removed
+    """
+    scope = current_job_scope()
+    if returncode != 0 or not os.path.exists(partial_file) or (scope and scope["cancelled"].is_set()):
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+        if scope and scope["cancelled"].is_set():
+            raise RuntimeError(f"{scope['reason']}; not publishing {os.path.basename(output_file)}")
+        raise RuntimeError(f"ffmpeg failed (exit code {returncode}) writing {os.path.basename(output_file)}")
+    os.replace(partial_file, output_file)
+
+
+def follow_input_options(idle_seconds):
+    """
+    ffmpeg input options that read a still-growing file like `tail -f`.
+    
+    The file protocol keeps retrying at end of file (-follow 1) and the
+    input counts as finished once no new data has arrived for idle_seconds
+    (-rw_timeout), after which ffmpeg finalizes its outputs normally.
+    """
+    if not idle_seconds:
+        return []
+    return ["-follow", "1", "-rw_timeout", str(int(idle_seconds * 1_000_000))]
+
+
 def get_video_files_from_folder(folder_path):
-    """Get all video files from a folder."""
-    video_files = []
-    for ext in SUPPORTED_VIDEO_EXTENSIONS:
-        video_files.extend(glob(os.path.join(folder_path, f"*{ext}")))
-    return sorted(video_files)
+    """Get all video files from a folder (non-recursive)."""
+    return sorted(scan_video_files(folder_path, recursive=False))
 
 
-# ========== STAGE 1: VIDEO ENCODING ==========
+# ========== LIBRARY SCANNER ==========
+
+_PROBE_CACHE = {}
+
+
+def is_pipeline_output(file):
+    """Return True for files this pipeline produced (e.g. *_encoded.mkv, *_final.mkv)."""
+    stem = os.path.splitext(os.path.basename(file))[0]
+    return stem.endswith(OUTPUT_SUFFIXES) or stem.endswith('.partial')
 
-def encode_video(input_file, output_file, resolution, preset, crf=30):
+
+def scan_video_files(folder_path, recursive=True, include=None, exclude=None):
     """
-    Encode video using SVT-AV1 with low priority.
+    Walk a media library with os.scandir and yield video files as they are found.
+    
+    Extensions match case-insensitively (.MKV), hidden folders and pipeline
+    outputs are skipped, and each folder is visited in sorted order so
+    seasons come out in episode order. Nothing is collected up front, so the
+    first file is available immediately even in huge trees.
     
     Args:
-        input_file: Path to input video
-        output_file: Path to output video
-        resolution: Target resolution (source, 1440, 1080, 720)
-        preset: SVT-AV1 preset (0-13, lower=slower/better)
-        crf: Constant Rate Factor (0-63, lower=better quality)
+        folder_path: Root folder
+        recursive: Descend into sub-folders
+        include: Optional glob patterns; a file must match one (name or relative path)
+        exclude: Optional glob patterns; matching files and folders are skipped
+    
+    Yields:
+        Paths of video files
     """
-    ffmpeg_path = get_ffmpeg_path()
+    extensions = tuple(SUPPORTED_VIDEO_EXTENSIONS)
+    include = [p.lower() for p in include or []]
+    exclude = [p.lower() for p in exclude or []]
     
-    print(f"\n{'='*60}")
-    print(f"▶️  [STAGE 1/3] Encoding Video: {os.path.basename(input_file)}")
-    print(f"{'='*60}")
-    print(f"Resolution: {resolution}p | Preset: {preset} | CRF: {crf}\n")
+    def matches(patterns, entry):
+        rel = os.path.relpath(entry.path, folder_path).replace(os.sep, '/').lower()
+        name = entry.name.lower()
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in patterns)
     
-    # Build scaling filter
-    if resolution == "source":
-        scale = "null"
-    else:
-        scale = f"scale=-2:{resolution}:flags=lanczos"
+    pending = [folder_path]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name.lower())
+        except OSError as e:
+            print(f"⚠️  Cannot read folder {directory}: {e}")
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith('.') or matches(exclude, entry):
+                continue
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                    continue
+            except OSError:
+                continue
+            if not entry.name.lower().endswith(extensions) or is_pipeline_output(entry.name):
+                continue
+            if include and not matches(include, entry):
+                continue
+            yield entry.path
+        
+        if recursive:
+            pending.extend(reversed(subdirs))
+
+
+def probe_video(file):
+    """
+    Probe a video with ffprobe (memoized).
+    
+    Returns:
+        Dict with duration, width, height, fps, codec and size, or None if unreadable
+    """
+    if file in _PROBE_CACHE:
+        return _PROBE_CACHE[file]
     
-    # Build encoding command
     cmd = [
-        ffmpeg_path, "-i", input_file,
-        "-vf", scale,
-        "-c:v", "libsvtav1",
-        "-preset", str(preset),
-        "-crf", str(crf),
-        "-svtav1-params", "tune=0:enable-overlays=1:lookahead=120",
-        "-c:a", "libopus",
-        "-b:a", "128k",
-        "-metadata", f"comment=Converted SVT-AV1 P{preset} CRF{crf}",
-        output_file
+        get_ffprobe_path(), "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "format=duration:stream=codec_name,width,height,avg_frame_rate",
+        "-of", "json",
+        file
     ]
+    info = None
+    try:
+        data = json.loads(run_stage_capture(cmd, check=True).stdout.decode())
+        stream = data["streams"][0]
+        num, den = stream.get("avg_frame_rate", "0/1").split("/")
+        info = {
+            "duration": float(data["format"]["duration"]),
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "fps": float(num) / float(den) if float(den) else 0.0,
+            "codec": stream.get("codec_name"),
+            "size": os.path.getsize(file)
+        }
+    except Exception:
+        pass
+    _PROBE_CACHE[file] = info
+    return info
+
+
+def iter_probed_files(paths, lookahead=PROBE_LOOKAHEAD):
+    """
+    Probe files in the background as they are discovered.
     
-    # Execute with low priority
-    subprocess.run(cmd, creationflags=LOW_PRIORITY)
-    print(f"✅ Video encoding complete: {output_file}\n")
+    Keeps up to `lookahead` probes in flight ahead of the consumer and yields
+    each path once its probe is done (results land in the probe cache, so
+    get_duration()/probe_video() are free afterwards). Unreadable files are
+    skipped with a warning.
+    """
+    with ThreadPoolExecutor(max_workers=lookahead) as executor:
+        in_flight = deque()
+        paths = iter(paths)
+        while True:
+            while len(in_flight) < lookahead:
+                path = next(paths, None)
+                if path is None:
+                    break
+                in_flight.append((path, executor.submit(probe_video, path)))
+            if not in_flight:
+                return
+            path, future = in_flight.popleft()
+            if future.result() is None:
+                print(f"⚠️  Skipping unreadable video: {path}")
+                continue
+            yield path
 
 
-# ========== STAGE 2: AI SUBTITLE GENERATION ==========
+# ========== LOW-PRIORITY LAUNCHER ==========
 
-def generate_subtitles(input_file, device="cuda"):
+def format_core_list(cores):
+    """Core ids as a taskset list ('0-3,8')."""
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+
+def launch_stage_process(cmd, low_priority=True, cores=None, idle=False, **kwargs):
     """
-    Generate English subtitles from Japanese audio using Whisper.
+    Start a pipeline command, lowering its CPU/IO priority and pinning it to cores.
+    
+    Windows uses BELOW_NORMAL_PRIORITY_CLASS (and psutil for affinity when
+    installed). On Linux/macOS the command is wrapped in `nice`, plus
+    `ionice` and `taskset` where available; affinity falls back to
+    os.sched_setaffinity() on the new process.
     
     Args:
-        input_file: Path to video file
-        device: 'cuda' or 'cpu'
+        cmd: Command list
+        low_priority: Run below normal CPU and IO priority
+        cores: Optional list of logical core ids to restrict the process to
+        idle: Run at idle priority instead (only uses otherwise unused CPU/IO)
+        **kwargs: Passed to subprocess.Popen
     
     Returns:
-        Path to generated SRT file, or None if failed
+        subprocess.Popen
     """
-    print(f"\n{'='*60}")
-    print(f"▶️  [STAGE 2/3] Generating AI Subtitles")
-    print(f"{'='*60}")
-    print(f"Device: {device.upper()}\n")
+    pin_after_start = bool(cores)
+    low_priority = low_priority or idle
+    niceness = IDLE_PRIORITY_NICENESS if idle else LOW_PRIORITY_NICENESS
+    io_class = IDLE_PRIORITY_IO_CLASS if idle else LOW_PRIORITY_IO_CLASS
     
-    # Determine output SRT path
-    base_name = os.path.splitext(input_file)[0]
-    srt_file = f"{base_name}.srt"
+    if os.name == 'nt':
+        if low_priority:
+            kwargs["creationflags"] = kwargs.get("creationflags", 0) | (IDLE_PRIORITY if idle else LOW_PRIORITY)
+    else:
+        prefix = []
+        if low_priority and shutil.which("nice"):
+            prefix += ["nice", "-n", str(niceness)]
+        if low_priority and shutil.which("ionice"):
+            prefix += ["ionice", "-c", io_class[0], "-n", io_class[1]]
+        if cores and shutil.which("taskset"):
+            prefix += ["taskset", "-c", format_core_list(cores)]
+            pin_after_start = False
+        cmd = prefix + list(cmd)
     
-    # IMPORTANT: For Windows, VAD filter parameters must be escaped as JSON string
-    vad_params = json.dumps({"min_silence_duration_ms": 500})
+    scope = current_job_scope()
+    if scope and scope["cancelled"].is_set():
+        raise RuntimeError(scope["reason"])
+    proc = subprocess.Popen(cmd, **kwargs)
+    if scope:
+        with scope["lock"]:
+            # returncode, not poll(): reaping is left to whoever waits for the process
+            scope["procs"] = [p for p in scope["procs"] if p.returncode is None] + [proc]
+        if scope["cancelled"].is_set():
+            proc.kill()
     
-    # Build Whisper command
-    cmd = [
-        "whisper-ctranslate2",
-        input_file,
-        "--model", "small",
-        "--task", "translate",
-        "--language", "ja",
-        "--device", device,
-        "--vad_filter", "True",
-        "--vad_parameters", vad_params,  # Escaped JSON string
-        "--compute_type", "int8",
-        "--output_format", "srt",
-        "--output_dir", os.path.dirname(os.path.abspath(input_file))
-    ]
+    if pin_after_start:
+        try:
+            if hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(proc.pid, cores)
+            else:
+                import psutil
+                psutil.Process(proc.pid).cpu_affinity(list(cores))
+        except (ImportError, OSError):
+            pass  # Affinity is an optimisation; run unpinned
+        except Exception as e:
+            print(f"⚠️  Could not pin process to cores {format_core_list(cores)}: {e}")
+    return proc
+
+
+# ========== STAGE COMMANDS ==========
+
+def run_stage_command(cmd, stage_key=None, low_priority=True, cores=None, idle=False, **kwargs):
+    """
+    Run a stage's external command and measure its peak memory.
     
-    # Execute subtitle generation
-    result = subprocess.run(cmd, creationflags=LOW_PRIORITY)
+    The command is started through launch_stage_process() (low priority,
+    optional core pinning). On Linux and the BSDs the child's peak RSS comes from os.wait4(); elsewhere
+    psutil is sampled if installed. Measurements are stored under stage_key for
+    the scheduler. The exit is awaited without reaping (os.waitid with
+    WNOWAIT) and the child reaped under STAGE_REAP_LOCK, so a job
+    cancellation never signals a PID that was already reaped.
     
-    if result.returncode == 0 and os.path.exists(srt_file):
-        print(f"✅ Subtitles generated: {srt_file}\n")
-        return srt_file
+    Returns:
+        subprocess.CompletedProcess (returncode only)
+    """
+    proc = launch_stage_process(cmd, low_priority, cores, idle, **kwargs)
+    peak_mb = None
+    
+    if hasattr(os, 'wait4') and hasattr(os, 'waitid'):
+        try:
+            os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            pass                          # Already reaped by a cancellation
+        with STAGE_REAP_LOCK:
+            if proc.returncode is None:
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') \
+                    else (status >> 8 if status & 0xff == 0 else -(status & 0x7f))
+                peak_mb = usage.ru_maxrss / 1024  # KB (os.waitid is not available on macOS)
     else:
-        print(f"⚠️  Subtitle generation failed or file not found.\n")
-        return None
+        try:
+            import psutil
+            process = psutil.Process(proc.pid)
+            peak = 0
+            while proc.poll() is None:
+                try:
+                    peak = max(peak, process.memory_info().rss)
+                except psutil.Error:
+                    break
+                time.sleep(1)
+            peak_mb = peak / (1024 * 1024) or None
+        except ImportError:
+            pass
+        proc.wait()
+    
+    if stage_key and peak_mb and proc.returncode == 0:
+        record_stage_memory(stage_key, peak_mb)
+    return subprocess.CompletedProcess(cmd, proc.returncode)
 
 
-# ========== STAGE 3: MUXING ==========
+def run_stage_capture(cmd, low_priority=True, cores=None, idle=False, check=False, text=False,
+                      stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs):
+    """
+    subprocess.run() for short probes and analysis passes, via launch_stage_process().
+    
+    Output is captured (stdout and stderr by default), so ffprobe calls,
+    sample decodes and benchmarks get the same priority, core placement and
+    job cancellation as the stages they serve.
+    
+    Returns:
+        subprocess.CompletedProcess with stdout/stderr
+    """
+    proc = launch_stage_process(cmd, low_priority, cores, idle, stdout=stdout, stderr=stderr,
+                                text=text, **kwargs)
+    out, err = proc.communicate()
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, out, err)
+    return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
 
-def mux_subtitles(video_file, srt_file, output_file):
+
+def drain_stderr(proc, max_lines=STDERR_TAIL_LINES):
     """
-    Mux SRT subtitles into MKV container.
+    Read a streaming child's stderr in a background thread, keeping its last lines.
+    
+    Callers that read a large stdout stream would otherwise only read stderr
+    at EOF; a child that fills the stderr pipe first (a damaged source) then
+    blocks on it while the caller blocks on stdout.
+    
+    Returns:
+        Function that waits for the reader (call it after the child exited)
+        and returns the kept lines
+    """
+    tail = deque(maxlen=max_lines)
+    
+    def read():
+        with proc.stderr:
+            for line in proc.stderr:
+                tail.append(line.decode(errors='replace').rstrip())
+    
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    
+    def collect():
+        reader.join(timeout=5)
+        return "\n".join(tail).strip()
+    return collect
+
+
+# ========== DEADLINE PLANNER ==========
+
+def parse_deadline(text, now=None):
+    """
+    Deadline as a Unix timestamp.
+    
+    Accepts a clock time ('07:00' - the next time it comes round) or an ISO
+    date and time ('2026-02-07 07:00').
+    """
+    from datetime import datetime, timedelta
+    
+    now = datetime.fromtimestamp(now or time.time())
+    try:
+        clock = datetime.strptime(text.strip(), "%H:%M")
+    except ValueError:
+        return datetime.fromisoformat(text.strip()).timestamp()
+    target = now.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+def _stage_speed_file():
+    return os.path.join(get_cache_dir("scheduler"), "stage_speed.json")
+
+
+def load_stage_speeds():
+    """Realtime factors measured for each stage key on earlier runs."""
+    try:
+        with open(_stage_speed_file(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_stage_speed(stage_key, media_seconds, wall_seconds):
+    """Fold a measured realtime factor into the per-stage history (moving average)."""
+    if media_seconds <= 0 or wall_seconds <= 0:
+        return
+    speed = media_seconds / wall_seconds
+    with HISTORY_LOCK:
+        history = load_stage_speeds()
+        entry = history.get(stage_key)
+        if entry:
+            entry["speed"] = 0.7 * entry["speed"] + 0.3 * speed
+            entry["runs"] += 1
+        else:
+            entry = {"speed": speed, "runs": 1}
+        history[stage_key] = entry
+        write_json_atomic(_stage_speed_file(), history)
+
+
+def estimate_encode_speed(speeds, resolution, preset, encoder="svtav1"):
+    """
+    Expected realtime factor of an encode.
+    
+    Uses the measurement at the nearest preset for this resolution, scaled
+    by PRESET_SPEED_STEP per preset step; built-in defaults otherwise.
+    """
+    prefix = encode_stage_key(resolution, "", encoder)
+    measured = {int(k[len(prefix):]): v["speed"] for k, v in speeds.items() if k.startswith(prefix)}
+    if measured:
+        nearest = min(measured, key=lambda p: abs(p - preset))
+        base, base_preset = measured[nearest], nearest
+    else:
+        base = DEFAULT_ENCODE_SPEED.get(resolution, DEFAULT_ENCODE_SPEED['source'])
+        base_preset = PLANNER_CALIBRATION_PRESET
+    return base * PRESET_SPEED_STEP ** (preset - base_preset)
+
+
+def estimate_file_seconds(speeds, duration, resolution, preset, device, include_transcription=True,
+                          encoder="svtav1"):
+    """Expected wall-clock seconds to encode (and transcribe) a file of the given duration."""
+    seconds = duration / estimate_encode_speed(speeds, resolution, int(preset), encoder)
+    if include_transcription:
+        transcribe_speed = speeds.get(f"transcribe:{device}", {}).get("speed") \
+            or DEFAULT_TRANSCRIBE_SPEED.get(device, DEFAULT_TRANSCRIBE_SPEED['cpu'])
+        seconds += duration / transcribe_speed
+    return seconds
+
+
+def order_for_makespan(files, costs, slots):
+    """
+    Order files longest-first (LPT) so parallel slots finish together.
+    
+    Files are dispatched in this order to whichever slot frees up first,
+    so short files backfill the gaps left by long ones at the end.
     
     Args:
-        video_file: Path to encoded video
-        srt_file: Path to SRT subtitle file
-        output_file: Path to final output
+        files: File paths
+        costs: Expected seconds per file (same order)
+        slots: Files processed at once
+    
+    Returns:
+        (ordered_files, predicted_makespan_seconds)
     """
-    ffmpeg_path = get_ffmpeg_path()
+    order = sorted(range(len(files)), key=lambda i: costs[i], reverse=True)
+    finish = [0.0] * max(slots, 1)
+    for i in order:
+        slot = finish.index(min(finish))
+        finish[slot] += costs[i]
+    return [files[i] for i in order], max(finish)
+
+
+def calibrate_encode_speed(sample_file, resolution, encoder="svtav1"):
+    """
+    Measure encode speed on a short clip (encoded to the null muxer) when this
+    resolution and encoder have no history yet.
+    """
+    prefix = encode_stage_key(resolution, "", encoder)
+    if any(k.startswith(prefix) for k in load_stage_speeds()):
+        return
+    
+    duration = get_duration(sample_file)
+    clip = min(PLANNER_CALIBRATION_SECONDS, duration)
+    start = benchmark_clip_start(sample_file, clip, duration)
+    scale = build_scale_filter(resolution)
+    print(f"⏱️  Calibrating {resolution}p encode speed on a {clip:.0f}s clip...")
+    
+    started = time.time()
+    result = run_stage_command([
+        get_ffmpeg_path(), "-v", "error", "-nostdin",
+        "-ss", f"{start:.1f}", "-t", f"{clip:.1f}", "-i", sample_file,
+        "-vf", scale, "-an",
+        "-c:v", ENCODER_BACKENDS[encoder]["codec"],
+        *ENCODER_BACKENDS[encoder]["args"](PLANNER_CALIBRATION_PRESET, 30, None),
+        "-f", "null", "-"
+    ])
+    if result.returncode == 0:
+        record_stage_speed(f"{prefix}{PLANNER_CALIBRATION_PRESET}", clip, time.time() - started)
+
+
+def plan_presets(durations, seconds_left, resolution, device, best_preset,
+                 include_transcription=True, slots=1, encoder="svtav1"):
+    """
+    Choose a preset per file so the batch finishes within seconds_left.
+    
+    Starts every file at best_preset (the slowest/best quality allowed) and,
+    while the projection overruns, moves the file on the slowest preset
+    (longest first on ties) one step faster - keeping quality as high and as
+    even as the deadline allows.
+    
+    Args:
+        durations: Media duration of each remaining file, in seconds
+        seconds_left: Wall-clock time until the deadline
+        slots: Files processed in parallel (measured speeds already reflect sharing)
+    
+    Returns:
+        (presets, projected_seconds) - projected_seconds exceeds seconds_left
+        only when even PLANNER_FASTEST_PRESET cannot make it
+    """
+    speeds = load_stage_speeds()
+    
+    def file_seconds(duration, preset):
+        return estimate_file_seconds(speeds, duration, resolution, preset, device,
+                                     include_transcription, encoder)
+    
+    presets = [best_preset] * len(durations)
+    costs = [file_seconds(d, best_preset) for d in durations]
+    budget = seconds_left * slots
+    while sum(costs) > budget:
+        movable = [i for i, p in enumerate(presets) if p < PLANNER_FASTEST_PRESET]
+        if not movable:
+            break
+        i = min(movable, key=lambda i: (presets[i], -durations[i]))
+        presets[i] += 1
+        costs[i] = file_seconds(durations[i], presets[i])
+    return presets, sum(costs) / slots
+
+
+# ========== ENCODER BACKENDS ==========
+# Every backend maps the common speed scale (the SVT-AV1 preset range 0-13,
+# 0 = slowest/best) and quality scale (SVT-AV1 CRF 0-63) onto its own options.
+
+X265_PRESETS = ['placebo', 'veryslow', 'slower', 'slow', 'medium',
+                'fast', 'faster', 'veryfast', 'superfast', 'ultrafast']
+QSV_PRESETS = ['veryslow', 'slower', 'slow', 'medium', 'fast', 'faster', 'veryfast']
+
+
+def _scale_speed(speed, top):
+    """Map a 0-13 speed level onto an encoder's 0-top range."""
+    return round(min(max(int(speed), 0), 13) * top / 13)
+
+
+def _svtav1_args(speed, crf, threads):
+    params = "tune=0:enable-overlays=1:lookahead=120"
+    if threads:
+        params += f":lp={threads}"
+    return ["-preset", str(speed), "-crf", str(crf), "-svtav1-params", params]
+
+
+def _aom_args(speed, crf, threads):
+    args = ["-cpu-used", str(_scale_speed(speed, 8)), "-crf", str(crf), "-b:v", "0",
+            "-row-mt", "1", "-tiles", "2x2"]
+    return args + (["-threads", str(threads)] if threads else [])
+
+
+def _rav1e_args(speed, crf, threads):
+    args = ["-speed", str(_scale_speed(speed, 10)), "-qp", str(min(int(crf) * 4, 255))]
+    return args + (["-rav1e-params", f"threads={threads}"] if threads else [])
+
+
+def _x265_args(speed, crf, threads):
+    args = ["-preset", X265_PRESETS[_scale_speed(speed, 9)], "-crf", str(round(int(crf) * 0.75))]
+    return args + (["-x265-params", f"pools={threads}"] if threads else [])
+
+
+def _nvenc_args(speed, crf, threads):
+    return ["-preset", f"p{7 - _scale_speed(speed, 6)}", "-rc", "vbr",
+            "-cq", str(round(int(crf) * 51 / 63)), "-b:v", "0"]
+
+
+def _qsv_args(speed, crf, threads):
+    return ["-preset", QSV_PRESETS[_scale_speed(speed, 6)],
+            "-global_quality", str(round(int(crf) * 51 / 63))]
+
+
+def _amf_args(speed, crf, threads):
+    quality = ['quality', 'balanced', 'speed'][_scale_speed(speed, 2)]
+    qp = str(round(int(crf) * 51 / 63))
+    return ["-quality", quality, "-rc", "cqp", "-qp_i", qp, "-qp_p", qp]
+
+
+ENCODER_BACKENDS = {
+    'svtav1':     {"codec": "libsvtav1",  "label": "SVT-AV1",     "args": _svtav1_args},
+    'aom':        {"codec": "libaom-av1", "label": "libaom AV1",  "args": _aom_args},
+    'rav1e':      {"codec": "librav1e",   "label": "rav1e",       "args": _rav1e_args},
+    'x265':       {"codec": "libx265",    "label": "x265 HEVC",   "args": _x265_args},
+    'av1_nvenc':  {"codec": "av1_nvenc",  "label": "NVENC AV1",   "args": _nvenc_args},
+    'hevc_nvenc': {"codec": "hevc_nvenc", "label": "NVENC HEVC",  "args": _nvenc_args},
+    'av1_qsv':    {"codec": "av1_qsv",    "label": "QSV AV1",     "args": _qsv_args},
+    'hevc_qsv':   {"codec": "hevc_qsv",   "label": "QSV HEVC",    "args": _qsv_args},
+    'av1_amf':    {"codec": "av1_amf",    "label": "AMF AV1",     "args": _amf_args},
+    'hevc_amf':   {"codec": "hevc_amf",   "label": "AMF HEVC",    "args": _amf_args},
+}
+
+_FFMPEG_CAPABILITIES = {}
+
+
+def _parse_ffmpeg_listing(output):
+    """Names from `ffmpeg -encoders` / `-filters` output (the column after the flags)."""
+    names = []
+    in_table = False
+    for line in output.splitlines():
+        if line.strip().startswith("---") or line.strip() == "":
+            in_table = in_table or line.strip().startswith("---")
+            continue
+        parts = line.split()
+        if len(parts) >= 2 and (in_table or "->" in line):
+            names.append(parts[1])
+    return names
+
+
+def get_ffmpeg_capabilities(refresh=False):
+    """
+    Encoders and filters the bundled/system ffmpeg was built with.
+    
+    Parsed once from `ffmpeg -encoders` and `-filters` and cached on disk,
+    keyed by the ffmpeg binary's path, size and mtime, so it is only
+    re-parsed when ffmpeg changes.
+    
+    Returns:
+        {'encoders': [...], 'filters': [...]}
+    """
+    ffmpeg_path = shutil.which(get_ffmpeg_path()) or get_ffmpeg_path()
+    if not refresh and ffmpeg_path in _FFMPEG_CAPABILITIES:
+        return _FFMPEG_CAPABILITIES[ffmpeg_path]
+    
+    try:
+        stat = os.stat(ffmpeg_path)
+        key = f"{os.path.abspath(ffmpeg_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        key = ffmpeg_path
+    cache_file = os.path.join(get_cache_dir("capabilities"), "ffmpeg.json")
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    
+    if refresh or key not in cached:
+        listings = {}
+        for kind in ("encoders", "filters"):
+            try:
+                output = run_stage_capture([ffmpeg_path, "-hide_banner", f"-{kind}"], text=True).stdout
+            except OSError:
+                output = ""
+            listings[kind] = _parse_ffmpeg_listing(output)
+        cached[key] = listings
+        write_json_atomic(cache_file, cached)
+    
+    _FFMPEG_CAPABILITIES[ffmpeg_path] = cached[key]
+    return cached[key]
+
+
+def available_encoders():
+    """Backends whose encoder is compiled into ffmpeg (hardware ones may still lack a device)."""
+    encoders = set(get_ffmpeg_capabilities()["encoders"])
+    return [name for name, backend in ENCODER_BACKENDS.items() if backend["codec"] in encoders]
+
+
+def measure_ssim(encoded_file, source_file, start, seconds, scale):
+    """All-channel SSIM of an encoded clip against the same span of the (scaled) source."""
+    result = run_stage_capture([
+        get_ffmpeg_path(), "-hide_banner", "-nostdin",
+        "-i", encoded_file,
+        "-ss", f"{start:.1f}", "-t", f"{seconds:.1f}", "-i", source_file,
+        "-lavfi", f"[1:v]{scale}[ref];[0:v][ref]ssim", "-f", "null", "-"
+    ], text=True)
+    for line in reversed(result.stderr.splitlines()):
+        if "All:" in line:
+            return float(line.split("All:")[1].split()[0])
+    return None
+
+
+def benchmark_encoders(sample_file, resolution, preset, crf=30, encoders=None, seconds=20):
+    """
+    Encode the same clip with each available backend at one speed/quality level.
+    
+    Reports speed (fps and realtime factor), bitrate and SSIM against the
+    source; measured speeds are added to the planner's history.
+    
+    Returns:
+        List of result dicts, fastest first
+    """
+    encoders = encoders or available_encoders()
+    duration = get_duration(sample_file)
+    seconds = min(seconds, duration)
+    start = benchmark_clip_start(sample_file, seconds, duration)
+    scale = build_scale_filter(resolution)
+    work_dir = tempfile.mkdtemp(prefix="anime_subber_bench_")
     
     print(f"\n{'='*60}")
-    print(f"▶️  [STAGE 3/3] Muxing Subtitles")
+    print(f"🏁 Encoder benchmark: {seconds:.0f}s clip | {resolution} | speed {preset} | CRF {crf}")
+    print(f"{'='*60}")
+    
+    results = []
+    for name in encoders:
+        backend = ENCODER_BACKENDS[name]
+        clip = os.path.join(work_dir, f"{name}.mkv")
+        started = time.time()
+        result = run_stage_command([
+            get_ffmpeg_path(), "-v", "error", "-nostdin", "-y",
+            "-ss", f"{start:.1f}", "-t", f"{seconds:.1f}", "-i", sample_file,
+            "-vf", scale, "-an", "-c:v", backend["codec"],
+            *backend["args"](preset, crf, None), clip
+        ], low_priority=False)
+        elapsed = max(time.time() - started, 0.01)
+        if result.returncode != 0 or not os.path.exists(clip):
+            print(f"  {backend['label']:<12} failed (encoder unusable on this machine)")
+            continue
+        
+        record_stage_speed(encode_stage_key(resolution, preset, name), seconds, elapsed)
+        fps = (probe_video(sample_file) or {}).get("fps")
+        results.append({
+            "encoder": name,
+            "speed": seconds / elapsed,
+            "fps": seconds * fps / elapsed if fps else None,
+            "kbps": os.path.getsize(clip) * 8 / seconds / 1000,
+            "ssim": measure_ssim(clip, sample_file, start, seconds, scale),
+        })
+    
+    shutil.rmtree(work_dir, ignore_errors=True)
+    results.sort(key=lambda r: r["speed"], reverse=True)
+    for r in results:
+        fps = f"{r['fps']:6.1f} fps" if r["fps"] else "    ? fps"
+        ssim = f"{r['ssim']:.4f}" if r["ssim"] is not None else "?"
+        print(f"  {ENCODER_BACKENDS[r['encoder']]['label']:<12} {fps} | {r['speed']:5.2f}x realtime | "
+              f"{r['kbps']:7.0f} kb/s | SSIM {ssim}")
     print(f"{'='*60}\n")
+    return results
+
+
+# ========== PIPELINE PROFILER ==========
+# Times decode-only, decode+scale and full-encode passes over the same clip
+# (ffmpeg -benchmark, null muxer) to find which stage limits the encode, and
+# caches decoder/filter thread counts and a scaler per source format.
+
+def build_scale_filter(resolution, scaler="lanczos", height_ratio=1.0):
+    """
+    Scaling filter for a target resolution ('null' keeps the source size).
     
+    height_ratio is the share of the source height left after cropping, so a
+    cropped scope film is scaled as if its bars were still there instead of
+    being stretched up to the full target height.
+    """
+    if resolution == "source":
+        return "null"
+    height = int(resolution)
+    if height_ratio < 1.0:
+        height = max(round(height * height_ratio / 2) * 2, 2)
+    return f"scale=-2:{height}:flags={scaler}"
+
+
+def _benchmark_pass(sample_file, start, seconds, input_opts=(), global_opts=(), vf=None,
+                    output_opts=("-f", "null", "-")):
+    """Run one ffmpeg pass over the clip; return its realtime factor (0 on failure)."""
     cmd = [
-        ffmpeg_path, "-i", video_file, "-i", srt_file,
-        "-map", "0", "-map", "1",
-        "-c", "copy",
-        "-c:s", "srt",
-        "-metadata:s:s:0", "language=eng",
-        "-metadata:s:s:0", "title=AI English Translation",
-        output_file
+        get_ffmpeg_path(), "-hide_banner", "-nostdin", "-benchmark", *global_opts,
+        "-ss", f"{start:.1f}", "-t", f"{seconds:.1f}", *input_opts, "-i", sample_file,
+        "-map", "0:v:0", *(["-vf", vf] if vf else []), *output_opts
     ]
+    result = run_stage_capture(cmd, text=True)
+    if result.returncode != 0:
+        return 0.0
+    for line in result.stderr.splitlines():
+        if line.startswith("bench:") and "rtime=" in line:
+            rtime = float(line.split("rtime=")[1].rstrip("s").split()[0])
+            return seconds / max(rtime, 0.001)
+    return 0.0
+
+
+def _pipeline_profile_file():
+    return os.path.join(get_cache_dir("profiles"), "pipeline.json")
+
+
+def pipeline_profile_key(input_file, resolution):
+    """Profiles apply to every file with the same codec, frame size and target resolution."""
+    info = probe_video(input_file)
+    if not info:
+        return None
+    return f"{info['codec']}:{info['width']}x{info['height']}:{resolution}"
+
+
+def get_pipeline_tuning(input_file, resolution):
+    """Cached profiler recommendation for this kind of source, or None."""
+    key = pipeline_profile_key(input_file, resolution)
+    if key is None:
+        return None
+    try:
+        with open(_pipeline_profile_file(), encoding="utf-8") as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_pipeline(sample_file, resolution, preset, encoder="svtav1", seconds=PROFILE_SAMPLE_SECONDS):
+    """
+    Find the bottleneck of an encode and tune decode and filter threading.
+    
+    Passes over a clip of sample_file (see benchmark_clip_start):
+      1. decode only, with automatic / half / all cores as decoder threads
+      2. decode + scale, with each scaler in PROFILE_SCALERS and -filter_threads
+      3. the full encode with the best settings
+    Each stage's share of the time is the difference between consecutive
+    passes. The recommendation is cached per codec/frame size/resolution and
+    applied by encode_video() from then on.
+    
+    Returns:
+        Recommendation dict (decode_threads, filter_threads, scaler, speeds, bottleneck)
+    """
+    duration = get_duration(sample_file)
+    seconds = min(seconds, duration)
+    start = benchmark_clip_start(sample_file, seconds, duration)
+    cores = len(get_available_cores())
+    
+    print(f"\n{'='*60}")
+    print(f"🔬 Profiling decode / filter / encode on a {seconds:.0f}s clip")
+    print(f"{'='*60}")
+    
+    # 1. Decoder threads
+    decode = {}
+    for threads in sorted({None, max(cores // 2, 1), cores}, key=lambda t: t or 0):
+        opts = ("-threads", str(threads)) if threads else ()
+        decode[threads] = _benchmark_pass(sample_file, start, seconds, input_opts=opts)
+        print(f"  decode  threads={threads or 'auto':<5} {decode[threads]:7.1f}x realtime")
+    decode_threads = max(decode, key=decode.get)
+    input_opts = ("-threads", str(decode_threads)) if decode_threads else ()
+    
+    # 2. Scaler and filter threads (nothing to tune when keeping the source size)
+    scaler, filter_threads = "lanczos", None
+    scale_speed = decode[decode_threads]
+    if resolution != "source":
+        scalers = {}
+        for name in PROFILE_SCALERS:
+            scalers[name] = _benchmark_pass(sample_file, start, seconds, input_opts,
+                                            vf=build_scale_filter(resolution, name))
+            print(f"  scale   {name:<13} {scalers[name]:7.1f}x realtime")
+        fastest = max(scalers, key=scalers.get)
+        if scalers[fastest] >= scalers["lanczos"] * PROFILE_SCALER_MIN_GAIN:
+            scaler = fastest
+        
+        threaded = _benchmark_pass(sample_file, start, seconds, input_opts,
+                                   global_opts=("-filter_threads", str(max(cores // 2, 1))),
+                                   vf=build_scale_filter(resolution, scaler))
+        print(f"  scale   filter_threads={max(cores // 2, 1):<3} {threaded:7.1f}x realtime")
+        scale_speed = scalers[scaler]
+        if threaded > scale_speed:
+            filter_threads, scale_speed = max(cores // 2, 1), threaded
+    
+    # 3. Full encode with the chosen settings
+    backend = ENCODER_BACKENDS[encoder]
+    encode_speed = _benchmark_pass(
+        sample_file, start, seconds, input_opts,
+        global_opts=("-filter_threads", str(filter_threads)) if filter_threads else (),
+        vf=build_scale_filter(resolution, scaler),
+        output_opts=("-c:v", backend["codec"], *backend["args"](preset, 30, None), "-f", "null", "-")
+    )
+    print(f"  encode  {backend['label']:<13} {encode_speed:7.1f}x realtime")
+    
+    # Seconds of work per media second for each stage
+    costs = {"decode": 1 / max(decode[decode_threads], 0.001)}
+    costs["filter"] = max(1 / max(scale_speed, 0.001) - costs["decode"], 0)
+    costs["encode"] = max(1 / max(encode_speed, 0.001) - costs["decode"] - costs["filter"], 0)
+    bottleneck = max(costs, key=costs.get)
+    total = sum(costs.values()) or 1
+    if bottleneck == "encode":
+        # A softer scaler only pays off when filtering limits throughput
+        scaler = "lanczos"
+    
+    profile = {
+        "decode_threads": decode_threads,
+        "filter_threads": filter_threads,
+        "scaler": scaler,
+        "speeds": {"decode": decode[decode_threads], "scale": scale_speed, "encode": encode_speed},
+        "bottleneck": bottleneck,
+    }
+    key = pipeline_profile_key(sample_file, resolution)
+    if key:
+        try:
+            with open(_pipeline_profile_file(), encoding="utf-8") as f:
+                profiles = json.load(f)
+        except (OSError, ValueError):
+            profiles = {}
+        profiles[key] = profile
+        write_json_atomic(_pipeline_profile_file(), profiles)
+    
+    print("\n  Time share: " + ", ".join(f"{k} {v / total:.0%}" for k, v in costs.items()))
+    print(f"  Bottleneck: {bottleneck}")
+    print(f"  Applied to future encodes: decoder threads={decode_threads or 'auto'}, "
+          f"filter_threads={filter_threads or 'auto'}, scaler={scaler}")
+    print(f"{'='*60}\n")
+    return profile
+
+
+# ========== DUPLICATE-FRAME DECIMATION ==========
+# Anime is mostly animated on twos or threes, so many decoded frames repeat
+# the previous one. With decimation those frames are dropped before the
+# encoder (mpdecimate) and the output is written with variable frame rate.
+
+def count_video_frames(video_file):
+    """Number of video packets in a file (demux only, no decode); 0 if unreadable."""
+    cmd = [
+        get_ffprobe_path(), "-v", "error",
+        "-select_streams", "v:0", "-count_packets",
+        "-show_entries", "stream=nb_read_packets",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_file
+    ]
+    try:
+        return int(run_stage_capture(cmd, check=True).stdout.decode().strip())
+    except Exception:
+        return 0
+
+
+def _count_frames_pass(sample_file, start, seconds, vf=None):
+    """Frames that come out of the filter chain over a clip (ffmpeg's final frame= stat)."""
+    cmd = [
+        get_ffmpeg_path(), "-hide_banner", "-nostdin",
+        "-ss", f"{start:.1f}", "-t", f"{seconds:.1f}", "-i", sample_file,
+        "-map", "0:v:0", *(["-vf", vf, "-fps_mode", "vfr"] if vf else []), "-f", "null", "-"
+    ]
+    result = run_stage_capture(cmd, text=True)
+    if result.returncode != 0 or "frame=" not in result.stderr:
+        return 0
+    return int(result.stderr.rsplit("frame=", 1)[1].split()[0])
+
+
+def analyze_decimation(sample_file, resolution, preset, encoder="svtav1", seconds=PROFILE_SAMPLE_SECONDS):
+    """
+    Measure how many frames decimation removes and how much faster the encode gets.
+    
+    A clip of sample_file (see benchmark_clip_start) is decimated without
+    encoding to count the kept frames, then encoded to the null muxer with
+    and without decimation. With a frame statistics index the duplicate
+    share is read from its frame differences instead (frames that changed
+    less than FRAME_STATS_MOTION), which saves the two counting decodes.
+    
+    Returns:
+        Dict with frames, kept, removed (fraction) and speedup
+    """
+    duration = get_duration(sample_file)
+    seconds = min(seconds, duration)
+    start = benchmark_clip_start(sample_file, seconds, duration)
+    backend = ENCODER_BACKENDS[encoder]
+    scale = build_scale_filter(resolution, (get_pipeline_tuning(sample_file, resolution) or {}).get("scaler", "lanczos"))
+    codec_opts = ("-c:v", backend["codec"], *backend["args"](preset, 30, None), "-f", "null", "-")
+    
+    print(f"\n{'='*60}")
+    print(f"🎞️  Duplicate-frame analysis on a {seconds:.0f}s clip")
+    print(f"{'='*60}")
+    
+    stats = load_frame_stats(sample_file)
+    if stats is not None and stats["meta"]["fps"]:
+        first = int(start * stats["meta"]["fps"])
+        diff = stats["diff"][first:first + int(seconds * stats["meta"]["fps"])]
+        frames = len(diff)
+        kept = frames - int((diff[1:] < FRAME_STATS_MOTION).sum())
+    else:
+        frames = _count_frames_pass(sample_file, start, seconds)
+        kept = _count_frames_pass(sample_file, start, seconds, vf=DECIMATE_FILTER)
+    removed = 1 - kept / frames if frames and kept else 0.0
+    print(f"  frames  {kept}/{frames} kept ({removed:.0%} duplicates)")
+    
+    full = _benchmark_pass(sample_file, start, seconds, vf=scale, output_opts=codec_opts)
+    print(f"  encode  every frame   {full:7.2f}x realtime")
+    decimated = _benchmark_pass(sample_file, start, seconds, vf=f"{DECIMATE_FILTER},{scale}",
+                                output_opts=("-fps_mode", "vfr", *codec_opts))
+    print(f"  encode  decimated     {decimated:7.2f}x realtime")
+    
+    speedup = decimated / full if full else 0.0
+    print(f"\n  Speedup: {speedup:.2f}x ({backend['label']}, preset {preset})")
+    print(f"{'='*60}\n")
+    return {"frames": frames, "kept": kept, "removed": removed, "speedup": speedup}
+
+
+def report_decimation(input_file, encoded_file, speed_key, media_seconds, wall_seconds):
+    """
+    Print the frames a decimated encode dropped and its speed against full-frame encodes.
+    
+    The comparison uses the full-frame speed measured for the same stage key
+    on earlier runs; the decimated speed is stored separately (under
+    'decimate:<key>') so it does not skew the deadline planner.
+    """
+    stats = load_frame_stats(input_file)
+    source = stats["meta"]["frames"] if stats else count_video_frames(input_file)
+    kept = count_video_frames(encoded_file)
+    if source and kept:
+        print(f"🎞️  Decimation: {source - kept}/{source} frames removed ({(source - kept) / source:.0%})")
+    
+    if media_seconds <= 0 or wall_seconds <= 0:
+        return
+    speed = media_seconds / wall_seconds
+    baseline = load_stage_speeds().get(speed_key, {}).get("speed")
+    if baseline:
+        print(f"⚡ Encode: {speed:.2f}x realtime vs {baseline:.2f}x without decimation "
+              f"({speed / baseline:.2f}x speedup)")
+    else:
+        print(f"⚡ Encode: {speed:.2f}x realtime (no full-frame encode at this preset measured yet)")
+    record_stage_speed(f"decimate:{speed_key}", media_seconds, wall_seconds)
+
+
+# ========== FRAME STATISTICS INDEX ==========
+# One decode per source produces a per-frame statistics index: luma stats,
+# frame and field differences, a scene score, black borders, dHash and a comb
+# metric. Columns are stored as separate .npy files per content fingerprint
+# and opened as memory maps, so crop/telecine analysis, release hashing and
+# benchmark clip selection read them instead of decoding the source again.
+
+def _frame_stats_dir(input_file):
+    return os.path.join(get_cache_dir("frame-stats"), get_file_fingerprint(input_file))
+
+
+def load_frame_stats(input_file):
+    """
+    Memory-mapped frame statistics of a file, or None if it has not been indexed.
+    
+    Returns:
+        Dict of per-frame columns (NumPy memory maps) plus 'meta' (frames,
+        fps and source width/height)
+    """
+    import numpy as np
+    
+    folder = _frame_stats_dir(input_file)
+    try:
+        with open(os.path.join(folder, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != FRAME_STATS_VERSION:
+        return None
+    stats = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]}
+    stats["meta"] = meta
+    return stats
+
+
+def build_frame_stats(input_file):
+    """
+    Decode a file once and write its frame statistics index.
+    
+    ffmpeg outputs, per frame, the luma narrowed to FRAME_STATS_WIDTH columns
+    at full height (so interlacing combs survive) with the 9x8 dHash picture
+    stacked below it; NumPy reduces batches of frames to one value per column:
+    
+        luma_mean/std/min/max   brightness and spatial detail
+        diff                    mean absolute difference to the previous frame
+        top_diff/bottom_diff    the same per field (repeated fields show as ~0)
+        scene                   scene-change score, 0-100 (as ffmpeg scdet)
+        border_*                black border per side, in source pixels
+        dhash                   64-bit dHash: bit n set when a pixel of the 9x8
+                                picture is brighter than its left neighbour
+        comb                    share of combed pixels
+    
+    Returns:
+        The index, as from load_frame_stats
+    """
+    import numpy as np
+    
+    info = probe_video(input_file)
+    if not info:
+        raise RuntimeError(f"Cannot read video stream: {input_file}")
+    src_w, src_h = info["width"], info["height"]
+    width = min(src_w, FRAME_STATS_WIDTH)
+    graph = (f"[0:v:0]split=2[a][b];[a]format=gray,scale={width}:{src_h}:flags=area[luma];"
+             f"[b]scale=9:8:flags=area,format=gray,pad={width}:8[hash];[luma][hash]vstack")
+    cmd = [
+        get_ffmpeg_path(), "-nostdin", "-v", "error", "-i", input_file,
+        "-filter_complex", graph, "-fps_mode", "passthrough", "-f", "rawvideo", "pipe:1"
+    ]
+    
+    print(f"📊 Indexing frame statistics: {os.path.basename(input_file)}")
+    started = time.time()
+    buffer = np.empty((FRAME_STATS_CHUNK, src_h + 8, width), dtype=np.uint8)
+    view = memoryview(buffer).cast('B')
+    frame_bytes = (src_h + 8) * width
+    rows = {name: [] for name in ("luma_mean", "luma_std", "luma_min", "luma_max", "diff", "top_diff",
+                                  "bottom_diff", "border_top", "border_bottom", "border_left",
+                                  "border_right", "dhash", "comb")}
+    previous = None
+    
+    proc = launch_stage_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = drain_stderr(proc)
+    try:
+        while True:
+            count = _read_fully(proc.stdout, view) // frame_bytes
+            if not count:
+                break
+            frames = buffer[:count, :src_h]
+            flat = frames.reshape(count, -1)
+            rows["luma_mean"].append(flat.mean(axis=1, dtype=np.float32))
+            rows["luma_std"].append(flat.std(axis=1, dtype=np.float32))
+            rows["luma_min"].append(flat.min(axis=1))
+            rows["luma_max"].append(flat.max(axis=1))
+            
+            luma = frames.astype(np.int16)
+            delta = np.abs(np.diff(np.concatenate((luma[:1] if previous is None else previous[None], luma)), axis=0))
+            rows["diff"].append(delta.reshape(count, -1).mean(axis=1, dtype=np.float32))
+            rows["top_diff"].append(delta[:, 0::2].mean(axis=(1, 2), dtype=np.float32))
+            rows["bottom_diff"].append(delta[:, 1::2].mean(axis=(1, 2), dtype=np.float32))
+            previous = luma[-1].copy()
+            del delta
+            
+            bright_rows = frames.max(axis=2) >= FRAME_STATS_BLACK_LEVEL
+            bright_cols = frames.max(axis=1) >= FRAME_STATS_BLACK_LEVEL
+            lit = bright_rows.any(axis=1)
+            rows["border_top"].append(np.where(lit, bright_rows.argmax(axis=1), src_h).astype(np.uint16))
+            rows["border_bottom"].append(np.where(lit, bright_rows[:, ::-1].argmax(axis=1), src_h).astype(np.uint16))
+            # Narrowed columns are rounded down to source pixels, so borders are never overstated
+            rows["border_left"].append((np.where(lit, bright_cols.argmax(axis=1), width) * src_w // width).astype(np.uint16))
+            rows["border_right"].append((np.where(lit, bright_cols[:, ::-1].argmax(axis=1), width) * src_w // width).astype(np.uint16))
+            
+            up, mid, down = luma[:, :-2], luma[:, 1:-1], luma[:, 2:]
+            combed = (((mid - up > FRAME_STATS_COMB_THRESHOLD) & (mid - down > FRAME_STATS_COMB_THRESHOLD))
+                      | ((up - mid > FRAME_STATS_COMB_THRESHOLD) & (down - mid > FRAME_STATS_COMB_THRESHOLD)))
+            rows["comb"].append(combed.reshape(count, -1).mean(axis=1, dtype=np.float32))
+            
+            pixels = buffer[:count, src_h:, :9]
+            bits = (pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(count, 64)
+            rows["dhash"].append(np.packbits(bits, axis=1).view('>u8').ravel().astype(np.uint64))
+            if count < FRAME_STATS_CHUNK:
+                break
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        stderr = stderr_tail()
+    if proc.returncode != 0 or not rows["diff"]:
+        raise RuntimeError(f"ffmpeg frame statistics pass failed: {stderr or proc.returncode}")
+    
+    columns = {name: np.concatenate(values) for name, values in rows.items()}
+    mafd = columns["diff"] * (100 / 255)
+    columns["scene"] = np.clip(np.minimum(mafd, np.abs(np.diff(mafd, prepend=mafd[:1]))), 0, 100).astype(np.float32)
+    frames = len(columns["diff"])
+    meta = {"version": FRAME_STATS_VERSION, "frames": frames, "fps": info["fps"],
+            "width": src_w, "height": src_h, "columns": sorted(columns)}
+    
+    folder = _frame_stats_dir(input_file)
+    partial = f"{folder}.{os.getpid()}.partial"
+    os.makedirs(partial, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(partial, f"{name}.npy"), values)
+    with open(os.path.join(partial, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    if os.path.isdir(folder) and load_frame_stats(input_file) is None:
+        shutil.rmtree(folder, ignore_errors=True)   # Index from an older FRAME_STATS_VERSION
+    try:
+        os.replace(partial, folder)
+    except OSError:
+        # Another worker indexed the same content first
+        shutil.rmtree(partial, ignore_errors=True)
+    
+    elapsed = max(time.time() - started, 1e-6)
+    media = frames / info["fps"] if info["fps"] else 0
+    print(f"📊 Indexed {frames} frames in {elapsed:.0f}s ({media / elapsed:.1f}x realtime)")
+    return load_frame_stats(input_file)
+
+
+def get_frame_stats(input_file, build=True):
+    """Frame statistics index of a file, decoding it once on a cache miss (None if build=False)."""
+    stats = load_frame_stats(input_file)
+    if stats is None and build:
+        stats = build_frame_stats(input_file)
+    return stats
+
+
+def benchmark_clip_start(sample_file, seconds, duration=None):
+    """
+    Start of the clip that benchmarks and calibrations should measure.
+    
+    Without a frame statistics index this is the middle of the file. With
+    one, it is the clip whose motion (frame difference) and detail (luma
+    deviation) are closest to the whole file's, skipping the first and last
+    5% (logos, credits), so encode speeds measured on it carry over.
+    """
+    import numpy as np
+    
+    duration = duration if duration is not None else get_duration(sample_file)
+    middle = max(duration / 2 - seconds / 2, 0)
+    stats = load_frame_stats(sample_file)
+    if stats is None or not stats["meta"]["fps"]:
+        return middle
+    fps = stats["meta"]["fps"]
+    window = int(seconds * fps)
+    frames = stats["meta"]["frames"]
+    first, last = int(frames * 0.05), int(frames * 0.95) - window
+    if window < 1 or last <= first:
+        return middle
+    
+    motion = np.asarray(stats["diff"], dtype=np.float64)
+    detail = np.asarray(stats["luma_std"], dtype=np.float64)
+    sums = [np.concatenate(([0.0], np.cumsum(column))) for column in (motion, detail)]
+    starts = np.arange(first, last + 1, max(int(fps), 1))
+    distance = sum(np.abs((cs[starts + window] - cs[starts]) / window / max(column.mean(), 1e-6) - 1)
+                   for cs, column in zip(sums, (motion, detail)))
+    return float(starts[np.argmin(distance)] / fps)
+
+
+# ========== SOURCE ANALYSIS ==========
+# Short pre-analysis passes over clips spread across a source, run in
+# parallel and cached per file (content fingerprint), or read from the frame
+# statistics index when one is requested. Their results become filters
+# placed in front of decimation and scaling in encode_video.
+
+_SOURCE_ANALYSIS_LOCK = threading.Lock()
+
+
+def _source_analysis_file():
+    return os.path.join(get_cache_dir("analysis"), "source_analysis.json")
+
+
+def cached_source_analysis(input_file, name, analyze):
+    """
+    Return a named analysis result for a file, running analyze(input_file) on a cache miss.
+    
+    Results are stored per content fingerprint, so renamed or moved copies
+    of a file are not analysed again.
+    """
+    key = get_file_fingerprint(input_file)
+    try:
+        with open(_source_analysis_file(), encoding="utf-8") as f:
+            cached = json.load(f).get(key, {}).get(name)
+    except (OSError, ValueError):
+        cached = None
+    if cached is not None:
+        return cached
+    
+    result = analyze(input_file)
+    with _SOURCE_ANALYSIS_LOCK:
+        try:
+            with open(_source_analysis_file(), encoding="utf-8") as f:
+                analyses = json.load(f)
+        except (OSError, ValueError):
+            analyses = {}
+        analyses.setdefault(key, {})[name] = result
+        write_json_atomic(_source_analysis_file(), analyses)
+    return result
+
+
+def analysis_sample_starts(duration, samples=ANALYSIS_SAMPLES, seconds=ANALYSIS_SAMPLE_SECONDS):
+    """Start times of clips spread evenly over a file, skipping the first and last 5%."""
+    if duration <= seconds:
+        return [0.0]
+    first, last = duration * 0.05, duration * 0.95 - seconds
+    if last <= first:
+        return [max(duration / 2 - seconds / 2, 0)]
+    step = (last - first) / max(samples - 1, 1)
+    return [first + i * step for i in range(samples)]
+
+
+def run_sample_filters(input_file, vf, seconds=ANALYSIS_SAMPLE_SECONDS, samples=ANALYSIS_SAMPLES):
+    """
+    Run a video filter over clips spread across a file, in parallel.
+    
+    Returns:
+        List of ffmpeg stderr logs, one per clip (failed clips are left out)
+    """
+    def run(start):
+        cmd = [
+            get_ffmpeg_path(), "-hide_banner", "-nostdin", "-nostats",
+            "-ss", f"{start:.1f}", "-t", f"{seconds:.1f}", "-i", input_file,
+            "-map", "0:v:0", "-vf", vf, "-an", "-f", "null", "-"
+        ]
+        result = run_stage_capture(cmd, text=True)
+        return result.stderr if result.returncode == 0 else None
+    
+    starts = analysis_sample_starts(get_duration(input_file), samples, seconds)
+    workers = max(min(len(starts), len(get_available_cores()) // 2), 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [log for log in pool.map(run, starts) if log]
+
+
+def _parse_idet_counts(log, label):
+    """Sum the 'Name: count' pairs that follow label on idet's summary lines."""
+    counts = {}
+    for line in log.splitlines():
+        if label not in line:
+            continue
+        fields = line.split(label, 1)[1].replace(":", " ").split()
+        for name, value in zip(fields[::2], fields[1::2]):
+            if value.isdigit():
+                counts[name] = counts.get(name, 0) + int(value)
+    return counts
+
+
+def detect_field_type(input_file):
+    """
+    Classify a source as progressive, telecined or interlaced with ffmpeg's idet.
+    
+    Sampled clips are run through idet; the share of combed frames (multi-frame
+    TFF/BFF detections) and of repeated fields decides the class. 3:2 pulldown
+    combs about two frames in five and repeats fields; true interlaced video
+    combs nearly every frame. Telecine is only considered at 29.97/30 fps.
+    
+    Returns:
+        Dict with type, combed and repeated shares, and the filter to apply (or None)
+    """
+    multi, repeated = {}, {}
+    for log in run_sample_filters(input_file, "idet"):
+        for name, value in _parse_idet_counts(log, "Multi frame detection").items():
+            multi[name] = multi.get(name, 0) + value
+        for name, value in _parse_idet_counts(log, "Repeated Fields").items():
+            repeated[name] = repeated.get(name, 0) + value
+    
+    decided = multi.get("TFF", 0) + multi.get("BFF", 0) + multi.get("Progressive", 0)
+    combed = (multi.get("TFF", 0) + multi.get("BFF", 0)) / decided if decided else 0.0
+    fields = sum(repeated.values())
+    repeat_share = (repeated.get("Top", 0) + repeated.get("Bottom", 0)) / fields if fields else 0.0
+    
+    info = probe_video(input_file)
+    return _classify_fields(combed, repeat_share, info["fps"] if info else 0.0)
+
+
+def _classify_fields(combed, repeat_share, fps):
+    """Field type and filter from the combed-frame and repeated-field shares."""
+    telecine_rate = not fps or min(abs(fps - 30000 / 1001), abs(fps - 30)) < 0.05
+    
+    if combed < FIELD_PROGRESSIVE_MAX_COMBED:
+        field_type, vf = "progressive", None
+    elif telecine_rate and (repeat_share >= FIELD_TELECINE_MIN_REPEATED or combed < FIELD_INTERLACED_MIN_COMBED):
+        field_type, vf = "telecined", TELECINE_FILTER
+    else:
+        field_type, vf = "interlaced", DEINTERLACE_FILTER
+    return {"type": field_type, "combed": round(combed, 3), "repeated": round(repeat_share, 3), "filter": vf}
+
+
+def field_type_from_frame_stats(stats):
+    """
+    detect_field_type() over every frame of the index instead of sampled clips.
+    
+    Only moving frames are counted (static frames are never combed). A frame
+    is combed when its comb share reaches FRAME_STATS_COMBED_SHARE; it repeats
+    a field when one field barely changed while the other did, which 3:2
+    pulldown does in two frames out of five.
+    """
+    import numpy as np
+    
+    moving = np.asarray(stats["diff"]) >= FRAME_STATS_MOTION
+    if not moving.any():
+        return _classify_fields(0.0, 0.0, stats["meta"]["fps"])
+    top, bottom = np.asarray(stats["top_diff"])[moving], np.asarray(stats["bottom_diff"])[moving]
+    combed = float((np.asarray(stats["comb"])[moving] >= FRAME_STATS_COMBED_SHARE).mean())
+    repeated = float((np.minimum(top, bottom) < FRAME_STATS_REPEATED_FIELD * np.maximum(top, bottom)).mean())
+    return _classify_fields(combed, repeated, stats["meta"]["fps"])
+
+
+def _parse_crop(log):
+    """Last 'crop=w:h:x:y' reported by cropdetect in a log, as ints (or None)."""
+    if "crop=" not in log:
+        return None
+    values = log.rsplit("crop=", 1)[1].split()[0].split(":")
+    try:
+        return tuple(int(v) for v in values) if len(values) == 4 else None
+    except ValueError:
+        return None
+
+
+def detect_crop(input_file):
+    """
+    Find letterbox/pillarbox bars with ffmpeg's cropdetect.
+    
+    Each sampled clip accumulates its content area over all its frames
+    (reset=0), so dark scenes within a clip cannot shrink it. The stable crop
+    is the union of the clips' areas - picture seen in any clip is never cut -
+    widened by CROP_SAFETY_PIXELS per side and kept to even sizes for 4:2:0.
+    Clips that found nothing (all black) are ignored; if fewer than half the
+    clips agree on a usable area, or the saving is below CROP_MIN_SAVING, no
+    crop is applied.
+    
+    Returns:
+        Dict with the source and cropped sizes, the pixel saving, and the
+        crop filter (or None)
+    """
+    info = probe_video(input_file)
+    width, height = (info["width"], info["height"]) if info else (0, 0)
+    logs = run_sample_filters(input_file, CROP_DETECT_FILTER)
+    
+    areas = []
+    for log in logs:
+        crop = _parse_crop(log)
+        if crop and crop[0] > 0 and crop[1] > 0:
+            w, h, x, y = crop
+            areas.append((x, y, x + w, y + h))
+    result = {"source": [width, height], "crop": None, "saved": 0.0, "samples": len(areas), "filter": None}
+    if not width or not height or len(areas) * 2 < max(len(logs), 1):
+        return result
+    return _stable_crop(result, min(a[0] for a in areas), min(a[1] for a in areas),
+                        max(a[2] for a in areas), max(a[3] for a in areas))
+
+
+def _stable_crop(result, left, top, right, bottom):
+    """Fill a crop result from a picture area, adding the safety margin and keeping even sizes."""
+    width, height = result["source"]
+    left = max(left - CROP_SAFETY_PIXELS, 0) // 2 * 2
+    top = max(top - CROP_SAFETY_PIXELS, 0) // 2 * 2
+    right = min(right + CROP_SAFETY_PIXELS, width)
+    bottom = min(bottom + CROP_SAFETY_PIXELS, height)
+    crop_w = min((right - left + 1) // 2 * 2, width - left)
+    crop_h = min((bottom - top + 1) // 2 * 2, height - top)
+    
+    saved = 1 - (crop_w * crop_h) / (width * height)
+    if saved < CROP_MIN_SAVING:
+        return dict(result, saved=round(max(saved, 0.0), 4))
+    return dict(result, crop=[crop_w, crop_h, left, top], saved=round(saved, 4),
+                filter=f"crop={crop_w}:{crop_h}:{left}:{top}")
+
+
+def crop_from_frame_stats(stats):
+    """
+    detect_crop() over every frame of the index instead of sampled clips.
+    
+    The picture area is the union over all frames that are not black, so
+    nothing shown in any frame is cut.
+    """
+    import numpy as np
+    
+    width, height = stats["meta"]["width"], stats["meta"]["height"]
+    lit = np.asarray(stats["luma_max"]) >= FRAME_STATS_BLACK_LEVEL
+    result = {"source": [width, height], "crop": None, "saved": 0.0, "samples": int(lit.sum()),
+              "basis": "frames", "filter": None}
+    if not lit.any():
+        return result
+    return _stable_crop(result, int(np.asarray(stats["border_left"])[lit].min()),
+                        int(np.asarray(stats["border_top"])[lit].min()),
+                        width - int(np.asarray(stats["border_right"])[lit].min()),
+                        height - int(np.asarray(stats["border_bottom"])[lit].min()))
+
+
+def extract_sample_frames(input_file, samples=ANALYSIS_SAMPLES):
+    """
+    Decode one full-resolution luma frame from each sampled clip, in parallel.
+    
+    Returns:
+        List of uint8 NumPy arrays (height x width); failed samples are left out
+    """
+    import numpy as np
+    
+    info = probe_video(input_file)
+    if not info:
+        return []
+    width, height = info["width"], info["height"]
+    
+    def grab(start):
+        cmd = [
+            get_ffmpeg_path(), "-nostdin", "-v", "error", "-ss", f"{start:.1f}", "-i", input_file,
+            "-map", "0:v:0", "-frames:v", "1", "-vf", "format=gray", "-f", "rawvideo", "pipe:1"
+        ]
+        result = run_stage_capture(cmd)
+        if result.returncode != 0 or len(result.stdout) < width * height:
+            return None
+        return np.frombuffer(result.stdout[:width * height], dtype=np.uint8).reshape(height, width)
+    
+    starts = analysis_sample_starts(get_duration(input_file), samples, 1)
+    workers = max(min(len(starts), len(get_available_cores()) // 2), 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [frame for frame in pool.map(grab, starts) if frame is not None]
+
+
+def _upscale_matrix(native, height, kernel):
+    """Matrix (height x native) that upscales columns of `native` rows with a kernel."""
+    import numpy as np
+    
+    centers = (np.arange(height) + 0.5) * native / height - 0.5
+    x = np.abs(np.arange(native)[None, :] - centers[:, None])
+    if kernel is None:
+        weights = np.clip(1 - x, 0, None)
+    else:
+        b, c = kernel
+        weights = np.where(
+            x < 1, ((12 - 9 * b - 6 * c) * x ** 3 + (-18 + 12 * b + 6 * c) * x ** 2 + (6 - 2 * b)) / 6,
+            np.where(x < 2, ((-b - 6 * c) * x ** 3 + (6 * b + 30 * c) * x ** 2
+                             + (-12 * b - 48 * c) * x + (8 * b + 24 * c)) / 6, 0))
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def detect_native_resolution(input_file):
+    """
+    Estimate the height a source was drawn at before it was upscaled.
+    
+    Rescale error: for each candidate height and upscaling kernel, the sampled
+    luma columns are projected onto everything that upscaler can produce from
+    that height (least squares), and the residual is measured. A source
+    upscaled from that height is reproduced almost exactly, so its residual
+    dips far below that of neighbouring heights. Frequency check: an upscale
+    carries almost no vertical spectral energy above the native height's
+    Nyquist limit, which rules out dips caused by soft, out-of-focus frames.
+    
+    Returns:
+        Dict with the source height, the native height and kernel (None when
+        the source looks native), and the error ratio and high-frequency share
+    """
+    import numpy as np
+    
+    frames = [f for f in extract_sample_frames(input_file) if f.std() >= 8]
+    result = {"source": None, "height": None, "kernel": None, "ratio": None, "high_frequency": None,
+              "frames": len(frames)}
+    if not frames:
+        return result
+    height = frames[0].shape[0]
+    result["source"] = height
+    candidates = [h for h in NATIVE_CANDIDATE_HEIGHTS if height * 0.45 <= h < height * 0.95]
+    if len(candidates) < 2:
+        return result
+    
+    # Columns of every frame side by side: one matrix product per height and kernel
+    picked = np.linspace(0, frames[0].shape[1] - 1, NATIVE_COLUMNS).astype(int)
+    columns = np.hstack([f[:, picked] for f in frames]).astype(np.float32) / 255
+    inner = slice(16, height - 16)   # Edge rows depend on the upscaler's border handling
+    errors = np.empty((len(NATIVE_KERNELS), len(candidates)))
+    for k, kernel in enumerate(NATIVE_KERNELS.values()):
+        for i, h in enumerate(candidates):
+            upscale = _upscale_matrix(h, height, kernel).astype(np.float32)
+            descaled = np.linalg.solve(upscale.T @ upscale, upscale.T @ columns)
+            residual = columns - upscale @ descaled
+            errors[k, i] = np.abs(residual[inner]).mean()
+    
+    # A dip: error well below both neighbouring candidate heights
+    padded = np.pad(errors, ((0, 0), (1, 1)), mode="edge")
+    neighbours = np.minimum(np.where(np.arange(len(candidates)) == 0, np.inf, padded[:, :-2]),
+                            np.where(np.arange(len(candidates)) == len(candidates) - 1, np.inf, padded[:, 2:]))
+    ratios = errors / np.maximum(neighbours, 1e-9)
+    k, i = np.unravel_index(np.argmin(ratios), ratios.shape)
+    native = candidates[i]
+    
+    power = (np.abs(np.fft.rfft(columns[inner] - columns[inner].mean(axis=0), axis=0)) ** 2).sum(axis=1)
+    cutoff = int(len(power) * native / height)
+    high_frequency = float(power[cutoff:].sum() / max(power[1:].sum(), 1e-12))
+    
+    result.update(ratio=round(float(ratios[k, i]), 3), high_frequency=round(high_frequency, 4))
+    if ratios[k, i] <= NATIVE_MAX_ERROR_RATIO and high_frequency <= NATIVE_MAX_HIGH_FREQUENCY:
+        result.update(height=native, kernel=list(NATIVE_KERNELS)[k])
+    return result
+
+
+def choose_native_resolution(input_file, resolution, mode):
+    """
+    Report a source's native height and, in 'auto' mode, encode at it.
+    
+    The target never goes above the requested resolution; the savings are
+    estimated from the pixel rate, which encode time follows closely.
+    
+    Returns:
+        Resolution to encode at (the requested one unless 'auto' lowers it)
+    """
+    native = cached_source_analysis(input_file, "native", detect_native_resolution)
+    if not native["height"]:
+        detail = f" (best dip {native['ratio']:.2f}, high-frequency share {native['high_frequency']:.1%})" \
+            if native["ratio"] is not None else ""
+        print(f"📐 Native resolution: no upscale detected, looks native at {native['source'] or '?'}p{detail}")
+        return resolution
+    
+    target = native["source"] if resolution == "source" else int(resolution)
+    height = native["height"] + native["height"] % 2
+    print(f"📐 Native resolution: {native['height']}p ({native['kernel']} upscale to {native['source']}p, "
+          f"error dip {native['ratio']:.2f}, high-frequency share {native['high_frequency']:.1%})")
+    if height >= target:
+        print(f"   Target {target}p is already at or below the native height")
+        return resolution
+    saving = 1 - (height / target) ** 2
+    print(f"   {height}p instead of {target}p: {saving:.0%} fewer pixels per second, "
+          f"encode time ~{saving:.0%} lower")
+    if mode == "auto":
+        print(f"   Encoding at {height}p")
+        return str(height)
+    print("   Recommended: --native-resolution auto")
+    return resolution
+
+
+def build_source_filters(input_file, analysis):
+    """
+    Filters to put in front of decimation and scaling for a source.
+    
+    Args:
+        analysis: Dict of enabled pre-analyses ('telecine': True, 'crop': True);
+                  with 'frame_stats': True they read the frame statistics
+                  index (built on first use) instead of sampling clips
+    
+    Returns:
+        Dict with the comma-separated filter 'chain' and the 'height_ratio'
+        left after cropping (for build_scale_filter), or None when nothing applies
+    """
+    # frame_stats alone is only a data source; it does not justify a decode
+    if not analysis or not (analysis.get("telecine") or analysis.get("crop")):
+        return None
+    filters = []
+    height_ratio = 1.0
+    stats = get_frame_stats(input_file) if analysis.get("frame_stats") else None
+    
+    if analysis.get("telecine"):
+        fields = field_type_from_frame_stats(stats) if stats else \
+            cached_source_analysis(input_file, "fields", detect_field_type)
+        print(f"🔎 Field analysis: {fields['type']} (combed {fields['combed']:.0%}, "
+              f"repeated fields {fields['repeated']:.0%})"
+              + (f" → {fields['filter']}" if fields["filter"] else ""))
+        if fields["filter"]:
+            filters.append(fields["filter"])
+    
+    # Crop after field processing: fieldmatch/bwdif need the full field structure
+    if analysis.get("crop"):
+        crop = crop_from_frame_stats(stats) if stats else cached_source_analysis(input_file, "crop", detect_crop)
+        basis = crop.get("basis", "clips")
+        if crop["filter"]:
+            w, h, x, y = crop["crop"]
+            src_w, src_h = crop["source"]
+            print(f"✂️  Crop: {src_w}x{src_h} → {w}x{h} at +{x}+{y} "
+                  f"(saves {crop['saved']:.1%} of pixels, {crop['samples']} {basis} agree)")
+            filters.append(crop["filter"])
+            height_ratio = h / src_h
+        else:
+            print(f"✂️  Crop: no stable black bars found ({crop['samples']} usable {basis})")
+    
+    if not filters:
+        return None
+    return {"chain": ",".join(filters), "height_ratio": height_ratio}
+
+
+# ========== STAGE 1: VIDEO ENCODING ==========
+
+def encode_video(input_file, output_file, resolution, preset, crf=30, threads=None, cores=None,
+                 encoder="svtav1", idle=False, follow=None, decimate=False, source_filters=None):
+    """
+    Encode video with low priority (SVT-AV1 by default).
+    
+    Args:
+        input_file: Path to input video
+        output_file: Path to output video
+        resolution: Target resolution (source, 1440, 1080, 720)
+        preset: Speed level on the SVT-AV1 preset scale (0-13, lower=slower/better)
+        crf: Quality on the SVT-AV1 CRF scale (0-63, lower=better quality)
+        threads: Optional encoder thread target (SVT-AV1 'lp'; default: all cores)
+        cores: Optional core ids to pin the encode to ('lp' follows their count)
+        encoder: Backend name from ENCODER_BACKENDS
+        idle: Run at idle priority (archival encodes behind proxy work)
+        follow: Optional idle seconds - encode a growing file as it is written
+        decimate: Drop duplicate frames (mpdecimate) and write variable frame
+                  rate; kept frames keep their source timestamps, so audio
+                  and subtitles stay in sync
+        source_filters: Optional result of build_source_filters - its chain is
+                        applied first and scaling accounts for any crop
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    backend = ENCODER_BACKENDS[encoder]
+    
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 1/3] Encoding Video: {os.path.basename(input_file)}")
+    print(f"{'='*60}")
+    print(f"Encoder: {backend['label']} | Resolution: {resolution}p | Preset: {preset} | CRF: {crf}\n")
+    
+    # Decoder/filter threading and scaler recommended by profile_pipeline()
+    tuning = get_pipeline_tuning(input_file, resolution) or {}
+    input_opts = ["-threads", str(tuning["decode_threads"])] if tuning.get("decode_threads") else []
+    if tuning.get("filter_threads"):
+        input_opts = ["-filter_threads", str(tuning["filter_threads"])] + input_opts
+    input_opts += follow_input_options(follow)
+    
+    # Build scaling filter
+    source_filters = source_filters or {}
+    scale = build_scale_filter(resolution, tuning.get("scaler", "lanczos"),
+                               source_filters.get("height_ratio", 1.0))
+    if decimate:
+        scale = f"{DECIMATE_FILTER},{scale}"
+    if source_filters.get("chain"):
+        scale = f"{source_filters['chain']},{scale}"
+    
+    if cores and not threads:
+        threads = len(cores)
+    
+    # Build encoding command
+    partial_file = partial_output_path(output_file)
+    cmd = [
+        ffmpeg_path, "-y", *input_opts, "-i", input_file,
+        "-vf", scale,
+        *(["-fps_mode", "vfr"] if decimate else []),
+        "-c:v", backend["codec"],
+        *backend["args"](preset, crf, threads),
+        "-c:a", "libopus",
+        "-b:a", "128k",
+        "-metadata", f"comment=Converted {backend['label']} P{preset} CRF{crf}",
+        partial_file
+    ]
+    
+    # Execute with low priority
+    result = run_stage_command(cmd, encode_stage_key(resolution, encoder=encoder), cores=cores, idle=idle)
+    publish_output(partial_file, output_file, result.returncode)
+    print(f"✅ Video encoding complete: {output_file}\n")
+
+
+def parse_renditions(text):
+    """
+    Parse a rendition list like '1080:6:30,720:10:34' (resolution:preset[:crf]).
+    
+    Outputs are named by resolution (rendition_suffix), so each resolution
+    may appear only once.
+    
+    Raises:
+        ValueError: On a malformed entry or a repeated resolution
+    """
+    renditions = []
+    for entry in text.split(","):
+        parts = entry.strip().split(":")
+        if len(parts) not in (2, 3) or not (parts[0] == "source" or parts[0].isdigit()):
+            raise ValueError(f"Invalid rendition '{entry.strip()}' (use resolution:preset[:crf])")
+        if any(r["resolution"] == parts[0] for r in renditions):
+            raise ValueError(f"Resolution {parts[0]} is listed twice (renditions are named by resolution)")
+        renditions.append({
+            "resolution": parts[0],
+            "preset": int(parts[1]),
+            "crf": int(parts[2]) if len(parts) == 3 else 30,
+        })
+    return renditions
+
+
+def rendition_suffix(rendition):
+    """File name tag for a rendition ('_720p', '_source')."""
+    res = rendition["resolution"]
+    return "_source" if res == "source" else f"_{res}p"
+
+
+def encode_renditions(input_file, outputs, threads=None, cores=None, encoder="svtav1", follow=None,
+                      decimate=False, source_filters=None):
+    """
+    Encode several renditions from a single decode.
+    
+    The decoded video is split once (ffmpeg split filter) and every branch is
+    scaled and encoded with its own preset/CRF into its own output, so the
+    source is read and decoded only once.
+    
+    Args:
+        input_file: Path to input video
+        outputs: List of (rendition dict, output path) pairs
+        threads: Optional total encoder thread target, shared between renditions
+        cores: Optional core ids to pin the encode to
+        encoder: Backend name from ENCODER_BACKENDS
+        follow: Optional idle seconds - encode a growing file as it is written
+        decimate: Drop duplicate frames once, before the split (see encode_video)
+        source_filters: Optional result of build_source_filters, applied once before the split
+    """
+    backend = ENCODER_BACKENDS[encoder]
+    
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 1/3] Encoding {len(outputs)} Renditions: {os.path.basename(input_file)}")
+    print(f"{'='*60}")
+    for rendition, _ in outputs:
+        print(f"  {backend['label']} | {rendition['resolution']}p | Preset: {rendition['preset']} | CRF: {rendition['crf']}")
+    print()
+    
+    if cores and not threads:
+        threads = len(cores)
+    per_rendition = max(threads // len(outputs), 1) if threads else None
+    
+    tuning = get_pipeline_tuning(input_file, outputs[0][0]["resolution"]) or {}
+    input_opts = ["-threads", str(tuning["decode_threads"])] if tuning.get("decode_threads") else []
+    input_opts += follow_input_options(follow)
+    
+    labels = [f"[v{i}]" for i in range(len(outputs))]
+    source_filters = source_filters or {}
+    shared = "".join(f"{f}," for f in (source_filters.get("chain"), DECIMATE_FILTER if decimate else None) if f)
+    graph = f"[0:v:0]{shared}split={len(outputs)}{''.join(labels)};" + ";".join(
+        f"{label}{build_scale_filter(rendition['resolution'], tuning.get('scaler', 'lanczos'), source_filters.get('height_ratio', 1.0))}[out{i}]"
+        for i, (label, (rendition, _)) in enumerate(zip(labels, outputs))
+    )
+    
+    cmd = [get_ffmpeg_path(), "-y", *input_opts, "-i", input_file, "-filter_complex", graph]
+    partials = []
+    for i, (rendition, output_file) in enumerate(outputs):
+        partial_file = partial_output_path(output_file)
+        partials.append(partial_file)
+        cmd += [
+            "-map", f"[out{i}]", "-map", "0:a:0?",
+            *(["-fps_mode", "vfr"] if decimate else []),
+            "-c:v", backend["codec"],
+            *backend["args"](rendition["preset"], rendition["crf"], per_rendition),
+            "-c:a", "libopus",
+            "-b:a", "128k",
+            "-metadata", f"comment=Converted {backend['label']} P{rendition['preset']} CRF{rendition['crf']}",
+            partial_file
+        ]
+    
+    result = run_stage_command(cmd, encode_stage_key(outputs[0][0]["resolution"], encoder=encoder),
+                               cores=cores)
+    errors = []
+    for partial_file, (_, output_file) in zip(partials, outputs):
+        try:
+            publish_output(partial_file, output_file, result.returncode)
+        except RuntimeError as e:
+            errors.append(str(e))
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    print(f"✅ Rendition encoding complete: {', '.join(os.path.basename(o) for _, o in outputs)}\n")
+
+
+# ========== STREAMING AUDIO DECODE ==========
+
+def open_pcm_stream(input_file, start=None, duration=None, follow=None):
+    """
+    Start ffmpeg decoding the first audio track to 16 kHz mono s16le on stdout.
+    
+    Args:
+        input_file: Path to video/audio file
+        start: Optional seek position in seconds
+        duration: Optional length to decode in seconds
+        follow: Optional idle seconds - keep reading a growing file (see follow_input_options)
+    
+    Returns:
+        subprocess.Popen with the PCM stream on .stdout
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    cmd = [ffmpeg_path, "-nostdin", "-v", "error"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += follow_input_options(follow)
+    cmd += ["-i", input_file]
+    if duration:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += [
+        "-map", "0:a:0", "-vn",
+        "-ac", "1",
+        "-ar", str(PCM_SAMPLE_RATE),
+        "-f", "s16le",
+        "pipe:1"
+    ]
+    return launch_stage_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _read_fully(stream, view):
+    """Fill a memoryview from a pipe, returning the number of bytes read."""
+    total = 0
+    while total < len(view):
+        count = stream.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+def _find_quiet_cut(np, samples):
+    """Return a sample index near the end of the window with the lowest energy."""
+    frame = PCM_SAMPLE_RATE * STREAM_CUT_FRAME_MS // 1000
+    search = min(len(samples), PCM_SAMPLE_RATE * STREAM_CUT_SEARCH_SECONDS)
+    frames = search // frame
+    if frames < 2:
+        return len(samples)
+    tail = samples[len(samples) - frames * frame:].reshape(frames, frame)
+    energy = np.abs(tail.astype(np.float32)).sum(axis=1)
+    quietest = int(np.argmin(energy))
+    return len(samples) - (frames - quietest) * frame + frame // 2
+
+
+def _iter_array_windows(np, samples, window_samples, base_offset):
+    """Yield windows from an in-memory (or memory-mapped) array as zero-copy slices."""
+    pos = 0
+    while pos < len(samples):
+        end = min(pos + window_samples, len(samples))
+        if end < len(samples):
+            end = pos + _find_quiet_cut(np, samples[pos:end])
+        yield base_offset + pos / PCM_SAMPLE_RATE, samples[pos:end]
+        pos = end
+
+
+def iter_pcm_windows(input_file, window_seconds=STREAM_WINDOW_SECONDS, start=None, duration=None,
+                     cache=None, follow=None):
+    """
+    Decode audio as a stream and yield it in fixed-size windows.
+    
+    The same two NumPy buffers are reused for every window, so peak memory
+    depends on window_seconds, not on the input duration. Windows are cut at
+    the quietest point near their end (the remainder carries over) so words
+    are not split between model calls. Each yielded array is only valid until
+    the next iteration.
+    
+    With a feature cache (see load_cached_pcm), a cached file is served as
+    slices of a memory map without running ffmpeg, and a full decode of an
+    uncached file is written to the cache as it streams.
+    
+    With follow (idle seconds), a file that is still being written is read
+    as it grows; the cache is bypassed since the content is not final.
+    
+    Yields:
+        (offset_seconds, float32 array in [-1, 1])
+    """
+    import numpy as np
+    
+    window_samples = int(window_seconds * PCM_SAMPLE_RATE)
+    if follow:
+        cache = None
+    
+    if cache:
+        cached = load_cached_pcm(input_file, cache)
+        if cached is not None:
+            first = int((start or 0) * PCM_SAMPLE_RATE)
+            last = first + int(duration * PCM_SAMPLE_RATE) if duration else len(cached)
+            yield from _iter_array_windows(np, cached[first:last], window_samples, start or 0)
+            return
+    
+    raw = np.empty(window_samples, dtype=np.int16)
+    audio = np.empty(window_samples, dtype=np.float32)
+    raw_bytes = memoryview(raw).cast('B')
+    
+    # Only full decodes are worth caching
+    cache_file = None
+    if cache and start is None and duration is None:
+        cache_path = get_pcm_cache_path(input_file, cache)
+        partial_path = f"{cache_path}.{os.getpid()}.partial"
+        cache_file = open(partial_path, "wb")
+    
+    proc = open_pcm_stream(input_file, start, duration, follow)
+    stderr_tail = drain_stderr(proc)
+    carry = 0
+    offset = 0
+    completed = False
+    try:
+        while True:
+            filled = carry + _read_fully(proc.stdout, raw_bytes[carry * 2:]) // 2
+            if filled == 0:
+                completed = True
+                break
+            at_eof = filled < window_samples
+            cut = filled if at_eof else _find_quiet_cut(np, raw[:filled])
+            
+            np.multiply(raw[:cut], 1.0 / 32768.0, out=audio[:cut], casting='unsafe')
+            if cache_file:
+                audio[:cut].tofile(cache_file)
+            yield (start or 0) + offset / PCM_SAMPLE_RATE, audio[:cut]
+            
+            carry = filled - cut
+            raw[:carry] = raw[cut:filled]
+            offset += cut
+            if at_eof:
+                completed = True
+                break
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        stderr = stderr_tail()
+        if cache_file:
+            cache_file.close()
+            if completed and proc.returncode == 0 and offset > 0:
+                os.replace(partial_path, cache_path)
+                enforce_pcm_cache_limit(cache)
+            else:
+                os.remove(partial_path)
+    
+    if proc.returncode != 0:
+        # A decode that died part-way would silently cut the transcript short;
+        # only a trailing error after the whole expected length is tolerated
+        decoded = offset / PCM_SAMPLE_RATE
+        total = get_duration(input_file) if not follow else 0
+        expected = max(total - (start or 0), 0) if total else None
+        if duration and expected is not None:
+            expected = min(expected, duration)
+        if expected is None or decoded < expected - STREAM_END_TOLERANCE_SECONDS:
+            raise RuntimeError(f"ffmpeg audio decode failed after {decoded:.0f}s"
+                               + (f" of {expected:.0f}s" if expected is not None else "")
+                               + f": {stderr or proc.returncode}")
+        print(f"⚠️  ffmpeg reported an error at the end of the audio: "
+              f"{stderr.splitlines()[-1] if stderr else proc.returncode}")
+
+
+# ========== AUDIO FEATURE CACHE ==========
+
+
+def get_file_fingerprint(file, sample_bytes=1024 * 1024):
+    """
+    Cheap content fingerprint for large media files.
+    
+    Hashes the file size plus 1 MiB from the start, middle and end, so a
+    renamed or copied file keeps its key while a re-release gets a new one.
+    """
+    import hashlib
+    
+    size = os.path.getsize(file)
+    digest = hashlib.sha1(str(size).encode())
+    with open(file, "rb") as handle:
+        for position in (0, max(size // 2 - sample_bytes // 2, 0), max(size - sample_bytes, 0)):
+            handle.seek(position)
+            digest.update(handle.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def get_pcm_cache_path(input_file, cache):
+    """Cache path for a file's decoded audio, keyed by fingerprint and decode format."""
+    key = f"{get_file_fingerprint(input_file)}_a0_{PCM_SAMPLE_RATE}hz_f32"
+    return os.path.join(cache["dir"], f"{key}.pcm")
+
+
+def load_cached_pcm(input_file, cache):
+    """
+    Return a read-only memory map of the cached 16 kHz float32 audio, or None.
+    
+    Nothing is read up front; pages are loaded as windows are sliced, so a
+    re-run with another model or beam size skips decode entirely.
+    """
+    import numpy as np
+    
+    path = get_pcm_cache_path(input_file, cache)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    os.utime(path)  # Mark as recently used for eviction
+    print(f"⚡ Feature cache hit: {os.path.basename(path)}")
+    return np.memmap(path, dtype=np.float32, mode='r')
+
+
+def enforce_pcm_cache_limit(cache):
+    """Evict least recently used cache entries until the cache fits its size limit."""
+    limit = cache.get("max_gb", 20) * 1024**3
+    entries = []
+    for entry in os.scandir(cache["dir"]):
+        if entry.name.endswith(".pcm"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            print(f"🧹 Feature cache evicted: {os.path.basename(path)}")
+        except OSError:
+            pass  # In use by another process (Windows) - try the next one
+
+
+# ========== IN-PROCESS WHISPER ==========
+
+_WHISPER_MODELS = {}
+_WHISPER_MODELS_LOCK = threading.Lock()
+
+
+def load_whisper_model(model_name, device="cuda", compute_type="int8", cpu_threads=0, num_workers=1):
+    """
+    Load a faster-whisper model once per process and reuse it.
+    
+    num_workers lets that many threads transcribe concurrently on the same
+    model (each with cpu_threads intra-op threads on CPU).
+    """
+    key = (model_name, device, compute_type, cpu_threads, num_workers)
+    with _WHISPER_MODELS_LOCK:
+        if key not in _WHISPER_MODELS:
+            from faster_whisper import WhisperModel
+            _WHISPER_MODELS[key] = WhisperModel(
+                model_name,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers
+            )
+        return _WHISPER_MODELS[key]
+
+
+def format_srt_timestamp(seconds):
+    """Format seconds as an SRT timestamp (HH:MM:SS,mmm)."""
+    millis = int(round(max(seconds, 0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_srt_cue(handle, index, cue):
+    """Write a single cue dict ({'start', 'end', 'text'}) to an open SRT file."""
+    handle.write(f"{index}\n")
+    handle.write(f"{format_srt_timestamp(cue['start'])} --> {format_srt_timestamp(cue['end'])}\n")
+    handle.write(f"{cue['text'].strip()}\n\n")
+
+
+def write_srt(srt_file, cues):
+    """Write a list of cue dicts to an SRT file."""
+    with open(srt_file, "w", encoding="utf-8") as handle:
+        for index, cue in enumerate(cues, 1):
+            write_srt_cue(handle, index, cue)
+
+
+def iter_transcribed_segments(audio_windows, model, task="translate", language="ja", beam_size=5):
+    """
+    Run Whisper over a stream of audio windows.
+    
+    Args:
+        audio_windows: Iterable of (offset_seconds, float32 array)
+        model: faster-whisper model from load_whisper_model()
+    
+    Yields:
+        Cue dicts with absolute start/end times, text and decoder statistics
+    """
+    prompt = None
+    for offset, audio in audio_windows:
+        segments, _ = model.transcribe(
+            audio,
+            task=task,
+            language=language,
+            beam_size=beam_size,
+            vad_filter=True,
+            vad_parameters={"min_silence_duration_ms": 500},
+            initial_prompt=prompt
+        )
+        for segment in segments:
+            text = segment.text.strip()
+            if not text:
+                continue
+            yield {
+                "start": offset + segment.start,
+                "end": offset + segment.end,
+                "text": text,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob
+            }
+            # Carry context across windows like Whisper does within one
+            prompt = text
+
+
+def transcribe_streaming(input_file, srt_file, device="cuda", settings=None):
+    """
+    Transcribe a file in fixed windows without loading the whole track.
+    
+    Cues are written to the SRT as they are produced, so memory stays flat
+    for any input length.
+    
+    Returns:
+        Number of cues written
+    """
+    settings = settings or {}
+    model = load_whisper_model(
+        settings.get("model", "small"),
+        device,
+        settings.get("compute_type", "int8"),
+        settings.get("cpu_threads", 0),
+        settings.get("num_workers", 1)
+    )
+    windows = iter_pcm_windows(
+        input_file, settings.get("window_seconds", STREAM_WINDOW_SECONDS),
+        cache=settings.get("feature_cache"),
+        follow=settings.get("follow")
+    )
+    
+    count = 0
+    with open(srt_file, "w", encoding="utf-8") as handle:
+        for cue in iter_transcribed_segments(
+            windows, model,
+            task=settings.get("task", "translate"),
+            language=settings.get("language", "ja"),
+            beam_size=settings.get("beam_size", 5)
+        ):
+            count += 1
+            write_srt_cue(handle, count, cue)
+            print(f"[{format_srt_timestamp(cue['start'])}] {cue['text']}", flush=True)
+    return count
+
+
+# ========== CASCADE TRANSCRIPTION ==========
+
+def needs_refinement(cue):
+    """Return True if a draft segment looks unreliable enough to re-decode."""
+    low, high = CASCADE_NO_SPEECH_RANGE
+    return (
+        cue["avg_logprob"] < CASCADE_LOGPROB_THRESHOLD
+        or cue["compression_ratio"] > CASCADE_COMPRESSION_THRESHOLD
+        or low <= cue["no_speech_prob"] <= high
+    )
+
+
+def group_refine_spans(cues):
+    """
+    Group flagged draft cues into padded time spans to re-decode.
+    
+    Returns:
+        List of (start, end) tuples in seconds, sorted and non-overlapping
+    """
+    spans = []
+    for cue in cues:
+        if not needs_refinement(cue):
+            continue
+        start = max(cue["start"] - CASCADE_SPAN_PADDING, 0)
+        end = cue["end"] + CASCADE_SPAN_PADDING
+        if spans and start - spans[-1][1] <= CASCADE_MERGE_GAP:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def cascade_cues(input_file, device="cuda", settings=None):
+    """
+    Transcribe with a fast draft model, re-decoding only weak spans with a larger one.
+    
+    The draft pass streams the whole file; the refine pass decodes only the
+    flagged spans. Draft cues inside a refined span are replaced by the larger
+    model's cues.
+    
+    Returns:
+        (cues sorted by start time, refined_span_count, refined_seconds)
+    """
+    settings = settings or {}
+    compute_type = settings.get("compute_type", "int8")
+    cpu_threads = settings.get("cpu_threads", 0)
+    num_workers = settings.get("num_workers", 1)
+    task = settings.get("task", "translate")
+    language = settings.get("language", "ja")
+    
+    # Pass 1: fast draft over the whole file
+    draft_model = load_whisper_model(
+        settings.get("draft_model", "small"), device, compute_type, cpu_threads, num_workers
+    )
+    windows = iter_pcm_windows(
+        input_file, settings.get("window_seconds", STREAM_WINDOW_SECONDS),
+        cache=settings.get("feature_cache")
+    )
+    cues = list(iter_transcribed_segments(windows, draft_model, task, language, beam_size=1))
+    spans = group_refine_spans(cues)
+    refined_seconds = sum(end - start for start, end in spans)
+    print(f"📝 Draft: {len(cues)} segments, {len(spans)} span(s) / {refined_seconds:.0f}s flagged for re-decode")
+    
+    # Pass 2: re-decode flagged spans with the larger model
+    if spans:
+        refine_model = load_whisper_model(
+            settings.get("refine_model", "medium"), device, compute_type, cpu_threads, num_workers
+        )
+        for start, end in spans:
+            windows = iter_pcm_windows(
+                input_file, end - start + 1, start=start, duration=end - start,
+                cache=settings.get("feature_cache")
+            )
+            refined = list(iter_transcribed_segments(
+                windows, refine_model, task, language, beam_size=settings.get("beam_size", 5)
+            ))
+            cues = [c for c in cues if not start <= (c["start"] + c["end"]) / 2 < end]
+            cues.extend(refined)
+            print(f"   ↻ {format_srt_timestamp(start)} - {format_srt_timestamp(end)}: {len(refined)} cue(s)")
+    
+    cues.sort(key=lambda c: c["start"])
+    return cues, len(spans), refined_seconds
+
+
+def transcribe_cascade(input_file, srt_file, device="cuda", settings=None):
+    """
+    Run cascade_cues() and write the merged result to srt_file.
+    
+    Returns:
+        (cue_count, refined_span_count, refined_seconds)
+    """
+    cues, spans, refined_seconds = cascade_cues(input_file, device, settings)
+    write_srt(srt_file, cues)
+    return len(cues), spans, refined_seconds
+
+
+# ========== MULTI-LANGUAGE SUBTITLES ==========
+
+def translate_cues(cues, source, target):
+    """
+    Translate already-segmented cues with a local offline text model (Argos Translate).
+    
+    Timing is kept as-is; only the text changes. Argos pivots through English
+    when there is no direct model for the pair.
+    
+    Raises:
+        RuntimeError: If argostranslate or the language models are not installed
+    """
+    try:
+        import argostranslate.translate
+    except ImportError:
+        raise RuntimeError("argostranslate is not installed (pip install argostranslate)")
+    
+    installed = {lang.code: lang for lang in argostranslate.translate.get_installed_languages()}
+    translation = None
+    if source in installed and target in installed:
+        translation = installed[source].get_translation(installed[target])
+    if translation is None:
+        raise RuntimeError(f"No offline model for {source} → {target} (argospm install translate-{source}_{target})")
+    
+    return [dict(cue, text=translation.translate(cue["text"])) for cue in cues]
+
+
+def subtitle_track(srt_file, language):
+    """Describe an SRT file as a mux track with MKV language metadata."""
+    code, name = SUBTITLE_LANGUAGES.get(language, (language, language))
+    title = f"{name} (AI Transcript)" if language == "ja" else f"AI {name} Translation"
+    return {"path": srt_file, "language": code, "title": title}
+
+
+def generate_subtitle_tracks(input_file, device="cuda", settings=None):
+    """
+    Run recognition once and produce one SRT per requested language.
+    
+    Whisper transcribes in the source language (no translate task); every
+    other language is produced by translating the segmented cues offline.
+    
+    Returns:
+        List of track dicts for mux_subtitles() (may be empty on failure)
+    """
+    settings = settings or {}
+    source = settings.get("language", "ja")
+    languages = settings["languages"]
+    recognition = dict(settings, task="transcribe")
+    
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 2/3] Generating AI Subtitles ({', '.join(languages)})")
+    print(f"{'='*60}")
+    print(f"Device: {device.upper()}\n")
+    
+    try:
+        if settings.get("cascade") and not settings.get("follow"):
+            cues = cascade_cues(input_file, device, recognition)[0]
+        else:
+            model = load_whisper_model(
+                settings.get("model", "small"), device,
+                settings.get("compute_type", "int8"), settings.get("cpu_threads", 0),
+                settings.get("num_workers", 1)
+            )
+            windows = iter_pcm_windows(
+                input_file, settings.get("window_seconds", STREAM_WINDOW_SECONDS),
+                cache=settings.get("feature_cache"),
+                follow=settings.get("follow")
+            )
+            cues = list(iter_transcribed_segments(
+                windows, model, "transcribe", source, settings.get("beam_size", 5)
+            ))
+    except Exception as e:
+        print(f"⚠️  Transcription failed: {e}\n")
+        return []
+    
+    base_name = os.path.splitext(input_file)[0]
+    tracks = []
+    for language in languages:
+        try:
+            lang_cues = cues if language == source else translate_cues(cues, source, language)
+        except Exception as e:
+            print(f"⚠️  Skipping {language}: {e}")
+            continue
+        srt_file = f"{base_name}.{language}.srt"
+        write_srt(srt_file, lang_cues)
+        tracks.append(subtitle_track(srt_file, language))
+        print(f"✅ {language}: {srt_file} ({len(lang_cues)} cues)")
+    print()
+    return tracks
+
+
+# ========== LIVE SUBTITLES ==========
+# Low-latency subtitles for a live MPEG-TS feed (UDP, pipe or stdin). Cues
+# are emitted as soon as Whisper produces them and keep their ID while the
+# text is still provisional; a corrected cue is re-emitted with the same ID
+# (consumers replace it), and it becomes final once it has dropped out of
+# the sliding window.
+
+def open_live_pcm_stream(source, stdin=None):
+    """
+    Start ffmpeg decoding a live source to 16 kHz mono s16le with minimal buffering.
+    
+    Args:
+        source: udp://..., srt://..., pipe:0 or '-' for stdin (MPEG-TS expected)
+        stdin: Optional file object to feed ffmpeg's stdin (for '-' / pipe:0)
+    """
+    if source == "-":
+        source = "pipe:0"
+    cmd = [get_ffmpeg_path(), "-v", "error"]
+    if source != "pipe:0":
+        cmd.append("-nostdin")
+    cmd += [
+        "-fflags", "nobuffer", "-flags", "low_delay",
+        "-probesize", "65536", "-analyzeduration", "500000",
+        "-i", source,
+        "-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE),
+        "-f", "s16le", "pipe:1"
+    ]
+    return launch_stage_process(cmd, low_priority=False, stdin=stdin,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def start_live_pcm_reader(stream, capacity_samples):
+    """
+    Drain a live s16le pipe from a background thread into a ring buffer.
+    
+    The pipe is read as soon as data arrives, so ffmpeg never blocks on a
+    full pipe while a recognition pass runs. If the consumer falls more
+    than capacity_samples behind, the oldest unread audio is overwritten
+    (read_live_pcm reports it as skipped).
+    
+    Returns:
+        Ring dict for read_live_pcm()
+    """
+    import numpy as np
+    
+    ring = {"data": np.zeros(capacity_samples, dtype=np.int16), "written": 0, "read": 0,
+            "ended": False, "cond": threading.Condition()}
+    
+    def reader():
+        odd = b""
+        try:
+            while True:
+                chunk = stream.read1(LIVE_READ_BYTES)
+                if not chunk:
+                    break
+                chunk = odd + chunk
+                odd = chunk[len(chunk) & ~1:]
+                samples = np.frombuffer(chunk[:len(chunk) & ~1], dtype=np.int16)
+                piece = samples[-capacity_samples:]
+                with ring["cond"]:
+                    pos = (ring["written"] + len(samples) - len(piece)) % capacity_samples
+                    first = min(len(piece), capacity_samples - pos)
+                    ring["data"][pos:pos + first] = piece[:first]
+                    ring["data"][:len(piece) - first] = piece[first:]
+                    ring["written"] += len(samples)
+                    ring["cond"].notify_all()
+        except (OSError, ValueError):
+            pass  # Pipe closed on shutdown
+        finally:
+            with ring["cond"]:
+                ring["ended"] = True
+                ring["cond"].notify_all()
+    
+    threading.Thread(target=reader, daemon=True).start()
+    return ring
+
+
+def read_live_pcm(ring, min_samples, stop_event=None):
+    """
+    Take all buffered audio, waiting until at least min_samples have arrived.
+    
+    Returns:
+        (int16 array of new samples, samples skipped because the buffer
+         overflowed, True once the stream has ended and is drained)
+    """
+    import numpy as np
+    
+    capacity = len(ring["data"])
+    with ring["cond"]:
+        while ring["written"] - ring["read"] < min_samples and not ring["ended"]:
+            if stop_event is not None and stop_event.is_set():
+                break
+            ring["cond"].wait(0.25)
+        skipped = max(ring["written"] - ring["read"] - capacity, 0)
+        start = ring["read"] + skipped
+        count = ring["written"] - start
+        pos = start % capacity
+        first = min(count, capacity - pos)
+        samples = np.concatenate((ring["data"][pos:pos + first], ring["data"][:count - first]))
+        ring["read"] = ring["written"]
+        return samples, skipped, ring["ended"]
+
+
+def _match_live_cues(pending, segments):
+    """Pair segments with the provisional cues they overlap most in time (each used once)."""
+    pairs = sorted(
+        ((min(cue["end"], seg["end"]) - max(cue["start"], seg["start"]), i, j)
+         for i, seg in enumerate(segments) for j, cue in enumerate(pending)),
+        reverse=True
+    )
+    matches = {}
+    used = set()
+    for overlap, i, j in pairs:
+        if overlap <= 0:
+            break
+        if i not in matches and j not in used:
+            matches[i] = j
+            used.add(j)
+    return matches
+
+
+def format_vtt_timestamp(seconds):
+    """Format seconds as a WebVTT timestamp (HH:MM:SS.mmm)."""
+    return format_srt_timestamp(seconds).replace(",", ".")
+
+
+def write_live_cue(handle, cue, fmt="vtt"):
+    """Write (or re-write, for a correction) one live cue and flush it."""
+    if fmt == "vtt":
+        handle.write(f"cue-{cue['id']}\n")
+        handle.write(f"{format_vtt_timestamp(cue['start'])} --> {format_vtt_timestamp(cue['end'])}\n")
+    else:
+        handle.write(f"{cue['id']}\n")
+        handle.write(f"{format_srt_timestamp(cue['start'])} --> {format_srt_timestamp(cue['end'])}\n")
+    handle.write(f"{cue['text']}\n\n")
+    handle.flush()
+
+
+def run_live_subtitles(source, output, device="cuda", settings=None, fmt="vtt", stdin=None,
+                       stop_event=None):
+    """
+    Subtitle a live stream with a sliding recognition window.
+    
+    A reader thread buffers the decoded audio as it arrives. Each pass takes
+    all of it (at least LIVE_STEP_SECONDS) and recognises the audio since
+    the last final cue, at most window_seconds; if recognition is slower
+    than realtime the oldest audio is dropped, so the backlog stays bounded.
+    Segments that end well before the live edge are committed and their
+    audio dropped; the rest are emitted as provisional cues (matched to the
+    previous pass by time overlap) that may be corrected on the next pass.
+    
+    Args:
+        source: Live input (see open_live_pcm_stream)
+        output: Subtitle stream path, or '-' for stdout
+        settings: Optional {'model', 'language', 'task', 'beam_size', 'window_seconds', 'compute_type'}
+        fmt: 'vtt' or 'srt'
+    
+    Returns:
+        Latency stats {'first': [...], 'final': [...]} - seconds from a cue's
+        end in the stream to its first / final emission - plus 'backlog'
+        (seconds of audio waiting at the start of each pass) and 'skipped'
+        (seconds of audio dropped unrecognised)
+    """
+    import numpy as np
+    
+    settings = settings or {}
+    model = load_whisper_model(settings.get("model", "small"), device,
+                               settings.get("compute_type", "int8"))
+    window_samples = int(settings.get("window_seconds", LIVE_WINDOW_SECONDS) * PCM_SAMPLE_RATE)
+    step_samples = int(LIVE_STEP_SECONDS * PCM_SAMPLE_RATE)
+    
+    audio = np.zeros(window_samples, dtype=np.float32)
+    filled = 0          # Samples in the window
+    window_start = 0.0  # Stream time of audio[0]
+    
+    pending = []        # Provisional cues, in order
+    next_id = 1
+    latency = {"first": [], "final": [], "backlog": [], "skipped": 0.0}
+    
+    handle = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    if fmt == "vtt":
+        handle.write("WEBVTT\n\n")
+        handle.flush()
+    
+    proc = open_live_pcm_stream(source, stdin)
+    ring = start_live_pcm_reader(proc.stdout, max(int(LIVE_BUFFER_SECONDS * PCM_SAMPLE_RATE), window_samples))
+    wall_zero = None    # Wall clock of stream time 0 (first audio)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            new, skipped, ended = read_live_pcm(ring, step_samples, stop_event)
+            got = len(new)
+            if got:
+                if wall_zero is None:
+                    wall_zero = time.time() - got / PCM_SAMPLE_RATE
+                latency["backlog"].append((skipped + got) / PCM_SAMPLE_RATE)
+                latency["skipped"] += skipped / PCM_SAMPLE_RATE
+                
+                # Keep the newest window_samples of (window + skipped + new)
+                drop = max(filled + skipped + got - window_samples, 0)
+                if drop:
+                    kept = max(filled - drop, 0)
+                    audio[:kept] = audio[filled - kept:filled]
+                    new = new[max(drop - filled - skipped, 0):]
+                    filled = kept
+                    window_start += drop / PCM_SAMPLE_RATE
+                np.multiply(new, 1.0 / 32768.0, out=audio[filled:filled + len(new)], casting='unsafe')
+                filled += len(new)
+                
+                # Cues whose audio was dropped unconfirmed stand as they are
+                while pending and pending[0]["end"] <= window_start:
+                    cue = pending.pop(0)
+                    latency["final"].append(time.time() - wall_zero - cue["end"])
+            
+            live_edge = window_start + filled / PCM_SAMPLE_RATE
+            segments = []
+            if filled:
+                result, _ = model.transcribe(
+                    audio[:filled],
+                    task=settings.get("task", "translate"),
+                    language=settings.get("language", "ja"),
+                    beam_size=settings.get("beam_size", 1),
+                    vad_filter=True,
+                    condition_on_previous_text=False
+                )
+                segments = [
+                    {"start": window_start + seg.start, "end": window_start + seg.end,
+                     "text": seg.text.strip()}
+                    for seg in result if seg.text.strip()
+                ]
+            
+            # Match this pass to the provisional cues (overlapping in time -> same ID)
+            now = time.time()
+            matches = _match_live_cues(pending, segments)
+            cues = []
+            for i, segment in enumerate(segments):
+                if i in matches:
+                    cue = pending[matches[i]]
+                    changed = (cue["text"], round(cue["start"], 1), round(cue["end"], 1)) != \
+                              (segment["text"], round(segment["start"], 1), round(segment["end"], 1))
+                    cue.update(segment)
+                else:
+                    cue = dict(segment, id=next_id)
+                    next_id += 1
+                    changed = True
+                    latency["first"].append(now - wall_zero - cue["end"])
+                cue["final"] = ended or (cue["end"] <= live_edge - LIVE_COMMIT_LAG_SECONDS
+                                         and i < len(segments) - 1)
+                if changed:
+                    write_live_cue(handle, cue, fmt)
+                cues.append(cue)
+            for j, cue in enumerate(pending):
+                if j not in matches.values():
+                    # Text that disappeared on re-recognition is retracted
+                    write_live_cue(handle, dict(cue, text=""), fmt)
+            
+            # Commit the leading run of final cues and drop their audio
+            committed = 0
+            while committed < len(cues) and cues[committed]["final"]:
+                latency["final"].append(now - wall_zero - cues[committed]["end"])
+                committed += 1
+            if committed:
+                cut_time = cues[committed - 1]["end"]
+                cut = min(int((cut_time - window_start) * PCM_SAMPLE_RATE), filled)
+                audio[:filled - cut] = audio[cut:filled]
+                filled -= cut
+                window_start = cut_time
+            pending = cues[committed:]
+            
+            if ended:
+                break
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        if handle is not sys.stdout:
+            handle.close()
+    return latency
+
+
+def benchmark_live_latency(sample_file, device="cuda", settings=None, seconds=LIVE_BENCHMARK_SECONDS):
+    """
+    Measure live subtitle latency against a local realtime MPEG-TS stream.
+    
+    A second ffmpeg plays the sample's audio at native speed (-re) as
+    MPEG-TS into the live pipeline's stdin; cue latencies are summarised
+    as median and 95th percentile.
+    """
+    print(f"\n{'='*60}")
+    print(f"📡 Live subtitle latency benchmark ({seconds}s of {os.path.basename(sample_file)})")
+    print(f"{'='*60}\n")
+    
+    # Same (normal) priority as the live pipeline it feeds
+    sender = launch_stage_process([
+        get_ffmpeg_path(), "-v", "error", "-nostdin", "-re", "-t", str(seconds),
+        "-i", sample_file, "-map", "0:a:0", "-c:a", "aac", "-f", "mpegts", "pipe:1"
+    ], low_priority=False, stdout=subprocess.PIPE)
+    try:
+        latency = run_live_subtitles("-", os.devnull, device, settings, stdin=sender.stdout)
+    finally:
+        sender.stdout.close()
+        sender.kill()
+        sender.wait()
+    
+    def percentile(values, q):
+        values = sorted(values)
+        return values[min(int(q * len(values)), len(values) - 1)] if values else float('nan')
+    
+    for kind, label in (("first", "First emission"), ("final", "Final cue")):
+        values = latency[kind]
+        print(f"  {label:<15} p50 {percentile(values, 0.5):5.2f}s | p95 {percentile(values, 0.95):5.2f}s "
+              f"({len(values)} cues)")
+    
+    # A backlog that grows from the first to the last tenth of the run means
+    # recognition is slower than realtime (audio then gets skipped)
+    backlog = latency["backlog"]
+    if backlog:
+        tenth = max(len(backlog) // 10, 1)
+        first, last = sum(backlog[:tenth]) / tenth, sum(backlog[-tenth:]) / tenth
+        print(f"  {'Backlog':<15} start {first:5.2f}s | end {last:5.2f}s | growth {last - first:+5.2f}s "
+              f"| max {max(backlog):5.2f}s | skipped {latency['skipped']:.1f}s")
+    print(f"{'='*60}\n")
+    return latency
+
+
+# ========== STAGE 2: AI SUBTITLE GENERATION ==========
+
+def generate_subtitles(input_file, device="cuda", settings=None):
+    """
+    Generate English subtitles from Japanese audio using Whisper.
+    
+    Args:
+        input_file: Path to video file
+        device: 'cuda' or 'cpu'
+        settings: Optional transcription settings dict
+                  ('stream': True decodes audio in windows in-process,
+                   'cascade': True drafts with a fast model and re-decodes
+                   weak segments with a larger one,
+                   'follow': idle seconds - transcribe a growing file as it
+                   is written, always in streaming mode)
+    
+    Returns:
+        Path to generated SRT file, or None if failed
+    """
+    settings = settings or {}
+    if settings.get("follow"):
+        settings = dict(settings, stream=True, cascade=False)
+    
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 2/3] Generating AI Subtitles")
+    print(f"{'='*60}")
+    print(f"Device: {device.upper()}\n")
+    
+    # Determine output SRT path
+    base_name = os.path.splitext(input_file)[0]
+    srt_file = f"{base_name}.srt"
+    
+    if settings.get("cascade"):
+        print(f"Mode: Cascade ({settings.get('draft_model', 'small')} → {settings.get('refine_model', 'medium')})\n")
+        try:
+            count, spans, seconds = transcribe_cascade(input_file, srt_file, device, settings)
+        except Exception as e:
+            print(f"⚠️  Cascade transcription failed: {e}\n")
+            return None
+        print(f"✅ Subtitles generated: {srt_file} ({count} cues, {spans} span(s) refined)\n")
+        return srt_file
+    
+    if settings.get("stream"):
+        print(f"Mode: Streaming ({settings.get('window_seconds', STREAM_WINDOW_SECONDS)}s windows)\n")
+        try:
+            count = transcribe_streaming(input_file, srt_file, device, settings)
+        except Exception as e:
+            print(f"⚠️  Streaming transcription failed: {e}\n")
+            if os.path.exists(srt_file):
+                os.remove(srt_file)   # Cut short - must not be muxed or spliced as complete
+            return None
+        print(f"✅ Subtitles generated: {srt_file} ({count} cues)\n")
+        return srt_file
+    
+    # IMPORTANT: For Windows, VAD filter parameters must be escaped as JSON string
+    vad_params = json.dumps({"min_silence_duration_ms": 500})
+    
+    # Build Whisper command
+    cmd = [
+        "whisper-ctranslate2",
+        input_file,
+        "--model", "small",
+        "--task", "translate",
+        "--language", "ja",
+        "--device", device,
+        "--vad_filter", "True",
+        "--vad_parameters", vad_params,  # Escaped JSON string
+        "--compute_type", "int8",
+        "--output_format", "srt",
+        "--output_dir", os.path.dirname(os.path.abspath(input_file))
+    ]
+    
+    # Pin the thread count so concurrent workers don't oversubscribe cores
+    env = None
+    if settings.get("cpu_threads"):
+        cmd += ["--threads", str(settings["cpu_threads"])]
+        env = dict(os.environ, OMP_NUM_THREADS=str(settings["cpu_threads"]))
+    
+    # Execute subtitle generation
+    result = run_stage_command(cmd, f"transcribe:{device}", cores=settings.get("cores"), env=env)
+    
+    if result.returncode == 0 and os.path.exists(srt_file):
+        print(f"✅ Subtitles generated: {srt_file}\n")
+        return srt_file
+    else:
+        print(f"⚠️  Subtitle generation failed or file not found.\n")
+        return None
+
+
+# ========== TRANSCRIPTION WORKER POOL ==========
+
+def get_transcription_cores(reserve_cores=0):
+    """
+    Core ids left to transcription workers (this process's affinity, so taskset
+    and cgroup limits are honoured), after the first reserve_cores for the encode.
+    """
+    available = get_available_cores()
+    return available[min(reserve_cores, len(available) - 1):]
+
+
+def candidate_splits(cpu_budget):
+    """List (workers, threads) splits of a CPU budget, from one wide worker to many narrow ones."""
+    splits = []
+    threads = cpu_budget
+    while threads >= MIN_THREADS_PER_WORKER or not splits:
+        splits.append((cpu_budget // threads, threads))
+        threads //= 2
+    return splits
+
+
+def calibrate_transcription_split(sample_file, cpu_budget, model="small", cores=None):
+    """
+    Pick the workers x threads split with the best aggregate throughput.
+    
+    A short clip from the middle of sample_file is transcribed by every
+    candidate split at once (N concurrent whisper-ctranslate2 processes with
+    T threads each, pinned to disjoint slices of `cores`, by default all
+    available cores). Results are cached per budget and model, since they
+    only depend on the machine.
+    
+    Returns:
+        (workers, threads)
+    """
+    cache_file = os.path.join(get_cache_dir("calibration"), "transcription_split.json")
+    key = f"{cpu_budget}:{model}"
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    if key in cached:
+        workers, threads = cached[key]["split"]
+        print(f"⚙️  Using calibrated split: {workers} worker(s) x {threads} thread(s)")
+        return workers, threads
+    
+    print(f"\n{'='*60}")
+    print(f"⏱️  Calibrating CPU transcription split ({cpu_budget} cores)")
+    print(f"{'='*60}\n")
+    
+    work_dir = tempfile.mkdtemp(prefix="anime_subber_calib_")
+    clip = os.path.join(work_dir, "clip.wav")
+    start = max(get_duration(sample_file) / 2 - CALIBRATION_SAMPLE_SECONDS / 2, 0)
+    run_stage_capture([
+        get_ffmpeg_path(), "-v", "error", "-y",
+        "-ss", f"{start:.1f}", "-t", str(CALIBRATION_SAMPLE_SECONDS),
+        "-i", sample_file, "-vn", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), clip
+    ])
+    
+    # Workers run like real transcription workers: low priority, each on its own cores
+    available = cores or get_available_cores()
+    results = {}
+    for workers, threads in candidate_splits(cpu_budget):
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+        started = time.time()
+        procs = [
+            launch_stage_process([
+                "whisper-ctranslate2", clip,
+                "--model", model, "--task", "translate", "--language", "ja",
+                "--device", "cpu", "--compute_type", "int8",
+                "--threads", str(threads),
+                "--output_format", "srt",
+                "--output_dir", os.path.join(work_dir, f"{workers}x{threads}_{i}")
+            ], cores=available[i * threads:(i + 1) * threads] or None,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+            for i in range(workers)
+        ]
+        ok = all(proc.wait() == 0 for proc in procs)
+        elapsed = max(time.time() - started, 0.01)
+        speed = workers * CALIBRATION_SAMPLE_SECONDS / elapsed if ok else 0
+        results[(workers, threads)] = speed
+        print(f"  {workers:2d} worker(s) x {threads:2d} thread(s): {speed:5.1f}x realtime{'' if ok else ' (failed)'}")
+    
+    shutil.rmtree(work_dir, ignore_errors=True)
+    
+    workers, threads = max(results, key=results.get)
+    if results[(workers, threads)] > 0:
+        cached[key] = {"split": [workers, threads], "speeds": {f"{w}x{t}": v for (w, t), v in results.items()}}
+        write_json_atomic(cache_file, cached)
+    print(f"\n✅ Best split: {workers} worker(s) x {threads} thread(s)\n")
+    return workers, threads
+
+
+def start_transcription_pool(device, settings, workers, threads, cores=None):
+    """
+    Start a background pool that transcribes files concurrently.
+    
+    Each of the workers runs generate_subtitles() (or generate_subtitle_tracks()
+    for multi-language output) with `threads` CPU threads. Transcription
+    processes are pinned to disjoint slices of `cores`, one per running
+    file; in-process modes share one model loaded with num_workers=workers
+    and are not pinned. Submit files with executor.submit(transcribe, file);
+    each Future resolves to mux tracks or None.
+    
+    Returns:
+        (executor, transcribe function, stats dict)
+    """
+    settings = dict(settings or {}, cpu_threads=threads, num_workers=workers)
+    stats = {"audio_seconds": 0.0, "started": time.time(), "finished": None}
+    lock = threading.Lock()
+    slices = SimpleQueue()
+    for i in range(workers):
+        slices.put((cores or [])[i * threads:(i + 1) * threads] or None)
+    
+    def transcribe(input_file):
+        worker_cores = slices.get()
+        try:
+            worker_settings = dict(settings, cores=worker_cores)
+            if settings.get("languages"):
+                tracks = generate_subtitle_tracks(input_file, device, worker_settings) or None
+            else:
+                tracks = generate_subtitles(input_file, device, worker_settings)
+                if tracks and not os.path.exists(tracks):
+                    tracks = None
+        finally:
+            slices.put(worker_cores)
+        duration = get_duration(input_file) if tracks else 0
+        with lock:
+            stats["audio_seconds"] += duration
+            stats["finished"] = time.time()
+        return tracks
+    
+    executor = ThreadPoolExecutor(max_workers=workers)
+    return executor, transcribe, stats
+
+
+def report_pool_throughput(stats, workers, threads):
+    """Print aggregate transcription throughput so the split can be tuned."""
+    if not stats["finished"]:
+        return
+    elapsed = max(stats["finished"] - stats["started"], 0.01)
+    print(f"🎙️  Transcription pool: {workers} x {threads} threads | "
+          f"{stats['audio_seconds']/60:.1f} min audio in {elapsed/60:.1f} min | "
+          f"{stats['audio_seconds']/elapsed:.1f}x realtime aggregate")
+
+
+# ========== STAGE 3: MUXING ==========
+
+def mux_subtitles(video_file, srt_file, output_file):
+    """
+    Mux SRT subtitles into MKV container.
+    
+    Args:
+        video_file: Path to encoded video
+        srt_file: Path to SRT subtitle file, or a list of track dicts
+                  ({'path', 'language', 'title'}) to add in one pass
+        output_file: Path to final output
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    
+    if isinstance(srt_file, str):
+        tracks = [{"path": srt_file, "language": "eng", "title": "AI English Translation"}]
+    else:
+        tracks = srt_file
+    
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 3/3] Muxing Subtitles")
+    print(f"{'='*60}\n")
+    
+    cmd = [ffmpeg_path, "-y", "-i", video_file]
+    for track in tracks:
+        cmd += ["-i", track["path"]]
+    cmd += ["-map", "0"]
+    for i in range(len(tracks)):
+        cmd += ["-map", str(i + 1)]
+    cmd += ["-c", "copy", "-c:s", "srt"]
+    
+    # English is the default track when present, otherwise the first one
+    default = next((i for i, t in enumerate(tracks) if t["language"] == "eng"), 0)
+    for i, track in enumerate(tracks):
+        cmd += [
+            f"-metadata:s:s:{i}", f"language={track['language']}",
+            f"-metadata:s:s:{i}", f"title={track['title']}",
+            f"-disposition:s:{i}", "default" if i == default else "0"
+        ]
+    partial_file = partial_output_path(output_file)
+    cmd.append(partial_file)
+    
+    result = run_stage_command(cmd, "mux", low_priority=False)
+    publish_output(partial_file, output_file, result.returncode)
+    print(f"✅ Muxing complete: {output_file}\n")
+
+
+# ========== MAIN PROCESSING LOGIC ==========
+
+def process_single_file(input_file, device, resolution, preset, output_dir=None,
+                        transcribe_settings=None, subtitle_job=None, encode_threads=None,
+                        scheduler=None, encoder="svtav1", renditions=None, follow=None,
+                        segment_library=None, decimate=False, analysis=None):
+    """
+    Process a single video file through the complete pipeline.
+    
+    Args:
+        input_file: Path to input video
+        device: 'cuda' or 'cpu'
+        resolution: Target resolution
+        preset: SVT-AV1 preset
+        output_dir: Optional output directory (defaults to same as input)
+        transcribe_settings: Optional settings dict for generate_subtitles()
+        subtitle_job: Optional Future from the transcription pool (replaces Stage 2)
+        encode_threads: Optional SVT-AV1 thread target (cores left for the encode)
+        scheduler: Optional resource scheduler; each stage waits for its CPU,
+                   accelerator and memory slots before starting
+        encoder: Video encoder backend (see ENCODER_BACKENDS)
+        renditions: Optional list from parse_renditions() - encode every
+                    rendition from one decode (replaces resolution/preset) and
+                    mux the same subtitles into each
+        follow: Optional idle seconds - the input is still being written;
+                encode and transcription both read it as it grows (in
+                parallel) and finish once it stops growing for this long
+        segment_library: Optional per-season library folder - footage shared
+                         with other episodes (OP/ED) is encoded once and
+                         spliced in (see encode_with_segment_library)
+        decimate: Drop duplicate frames and encode variable frame rate,
+                  reporting frames removed and the speedup (see encode_video)
+        analysis: Optional dict of source pre-analyses to run and apply
+                  before encoding ('telecine': True, 'crop': True, 'native':
+                  'report'/'auto', 'frame_stats': True) - see
+                  build_source_filters and choose_native_resolution
+    
+    Returns:
+        Path to final output file (the first rendition's when several)
+    """
+    print(f"\n{'#'*60}")
+    print(f"# Processing: {os.path.basename(input_file)}")
+    print(f"{'#'*60}\n")
+    
+    # Determine output paths
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        temp_video = os.path.join(output_dir, f"{base_name}_encoded.mkv")
+        final_output = os.path.join(output_dir, f"{base_name}_final.mkv")
+    else:
+        input_dir = os.path.dirname(os.path.abspath(input_file))
+        temp_video = os.path.join(input_dir, f"{base_name}_encoded.mkv")
+        final_output = os.path.join(input_dir, f"{base_name}_final.mkv")
+    
+    # One encoded/final pair per rendition, tagged with its resolution
+    outputs = []
+    for rendition in renditions or []:
+        tag = rendition_suffix(rendition)
+        outputs.append((
+            rendition,
+            temp_video.replace("_encoded.mkv", f"{tag}_encoded.mkv"),
+            final_output.replace("_final.mkv", f"{tag}_final.mkv")
+        ))
+    
+    name = os.path.basename(input_file)
+    
+    # Media length for the speed history (0 skips recording if unreadable)
+    info = probe_video(input_file)
+    media_seconds = info["duration"] if info else 0
+    
+    def transcribe(settings):
+        if settings and settings.get("languages"):
+            return generate_subtitle_tracks(input_file, device, settings)
+        srt_file = generate_subtitles(input_file, device, settings)
+        return srt_file if srt_file and os.path.exists(srt_file) else None
+    
+    if follow and subtitle_job is None:
+        # Growing input: transcribe alongside the encode instead of after it
+        media_seconds = 0
+        follow_pool = ThreadPoolExecutor(max_workers=1)
+        subtitle_job = follow_pool.submit(transcribe, dict(transcribe_settings or {}, follow=follow))
+        follow_pool.shutdown(wait=False)
+    
+    # Stage 1: Encode video
+    if outputs:
+        resolution = outputs[0][0]["resolution"]
+    source_filters = build_source_filters(input_file, analysis) if not follow else None
+    if analysis and analysis.get("native") and not follow:
+        native_mode = analysis["native"] if not outputs else "report"
+        resolution = choose_native_resolution(input_file, resolution, native_mode)
+    with reserved_resources(scheduler, "encode", f"encode {name}", device, resolution, encoder) as needs:
+        started = time.time()
+        if outputs:
+            encode_renditions(input_file, [(r, video) for r, video, _ in outputs],
+                              threads=needs["cpu"] if needs else encode_threads,
+                              cores=needs["cores"] if needs else None, encoder=encoder,
+                              follow=follow, decimate=decimate, source_filters=source_filters)
+        elif segment_library and not follow:
+            encode_with_segment_library(input_file, temp_video, resolution, preset, segment_library,
+                                        threads=needs["cpu"] if needs else encode_threads,
+                                        encoder=encoder)
+        elif needs:
+            encode_video(input_file, temp_video, resolution, preset,
+                         threads=needs["cpu"], cores=needs["cores"], encoder=encoder,
+                         follow=follow, decimate=decimate, source_filters=source_filters)
+        else:
+            encode_video(input_file, temp_video, resolution, preset, threads=encode_threads,
+                         encoder=encoder, follow=follow, decimate=decimate, source_filters=source_filters)
+        # Filtered encodes (IVTC, deinterlace, crop) are keyed apart from plain
+        # ones, and library runs (indexing plus spliced frames) are not
+        # recorded, so the deadline planner and ETAs only see plain encodes
+        speed_key = encode_stage_key(resolution, preset, encoder)
+        if source_filters:
+            speed_key = f"filtered:{speed_key}"
+        if decimate:
+            report_decimation(input_file, outputs[0][1] if outputs else temp_video, speed_key,
+                              0 if outputs else media_seconds, time.time() - started)
+        elif not outputs and not (segment_library and not follow):
+            record_stage_speed(speed_key, media_seconds, time.time() - started)
+    
+    # Stage 2: Generate subtitles
+    if subtitle_job is not None:
+        subtitle_tracks = subtitle_job.result()
+    else:
+        with reserved_resources(scheduler, "transcribe", f"transcribe {name}", device) as needs:
+            started = time.time()
+            if needs and device == "cpu":
+                transcribe_settings = dict(transcribe_settings or {}, cpu_threads=needs["cpu"],
+                                           cores=needs["cores"])
+            subtitle_tracks = transcribe(transcribe_settings)
+            if subtitle_tracks:
+                record_stage_speed(f"transcribe:{device}", media_seconds, time.time() - started)
+    
+    # Stage 3: Mux subtitles (if generated successfully)
+    if outputs:
+        if not subtitle_tracks:
+            print("⚠️  Skipping muxing - using encoded renditions as final output")
+            return outputs[0][1]
+        with reserved_resources(scheduler, "mux", f"mux {name}"):
+            for _, video, final in outputs:
+                mux_subtitles(video, subtitle_tracks, final)
+        print(f"📦 Renditions: {', '.join(os.path.basename(final) for _, _, final in outputs)}")
+        return outputs[0][2]
+    
+    if subtitle_tracks:
+        with reserved_resources(scheduler, "mux", f"mux {name}"):
+            mux_subtitles(temp_video, subtitle_tracks, final_output)
+        return final_output
+    else:
+        print(f"⚠️  Skipping muxing - using encoded video as final output")
+        return temp_video
+
+
+def archive_over_proxy(input_file, proxy_output, resolution, preset, encoder="svtav1",
+                       scheduler=None, encode_threads=None, decimate=False, analysis=None):
+    """
+    Encode the archival version of a file and swap it in for its proxy.
+    
+    The archival encode runs at idle priority (and behind any waiting proxy
+    work in the scheduler). The proxy's subtitle tracks are copied across and
+    the result atomically replaces the proxy under the same name, so players
+    and media servers never see a missing or half-written file.
+    
+    decimate and analysis apply as in process_single_file, so the archival
+    encode gets the same IVTC/crop/decimation as its proxy (the analyses are
+    cached from the proxy pass).
+    
+    Returns:
+        Path to the replaced output (same as proxy_output)
+    """
+    name = os.path.basename(input_file)
+    base_name = os.path.splitext(name)[0]
+    archival_video = os.path.join(os.path.dirname(os.path.abspath(proxy_output)),
+                                  f"{base_name}_archival_encoded.mkv")
+    source_filters = build_source_filters(input_file, analysis)
+    if analysis and analysis.get("native"):
+        resolution = choose_native_resolution(input_file, resolution, analysis["native"])
+    
+    with reserved_resources(scheduler, "encode", f"archival encode {name}", resolution=resolution,
+                            encoder=encoder, priority=ARCHIVAL_PRIORITY) as needs:
+        encode_video(input_file, archival_video, resolution, preset,
+                     threads=needs["cpu"] if needs else encode_threads,
+                     cores=needs["cores"] if needs else None, encoder=encoder, idle=True,
+                     decimate=decimate, source_filters=source_filters)
+    
+    # Archival video + the proxy's subtitles, renamed over the proxy
+    with reserved_resources(scheduler, "mux", f"archival mux {name}", priority=ARCHIVAL_PRIORITY):
+        partial_file = partial_output_path(proxy_output)
+        cmd = [
+            get_ffmpeg_path(), "-y", "-i", archival_video, "-i", proxy_output,
+            "-map", "0", "-map", "1:s?", "-c", "copy", partial_file
+        ]
+        result = run_stage_command(cmd, "mux", low_priority=False)
+        publish_output(partial_file, proxy_output, result.returncode)
+    os.remove(archival_video)
+    print(f"🗄️  Archival encode replaced proxy: {os.path.basename(proxy_output)}\n")
+    return proxy_output
+
+
+def process_with_proxy(input_file, device, resolution, preset, proxy, output_dir=None,
+                       transcribe_settings=None, encoder="svtav1", decimate=False, analysis=None):
+    """Deliver a fast proxy (with subtitles) first, then replace it with the archival encode."""
+    proxy_output = process_single_file(
+        input_file, device, proxy["resolution"], proxy["preset"], output_dir,
+        transcribe_settings=transcribe_settings, encoder=encoder,
+        decimate=decimate, analysis=analysis
+    )
+    print(f"⚡ Proxy ready: {proxy_output}")
+    return archive_over_proxy(input_file, proxy_output, resolution, preset, encoder,
+                              decimate=decimate, analysis=analysis)
+
+
+def process_batch(files, device, resolution, preset, shutdown_after, transcribe_settings=None,
+                  transcribe_pool=None, output_dir=None, scheduler=None, deadline=None,
+                  order="scan", encoder="svtav1", renditions=None, proxy=None, segment_library=None,
+                  decimate=False, analysis=None):
+    """
+    Process multiple files in batch mode.
+    
+    Args:
+        files: List or iterable of video file paths (consumed as it goes, so a
+               streaming scan starts work on the first file immediately)
+        device: 'cuda' or 'cpu'
+        resolution: Target resolution
+        preset: SVT-AV1 preset
+        shutdown_after: Whether to shutdown PC after completion
+        transcribe_settings: Optional settings dict for generate_subtitles()
+        transcribe_pool: Optional {'workers', 'threads', 'encode_threads', 'cores'} -
+                         transcribe all files in a background worker pool while
+                         encodes run
+        output_dir: Optional output directory (defaults to next to each input)
+        scheduler: Optional resource scheduler from make_scheduler() - runs up to
+                   max_jobs files at once, admitting each stage only when its
+                   CPU/GPU/memory needs fit
+        deadline: Optional Unix timestamp - presets are planned per file (never
+                  slower than `preset`) to finish by then, and re-planned before
+                  each file as measured speeds drift from the plan
+        order: 'scan' (as found) or 'makespan' (longest first across the
+               parallel slots, with a live whole-batch ETA)
+        encoder: Video encoder backend (see ENCODER_BACKENDS)
+        renditions: Optional list from parse_renditions() (see process_single_file)
+        proxy: Optional {'resolution', 'preset'} - every file first gets a fast
+               proxy encode (muxed with subtitles); archival encodes follow at
+               idle priority and atomically replace the proxies. The proxy tier
+               always goes first in the scheduler
+        segment_library: Optional per-season library folder (see process_single_file)
+        decimate: Drop duplicate frames in every encode (see process_single_file)
+        analysis: Optional source pre-analyses for every file (see process_single_file)
+    """
+    slots = scheduler["max_jobs"] if scheduler else 1
+    include_transcription = not transcribe_pool
+    speeds = load_stage_speeds()
+    estimates = {}
+    if deadline or order == "makespan":
+        # Planning and ordering need every duration up front
+        files = list(files)
+        estimates = {
+            f: estimate_file_seconds(speeds, probe_video(f)["duration"], resolution,
+                                     preset, device, include_transcription, encoder)
+            for f in files
+        }
+    if order == "makespan" and files:
+        files, makespan = order_for_makespan(files, [estimates[f] for f in files], slots)
+        print(f"📐 Longest-first order across {slots} slot(s): predicted "
+              f"{makespan/3600:.1f}h (ETA {time.strftime('%H:%M', time.localtime(time.time() + makespan))})")
+    planned_files = files
+    total = len(files) if hasattr(files, '__len__') else '?'
+    print(f"\n{'='*60}")
+    print(f"🔄 BATCH MODE - Processing {total} files")
+    print(f"{'='*60}\n")
+    
+    completed = []
+    failed = []
+    
+    jobs = {}
+    lookahead = 1
+    encode_threads = None
+    if transcribe_pool:
+        executor, transcribe, pool_stats = start_transcription_pool(
+            device, transcribe_settings,
+            transcribe_pool["workers"], transcribe_pool["threads"], transcribe_pool.get("cores")
+        )
+        lookahead = transcribe_pool["workers"] + 1
+        encode_threads = transcribe_pool.get("encode_threads")
+    
+    planned = {}
+    
+    def plan_remaining(i):
+        """Re-plan presets from file i onwards against the time left; return file i's preset."""
+        remaining = planned_files[i - 1:]
+        seconds_left = deadline - time.time()
+        presets, projected = plan_presets(
+            [probe_video(f)["duration"] for f in remaining], seconds_left,
+            resolution, device, int(preset),
+            include_transcription=include_transcription,
+            slots=slots,
+            encoder=encoder
+        )
+        if presets != planned.get("presets"):
+            spread = f"{min(presets)}" if min(presets) == max(presets) else f"{min(presets)}-{max(presets)}"
+            status = "on track" if projected <= seconds_left else "⚠️  cannot make the deadline"
+            print(f"\n🗓️  Plan for {len(remaining)} file(s): presets {spread}, "
+                  f"projected {projected/3600:.1f}h of {max(seconds_left, 0)/3600:.1f}h left ({status})")
+        planned["presets"] = presets[1:]
+        return str(presets[0])
+    
+    progress = {"started": {}, "dispatched": 0, "predicted": 0.0, "actual": 0.0,
+                "lock": threading.Lock()}
+    
+    def report_eta():
+        """Whole-batch ETA: remaining estimates, scaled by how the finished files compared."""
+        with progress["lock"]:
+            now = time.time()
+            drift = progress["actual"] / progress["predicted"] if progress["predicted"] else 1.0
+            remaining = sum(
+                max(estimates[f] * drift - (now - started), 0)
+                for f, started in progress["started"].items()
+            )
+            remaining += sum(estimates[f] * drift for f in planned_files[progress["dispatched"]:])
+            print(f"📈 Batch ETA: {time.strftime('%H:%M', time.localtime(now + remaining / slots))} "
+                  f"({remaining / slots / 60:.0f} min left, speed x{1 / drift:.2f} vs estimate)")
+    
+    def run_one(i, input_file, file_preset):
+        print(f"\n[{i}/{total}] Starting: {os.path.basename(input_file)}")
+        if estimates:
+            estimates[input_file] = estimate_file_seconds(
+                speeds, probe_video(input_file)["duration"], resolution,
+                file_preset, device, include_transcription, encoder
+            )
+            with progress["lock"]:
+                progress["started"][input_file] = time.time()
+                progress["dispatched"] = max(progress["dispatched"], i)
+        
+        try:
+            output_file = process_single_file(
+                input_file, device,
+                proxy["resolution"] if proxy else resolution,
+                proxy["preset"] if proxy else file_preset,
+                output_dir,
+                transcribe_settings=transcribe_settings,
+                subtitle_job=jobs.get(input_file),
+                encode_threads=encode_threads,
+                scheduler=scheduler,
+                encoder=encoder,
+                renditions=renditions,
+                segment_library=None if proxy else segment_library,
+                decimate=decimate,
+                analysis=analysis
+            )
+            completed.append(output_file)
+            print(f"✅ [{i}/{total}] Complete{' (proxy)' if proxy else ''}: {os.path.basename(output_file)}")
+        except Exception as e:
+            output_file = None
+            failed.append(input_file)
+            print(f"❌ [{i}/{total}] Failed: {os.path.basename(input_file)}")
+            print(f"   Error: {str(e)}")
+        
+        if estimates:
+            with progress["lock"]:
+                progress["actual"] += time.time() - progress["started"].pop(input_file)
+                progress["predicted"] += estimates[input_file]
+            report_eta()
+        return output_file
+    
+    archived = []
+    
+    def archive_one(i, input_file, file_preset, proxy_output):
+        """Archival tier for one file (proxy_output: path or a Future of it)."""
+        if hasattr(proxy_output, "result"):
+            proxy_output = proxy_output.result()
+        if not proxy_output:
+            return
+        try:
+            archive_over_proxy(input_file, proxy_output, resolution, file_preset, encoder,
+                               scheduler, encode_threads, decimate, analysis)
+            archived.append(proxy_output)
+        except Exception as e:
+            print(f"❌ [{i}/{total}] Archival encode failed (proxy kept): {os.path.basename(input_file)}")
+            print(f"   Error: {str(e)}")
+    
+    files = iter(files)
+    i = 0
+    if scheduler:
+        # Several files in flight; the scheduler decides which stages may run
+        # (archival jobs wait for their proxy, then queue behind all proxy work)
+        in_flight = set()
+        archive_executor = ThreadPoolExecutor(max_workers=scheduler["max_jobs"]) if proxy else None
+        with ThreadPoolExecutor(max_workers=scheduler["max_jobs"]) as job_executor:
+            for input_file in files:
+                if len(in_flight) >= scheduler["max_jobs"]:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                i += 1
+                file_preset = plan_remaining(i) if deadline else preset
+                future = job_executor.submit(run_one, i, input_file, file_preset)
+                in_flight.add(future)
+                if archive_executor:
+                    archive_executor.submit(archive_one, i, input_file, file_preset, future)
+        if archive_executor:
+            archive_executor.shutdown(wait=True)
+    else:
+        # Pull files lazily, keeping the transcription pool fed a few files ahead
+        queue = deque()
+        proxies = []
+        while True:
+            while len(queue) < lookahead:
+                next_file = next(files, None)
+                if next_file is None:
+                    break
+                queue.append(next_file)
+                if transcribe_pool:
+                    jobs[next_file] = executor.submit(transcribe, next_file)
+            if not queue:
+                break
+            i += 1
+            input_file = queue.popleft()
+            file_preset = plan_remaining(i) if deadline else preset
+            proxy_output = run_one(i, input_file, file_preset)
+            if proxy:
+                proxies.append((i, input_file, file_preset, proxy_output))
+        
+        # Archival tier once every proxy is out
+        for job in proxies:
+            archive_one(*job)
+    
+    if transcribe_pool:
+        executor.shutdown(wait=True)
+    
+    # Summary
+    print(f"\n{'='*60}")
+    print(f"📊 BATCH PROCESSING COMPLETE")
+    print(f"{'='*60}")
+    total = i
+    print(f"✅ Completed: {len(completed)}/{total}")
+    if proxy:
+        print(f"🗄️  Archival: {len(archived)}/{len(completed)} proxies replaced")
+    if transcribe_pool:
+        report_pool_throughput(pool_stats, transcribe_pool["workers"], transcribe_pool["threads"])
+    if failed:
+        print(f"❌ Failed: {len(failed)}/{total}")
+        for f in failed:
+            print(f"   - {os.path.basename(f)}")
+    print(f"{'='*60}\n")
+    
+    # Shutdown if requested (only after ALL files are done)
+    if shutdown_after and len(completed) > 0:
+        print("⏻️  System shutting down in 60 seconds...")
+        print("   (Run 'shutdown /a' to cancel)\n")
+        os.system("shutdown /s /t 60")
+
+
+# ========== DIFFERENTIAL RE-PROCESSING ==========
+# A v2 release usually differs from v1 in a few fixed scenes or lines. Both
+# versions are reduced to perceptual hashes (a dHash per video frame, read
+# from the frame statistics index, and a band energy fingerprint per second
+# of audio) and aligned; GOPs of the v1 output that still match are
+# stream-copied, and only the changed ranges are encoded and transcribed again.
+
+def compute_audio_fingerprints(input_file):
+    """
+    32-bit fingerprint per DIFF_AUDIO_WINDOW_SECONDS of audio.
+    
+    Each window's spectrum is split into 33 log-spaced bands between
+    DIFF_AUDIO_BAND_RANGE; bit n is set when band n+1 holds more energy than
+    band n. Near-silent windows get fingerprint 0. Audio is streamed, so
+    memory stays flat for any length.
+    
+    Returns:
+        uint32 NumPy array, one fingerprint per window
+    """
+    import numpy as np
+    
+    hop = int(DIFF_AUDIO_WINDOW_SECONDS * PCM_SAMPLE_RATE)
+    low, high = DIFF_AUDIO_BAND_RANGE
+    edges = np.unique(np.geomspace(low * DIFF_AUDIO_WINDOW_SECONDS, high * DIFF_AUDIO_WINDOW_SECONDS, 34).astype(int))
+    
+    prints = []
+    carry = np.empty(0, dtype=np.float32)
+    for _, audio in iter_pcm_windows(input_file):
+        data = np.concatenate((carry, audio))
+        usable = len(data) // hop * hop
+        frames = data[:usable].reshape(-1, hop)
+        carry = data[usable:].copy()
+        if not len(frames):
+            continue
+        spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+        bands = np.add.reduceat(spectrum, edges, axis=1)[:, :len(edges) - 1]
+        bits = np.zeros((len(frames), 32), dtype=bool)
+        bits[:, :bands.shape[1] - 1] = bands[:, 1:] > bands[:, :-1]
+        bits[np.sqrt(np.mean(frames ** 2, axis=1)) < 1e-3] = False
+        prints.append(np.packbits(bits, axis=1).view('>u4').ravel().astype(np.uint32))
+    return np.concatenate(prints) if prints else np.empty(0, dtype=np.uint32)
+
+
+def get_release_hashes(input_file, kind):
+    """
+    Frame hashes ('video') or audio fingerprints ('audio') of a file, cached by content.
+    
+    The cache key is the file fingerprint, so the hashes of a v1 output are
+    computed once and reused for every later release of the same episode.
+    Frame hashes come from the frame statistics index (see build_frame_stats).
+    """
+    import numpy as np
+    
+    cache_path = os.path.join(get_cache_dir("release-hashes"), f"{get_file_fingerprint(input_file)}_{kind}.npy")
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+    
+    if kind == "video":
+        values = np.array(get_frame_stats(input_file)["dhash"])
+    else:
+        values = compute_audio_fingerprints(input_file)
+    partial_path = f"{cache_path}.{os.getpid()}.partial"
+    with open(partial_path, "wb") as handle:
+        np.save(handle, values)
+    os.replace(partial_path, cache_path)
+    return values
+
+
+def get_keyframes(video_file):
+    """
+    Keyframe positions of a video stream.
+    
+    Returns:
+        List of (frame_index, pts_time string) - the exact timestamp is kept
+        so a stream copy can seek onto the keyframe without rounding
+    """
+    cmd = [
+        get_ffprobe_path(), "-v", "error",
+        "-select_streams", "v:0", "-skip_frame", "nokey",
+        "-show_entries", "frame=pts_time,best_effort_timestamp_time",
+        "-of", "json", video_file
+    ]
+    frames = json.loads(run_stage_capture(cmd, check=True).stdout.decode()).get("frames", [])
+    info = probe_video(video_file)
+    times = [f.get("pts_time", f.get("best_effort_timestamp_time")) for f in frames]
+    times = [t for t in times if t not in (None, "N/A")]
+    if not times or not info or not info["fps"]:
+        return []
+    first = float(times[0])
+    return [(int(round((float(t) - first) * info["fps"])), t) for t in times]
+
+
+def get_video_start_time(video_file):
+    """First timestamp of the video stream (an actual timestamp, for -seek_timestamp)."""
+    cmd = [
+        get_ffprobe_path(), "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=start_time",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        video_file
+    ]
+    try:
+        return float(run_stage_capture(cmd, check=True).stdout.decode().strip())
+    except Exception:
+        return 0.0
+
+
+def encode_segment(input_file, first, count, fps, start_time, scale, output_file, preset, crf=30,
+                   encoder="svtav1", threads=None, stage_key=None):
+    """
+    Encode frames [first, first + count) of a source into a standalone video-only file.
+    
+    The seek is an actual timestamp (-seek_timestamp) half a frame before
+    the first frame, so the cut is frame-exact whatever start offset the
+    container has. Every segment starts with its own keyframe (closed GOP).
+    Peak memory is recorded under stage_key (see encode_stage_key).
+    """
+    backend = ENCODER_BACKENDS[encoder]
+    cmd = [
+        get_ffmpeg_path(), "-y", "-v", "error", "-seek_timestamp", "1",
+        "-ss", f"{start_time + max(first - 0.5, 0) / fps:.6f}", "-i", input_file,
+        "-map", "0:v:0", "-frames:v", str(count), "-vf", scale,
+        "-c:v", backend["codec"], *backend["args"](preset, crf, threads), output_file
+    ]
+    return run_stage_command(cmd, stage_key)
+
+
+def splice_video(input_file, previous_output, segments, keyframes, fps, output_file,
+                 preset, crf=30, encoder="svtav1", threads=None, scale=None, resolution=None):
+    """
+    Build a video from copied GOPs, ready-made segment files and newly encoded ranges.
+    
+    Segments are ('copy', first, count) GOPs of previous_output starting at
+    one of its keyframes, ('file', path, count) already-encoded segments and
+    ('encode', first, count) ranges of the new source. Encoded ranges use the
+    previous output's frame size (or the given scale filter) with the same
+    encoder settings, so the concat demuxer can join everything without
+    re-encoding. The audio is taken in full from the new source.
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    backend = ENCODER_BACKENDS[encoder]
+    if scale is None:
+        info = probe_video(previous_output)
+        scale = f"scale={info['width']}:{info['height']}:flags=lanczos"
+        resolution = str(info["height"])
+    stage_key = encode_stage_key(resolution, encoder=encoder) if resolution else None
+    pts = dict(keyframes)
+    start_time = get_video_start_time(input_file)
+    work_dir = tempfile.mkdtemp(prefix="splice_", dir=os.path.dirname(os.path.abspath(output_file)))
+    
+    try:
+        listing = []
+        for n, (kind, first, count) in enumerate(segments):
+            segment_file = os.path.join(work_dir, f"{n:05d}_{kind}.mkv")
+            if kind == "file":
+                segment_file = first
+            elif kind == "copy":
+                cmd = [
+                    ffmpeg_path, "-y", "-v", "error", "-seek_timestamp", "1", "-ss", pts[first],
+                    "-i", previous_output, "-map", "0:v:0", "-frames:v", str(count),
+                    "-c", "copy", segment_file
+                ]
+                result = run_stage_command(cmd)
+            else:
+                print(f"   ✏️  Encoding frames {first}-{first + count - 1} "
+                      f"({format_srt_timestamp(first / fps)}, {count / fps:.1f}s)")
+                result = encode_segment(input_file, first, count, fps, start_time, scale, segment_file,
+                                        preset, crf, encoder, threads, stage_key)
+            if kind != "file" and result.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed (exit code {result.returncode}) on segment {n} ({kind})")
+            # Explicit durations keep the joined timeline frame-exact whatever
+            # start offset each segment's container reports
+            listing.append("file '{}'".format(os.path.abspath(segment_file).replace("'", "'\\''")))
+            listing.append(f"duration {count / fps:.6f}")
+        
+        list_file = os.path.join(work_dir, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(listing) + "\n")
+        
+        partial_file = partial_output_path(output_file)
+        cmd = [
+            ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", list_file, "-i", input_file,
+            "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy", "-c:a", "libopus", "-b:a", "128k",
+            "-metadata", f"comment=Converted {backend['label']} P{preset} CRF{crf} (spliced)",
+            partial_file
+        ]
+        result = run_stage_command(cmd, "mux", low_priority=False)
+        publish_output(partial_file, output_file, result.returncode)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def parse_srt_timestamp(text):
+    """Parse an SRT timestamp (HH:MM:SS,mmm) into seconds."""
+    hours, minutes, seconds = text.strip().replace(",", ".").split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def read_subtitle_cues(video_file):
+    """
+    Read the first subtitle track of a muxed output as cue dicts.
+    
+    Returns:
+        List of {'start', 'end', 'text'} (empty if the file has no subtitles)
+    """
+    cmd = [get_ffmpeg_path(), "-nostdin", "-v", "error", "-i", video_file, "-map", "0:s:0", "-f", "srt", "pipe:1"]
+    result = run_stage_capture(cmd, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        return []
+    
+    cues = []
+    text = result.stdout.decode("utf-8", errors="replace").replace("\r\n", "\n")
+    for block in text.strip().split("\n\n"):
+        lines = block.strip().split("\n")
+        timing = next((n for n, line in enumerate(lines) if "-->" in line), None)
+        if timing is None:
+            continue
+        start, end = lines[timing].split("-->")
+        cues.append({
+            "start": parse_srt_timestamp(start),
+            "end": parse_srt_timestamp(end.split()[0]),
+            "text": "\n".join(lines[timing + 1:])
+        })
+    return cues
+
+
+def splice_subtitles(input_file, previous_output, srt_file, device="cuda", settings=None):
+    """
+    Carry v1 subtitles over to the v2 timeline and re-transcribe only what changed.
+    
+    v1 cues that lie entirely inside a matched audio run are shifted to their
+    new position. Unmatched audio, and every seam where two touching runs
+    come from different places in v1 (widened over v1 cues that crossed it),
+    is padded, widened over any carried cue it touches, and transcribed
+    again; its cues replace the old ones.
+    
+    Returns:
+        (srt_file, changed_span_count, changed_seconds), or None if the v1
+        output has no subtitles to reuse
+    """
+    settings = settings or {}
+    old_cues = read_subtitle_cues(previous_output)
+    if not old_cues:
+        return None
+    
+    window = DIFF_AUDIO_WINDOW_SECONDS
+    new_prints = get_release_hashes(input_file, "audio")
+    runs = []
+    for run in align_hashes(get_release_hashes(previous_output, "audio"), new_prints,
+                            DIFF_AUDIO_DISTANCE, DIFF_AUDIO_MIN_RUN):
+        # Runs that continue each other on both timelines are one run
+        if runs and run[0] == runs[-1][1] and run[2] == runs[-1][2] + runs[-1][1] - runs[-1][0]:
+            runs[-1] = (runs[-1][0], run[1], runs[-1][2])
+        else:
+            runs.append(run)
+    
+    cues = []
+    for cue in old_cues:
+        for new_start, new_end, old_start in runs:
+            if old_start * window <= cue["start"] and cue["end"] <= (old_start + new_end - new_start) * window:
+                shift = (new_start - old_start) * window
+                cues.append(dict(cue, start=cue["start"] + shift, end=cue["end"] + shift))
+                break
+    
+    # Changed audio: everything on the new timeline outside a matched run
+    raw_spans = []
+    cursor = 0
+    for new_start, new_end, _ in runs + [(len(new_prints), len(new_prints), 0)]:
+        if new_start > cursor:
+            raw_spans.append((max(cursor * window - CASCADE_SPAN_PADDING, 0),
+                              new_start * window + CASCADE_SPAN_PADDING))
+        cursor = max(cursor, new_end)
+    
+    # Seams: touching runs whose v1 audio is not contiguous. Speech that ran
+    # across either v1 edge is cut there, so re-transcribe around the seam,
+    # as far as those cues reach on the new timeline
+    for a, b in zip(runs, runs[1:]):
+        if b[0] > a[1]:
+            continue
+        seam = b[0] * window
+        start, end = seam - CASCADE_SPAN_PADDING, seam + CASCADE_SPAN_PADDING
+        a_end = (a[2] + a[1] - a[0]) * window   # v1 time where run a stops
+        b_start = b[2] * window                 # v1 time where run b starts
+        for cue in old_cues:
+            if cue["start"] < a_end < cue["end"] and cue["start"] >= a[2] * window:
+                start = min(start, cue["start"] + (a[0] - a[2]) * window)
+                end = max(end, seam + cue["end"] - a_end)
+            if cue["start"] < b_start < cue["end"]:
+                start = min(start, seam - (b_start - cue["start"]))
+                end = max(end, cue["end"] + (b[0] - b[2]) * window)
+        raw_spans.append((max(start, 0), end))
+    
+    spans = []
+    for start, end in sorted(raw_spans):
+        if spans and start - spans[-1][1] <= CASCADE_MERGE_GAP:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    
+    # Never cut a carried cue in half: widen the span over it and drop it
+    for n, (start, end) in enumerate(spans):
+        for cue in cues:
+            if cue["start"] < end and cue["end"] > start:
+                start, end = min(start, cue["start"]), max(end, cue["end"])
+        cues = [c for c in cues if not (c["start"] < end and c["end"] > start)]
+        spans[n] = (start, end)
+    
+    changed_seconds = sum(end - start for start, end in spans)
+    print(f"📝 Subtitles: {len(cues)} cue(s) carried over, {len(spans)} span(s) / "
+          f"{changed_seconds:.0f}s to re-transcribe")
+    
+    if spans:
+        model = load_whisper_model(
+            settings.get("model", "small"), device, settings.get("compute_type", "int8"),
+            settings.get("cpu_threads", 0), settings.get("num_workers", 1)
+        )
+        for start, end in spans:
+            windows = iter_pcm_windows(input_file, end - start + 1, start=start, duration=end - start)
+            fresh = list(iter_transcribed_segments(
+                windows, model, settings.get("task", "translate"), settings.get("language", "ja"),
+                beam_size=settings.get("beam_size", 5)
+            ))
+            cues.extend(fresh)
+            print(f"   ↻ {format_srt_timestamp(start)} - {format_srt_timestamp(end)}: {len(fresh)} cue(s)")
+    
+    cues.sort(key=lambda c: c["start"])
+    write_srt(srt_file, cues)
+    return srt_file, len(spans), changed_seconds
+
+
+def reprocess_release(input_file, previous_output, device, resolution, preset, output_dir=None,
+                      transcribe_settings=None, encoder="svtav1", crf=30):
+    """
+    Process a v2 release by patching the v1 output instead of starting over.
+    
+    Args:
+        input_file: The new (v2) source
+        previous_output: The pipeline's final output for the v1 source
+        (other arguments as process_single_file; encoder, preset and CRF
+         should match the v1 encode so spliced segments look the same)
+    
+    Falls back to the full pipeline when the two versions cannot be aligned
+    (different frame rate, nothing reusable) or for multi-language output.
+    Cropping, IVTC, decimation and native-resolution encodes are not
+    supported (main() ignores --previous-release with them): the splice
+    indexes v1 frames one-to-one against the uncropped, undecimated source.
+    
+    Returns:
+        Path to final output file
+    """
+    print(f"\n{'#'*60}")
+    print(f"# Re-processing v2: {os.path.basename(input_file)}")
+    print(f"# Previous output:  {os.path.basename(previous_output)}")
+    print(f"{'#'*60}\n")
+    
+    def full_pipeline(reason):
+        print(f"⚠️  {reason} - processing the whole file\n")
+        return process_single_file(input_file, device, resolution, preset, output_dir,
+                                   transcribe_settings=transcribe_settings, encoder=encoder)
+    
+    if transcribe_settings and transcribe_settings.get("languages"):
+        return full_pipeline("Differential re-processing covers a single subtitle track")
+    new_info, old_info = probe_video(input_file), probe_video(previous_output)
+    if not new_info or not old_info or not new_info["fps"]:
+        return full_pipeline("Could not probe both versions")
+    if abs(new_info["fps"] - old_info["fps"]) > new_info["fps"] * 0.001:
+        return full_pipeline(f"Frame rate changed ({old_info['fps']:.3f} → {new_info['fps']:.3f})")
+    
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    target_dir = output_dir or os.path.dirname(os.path.abspath(input_file))
+    os.makedirs(target_dir, exist_ok=True)
+    temp_video = os.path.join(target_dir, f"{base_name}_encoded.mkv")
+    final_output = os.path.join(target_dir, f"{base_name}_final.mkv")
+    
+    # Stage 1: Reuse unchanged GOPs, encode the rest
+    print("🔍 Hashing frames...")
+    new_hashes = get_release_hashes(input_file, "video")
+    old_hashes = get_release_hashes(previous_output, "video")
+    runs = align_hashes(old_hashes, new_hashes, DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN)
+    keyframes = get_keyframes(previous_output)
+    segments = plan_video_splice(runs, keyframes, len(new_hashes), len(old_hashes))
+    copied = sum(count for kind, _, count in segments if kind == "copy")
+    if not copied:
+        return full_pipeline("No reusable GOPs in the previous output")
+    encoded = len(new_hashes) - copied
+    print(f"♻️  Video: {copied}/{len(new_hashes)} frames reused ({copied / len(new_hashes):.0%}), "
+          f"{encoded} to encode in {sum(1 for s in segments if s[0] == 'encode')} segment(s)")
+    
+    started = time.time()
+    splice_video(input_file, previous_output, segments, keyframes, new_info["fps"], temp_video,
+                 preset, crf, encoder)
+    print(f"✅ Video spliced in {time.time() - started:.0f}s: {temp_video}\n")
+    
+    # Stage 2: Carry subtitles over, re-transcribe changed audio
+    srt_file = os.path.join(target_dir, f"{base_name}.srt")
+    try:
+        spliced = splice_subtitles(input_file, previous_output, srt_file, device, transcribe_settings)
+    except Exception as e:
+        print(f"⚠️  Subtitle splice failed: {e}")
+        spliced = None
+    if spliced is None:
+        srt_file = generate_subtitles(input_file, device, transcribe_settings)
+    
+    # Stage 3: Mux
+    if srt_file and os.path.exists(srt_file):
+        mux_subtitles(temp_video, srt_file, final_output)
+        return final_output
+    print("⚠️  Skipping muxing - using encoded video as final output")
+    return temp_video
+
+
+# ========== CROSS-EPISODE SEGMENT LIBRARY ==========
+# Matching and the shared library folder live in segment_library.py; this
+# encodes an episode around (and into) the library's segments.
+
+def encode_with_segment_library(input_file, output_file, resolution, preset, library_dir, crf=30,
+                                threads=None, encoder="svtav1"):
+    """
+    Encode an episode, splicing in footage it shares with other episodes of the season.
+    
+    Library segments that occur in the episode are copied in; spans shared
+    with an earlier episode but not yet in the library are encoded once as
+    new closed-GOP segments (and reused by every later episode); the rest
+    is encoded as usual. The episode's hashes are added to the library in
+    any case, so the first episode only pays for indexing.
+    
+    The episode is aligned against the library and new segments are encoded
+    without holding the index lock (index.json and the arrays are replaced
+    atomically); before they are published the index is read again under
+    the lock, and a span another worker has published meanwhile is taken
+    from the library instead.
+    
+    Returns:
+        Number of frames taken from the library
+    """
+    info = probe_video(input_file)
+    if not info or not info["fps"]:
+        print("⚠️  Segment library needs a probed frame rate - encoding normally")
+        encode_video(input_file, output_file, resolution, preset, crf, threads, encoder=encoder)
+        return 0
+    
+    os.makedirs(library_dir, exist_ok=True)
+    fps = info["fps"]
+    fingerprint = get_file_fingerprint(input_file)
+    key = segment_library_key(encoder, preset, crf, resolution, info)
+    scale = build_scale_filter(resolution, (get_pipeline_tuning(input_file, resolution) or {}).get("scaler", "lanczos"))
+    
+    print("🔍 Hashing frames for the segment library...")
+    hashes = get_release_hashes(input_file, "video")
+    library = load_segment_library(library_dir)
+    _, covered = match_library_segments(hashes, library, library_dir, key)
+    spans = find_shared_spans(hashes, fingerprint, library, library_dir, covered,
+                              int(SEGMENT_MIN_SECONDS * fps))
+    
+    # New shared spans become library segments, encoded from this episode
+    # (partial names are per worker, see partial_output_path)
+    start_time = get_video_start_time(input_file)
+    encoded = []
+    for first, end in spans:
+        segment_id = f"{fingerprint[:12]}_{first}"
+        partial_file = partial_output_path(os.path.join(library_dir, f"segment_{segment_id}.mkv"))
+        print(f"   📚 New shared span {format_srt_timestamp(first / fps)} - "
+              f"{format_srt_timestamp(end / fps)}: encoding it once for the season")
+        result = encode_segment(input_file, first, end - first, fps, start_time, scale, partial_file,
+                                preset, crf, encoder, threads, encode_stage_key(resolution, encoder=encoder))
+        if result.returncode != 0:
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            raise RuntimeError(f"ffmpeg failed (exit code {result.returncode}) on shared span {segment_id}")
+        encoded.append((first, end, segment_id, partial_file))
+    
+    with segment_library_lock(library_dir):
+        # Re-check: another worker may have published an overlapping segment meanwhile
+        library = load_segment_library(library_dir)
+        placements, covered = match_library_segments(hashes, library, library_dir, key)
+        for first, end, segment_id, partial_file in encoded:
+            if covered[first:end].any():
+                os.remove(partial_file)
+                continue
+            save_library_array(os.path.join(library_dir, f"segment_{segment_id}.npy"), hashes[first:end])
+            publish_output(partial_file, os.path.join(library_dir, f"segment_{segment_id}.mkv"), 0)
+            library["segments"][segment_id] = {
+                "key": key, "frames": end - first, "source": os.path.basename(input_file), "start": first
+            }
+            placements.append((first, end - first, segment_id))
+            covered[first:end] = True
+        
+        save_library_array(os.path.join(library_dir, f"episode_{fingerprint}.npy"), hashes)
+        library["episodes"][fingerprint] = {"name": os.path.basename(input_file), "frames": len(hashes)}
+        write_json_atomic(os.path.join(library_dir, "index.json"), library)
+    
+    if not placements:
+        encode_video(input_file, output_file, resolution, preset, crf, threads, encoder=encoder)
+        return 0
+    
+    segments = []
+    cursor = 0
+    for first, count, segment_id in sorted(placements):
+        if first > cursor:
+            segments.append(("encode", cursor, first - cursor))
+        segments.append(("file", os.path.join(library_dir, f"segment_{segment_id}.mkv"), count))
+        cursor = first + count
+    if cursor < len(hashes):
+        segments.append(("encode", cursor, len(hashes) - cursor))
+    
+    reused = sum(count for _, count, _ in placements)
+    print(f"\n{'='*60}")
+    print(f"▶️  [STAGE 1/3] Encoding Video: {os.path.basename(input_file)}")
+    print(f"{'='*60}")
+    print(f"♻️  Segment library: {reused}/{len(hashes)} frames ({reused / len(hashes):.0%}) "
+          f"from {len(placements)} shared segment(s)\n")
+    splice_video(input_file, None, segments, [], fps, output_file, preset, crf, encoder, threads,
+                 scale=scale, resolution=resolution)
+    print(f"✅ Video encoding complete: {output_file}\n")
+    return reused
+
+
+# ========== PERSISTENT JOB QUEUE ==========
+# The queue itself (jobs, leases, workers) lives in job_queue.py; this shares
+# a batch between machines through it.
+
+def run_distributed_batch(folders, queue_dir, workers, process, scan_options=None):
+    """
+    Share a batch between several machines through a queue on a shared folder.
+    
+    Every node enqueues what it finds (job ids are identical across nodes, so
+    duplicates collapse), then runs `workers` queue workers until no job is
+    pending or running. Start the same command on each box.
+    """
+    scan_options = scan_options or {}
+    queue_open(queue_dir)
+    
+    print(f"\n{'='*60}")
+    print(f"🌐 DISTRIBUTED MODE - {queue_worker_name()} with {workers} worker(s)")
+    print(f"{'='*60}")
+    
+    queued = 0
+    for root in folders:
+        for path in scan_video_files(root, scan_options.get("recursive", False),
+                                     scan_options.get("include"), scan_options.get("exclude")):
+            queued += queue_enqueue(queue_dir, path, root)
+    print(f"Queue: {queue_dir} {queue_counts(queue_dir)} ({queued} new)\n")
+    
+    started = time.time()
+    stop_event = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = [
+            executor.submit(queue_worker_loop, queue_dir, folders, process, stop_event, i + 1, True)
+            for i in range(workers)
+        ]
+        try:
+            done = sum(r.result() for r in results)
+        except KeyboardInterrupt:
+            stop_event.set()
+            print("\n⏹️  Stopping (unfinished jobs are reclaimed when their lease expires)...")
+            raise
     
-    subprocess.run(cmd)
-    print(f"✅ Muxing complete: {output_file}\n")
+    elapsed = time.time() - started
+    print(f"\n{'='*60}")
+    print(f"📊 This node completed {done} job(s) in {elapsed/60:.1f} min")
+    print(f"Queue: {queue_counts(queue_dir)}")
+    print(f"{'='*60}\n")
 
 
-# ========== MAIN PROCESSING LOGIC ==========
+# ========== WATCH-FOLDER DAEMON ==========
 
-def process_single_file(input_file, device, resolution, preset, output_dir=None):
+def start_file_events(folders, recursive):
     """
-    Process a single video file through the complete pipeline.
-    
-    Args:
-        input_file: Path to input video
-        device: 'cuda' or 'cpu'
-        resolution: Target resolution
-        preset: SVT-AV1 preset
-        output_dir: Optional output directory (defaults to same as input)
+    Subscribe to file-system events (inotify on Linux) via watchdog, if installed.
     
     Returns:
-        Path to final output file
+        (observer, set of changed paths, lock), or None to fall back to polling
     """
-    print(f"\n{'#'*60}")
-    print(f"# Processing: {os.path.basename(input_file)}")
-    print(f"{'#'*60}\n")
-    
-    # Determine output paths
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
-        temp_video = os.path.join(output_dir, f"{base_name}_encoded.mkv")
-        final_output = os.path.join(output_dir, f"{base_name}_final.mkv")
-    else:
-        input_dir = os.path.dirname(os.path.abspath(input_file))
-        temp_video = os.path.join(input_dir, f"{base_name}_encoded.mkv")
-        final_output = os.path.join(input_dir, f"{base_name}_final.mkv")
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
     
-    # Stage 1: Encode video
-    encode_video(input_file, temp_video, resolution, preset)
+    changed = set()
+    lock = threading.Lock()
     
-    # Stage 2: Generate subtitles
-    srt_file = generate_subtitles(input_file, device)
+    class ChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory:
+                with lock:
+                    changed.add(getattr(event, 'dest_path', None) or event.src_path)
     
-    # Stage 3: Mux subtitles (if generated successfully)
-    if srt_file and os.path.exists(srt_file):
-        mux_subtitles(temp_video, srt_file, final_output)
-        return final_output
-    else:
-        print(f"⚠️  Skipping muxing - using encoded video as final output")
-        return temp_video
+    observer = Observer()
+    for folder in folders:
+        observer.schedule(ChangeHandler(), folder, recursive=recursive)
+    observer.start()
+    return observer, changed, lock
 
 
-def process_batch(files, device, resolution, preset, shutdown_after):
+def watch_for_stable_files(folders, stop_event, settle_seconds=WATCH_SETTLE_SECONDS,
+                           poll_seconds=WATCH_POLL_SECONDS, recursive=True, include=None, exclude=None):
     """
-    Process multiple files in batch mode.
+    Yield video files in the watched folders once they have stopped growing.
     
-    Args:
-        files: List of video file paths
-        device: 'cuda' or 'cpu'
-        resolution: Target resolution
-        preset: SVT-AV1 preset
-        shutdown_after: Whether to shutdown PC after completion
+    New files are picked up from file-system events when watchdog is
+    available (with a periodic full rescan as a safety net), otherwise by
+    rescanning every poll interval. A file is yielded when its size and
+    mtime have not changed for settle_seconds.
     """
-    total = len(files)
-    print(f"\n{'='*60}")
-    print(f"🔄 BATCH MODE - Processing {total} files")
-    print(f"{'='*60}\n")
+    events = start_file_events(folders, recursive)
+    print(f"👀 Watching {len(folders)} folder(s) ({'file events' if events else 'polling'}, "
+          f"settle {settle_seconds}s)")
     
-    completed = []
-    failed = []
+    candidates = {}   # path -> (size, mtime, unchanged_since)
+    yielded = set()
+    last_rescan = 0
+    extensions = tuple(SUPPORTED_VIDEO_EXTENSIONS)
     
-    for i, input_file in enumerate(files, 1):
-        print(f"\n[{i}/{total}] Starting: {os.path.basename(input_file)}")
-        
-        try:
-            output_file = process_single_file(input_file, device, resolution, preset)
-            completed.append(output_file)
-            print(f"✅ [{i}/{total}] Complete: {os.path.basename(output_file)}")
-        except Exception as e:
-            failed.append(input_file)
-            print(f"❌ [{i}/{total}] Failed: {os.path.basename(input_file)}")
-            print(f"   Error: {str(e)}")
+    try:
+        while not stop_event.is_set():
+            now = time.time()
+            if events is None or now - last_rescan >= WATCH_RESCAN_SECONDS:
+                for folder in folders:
+                    for path in scan_video_files(folder, recursive, include, exclude):
+                        candidates.setdefault(path, None)
+                last_rescan = now
+            else:
+                _, changed, lock = events
+                with lock:
+                    paths = list(changed)
+                    changed.clear()
+                for path in paths:
+                    if path.lower().endswith(extensions) and not is_pipeline_output(path):
+                        candidates[path] = None
+                        yielded.discard(path)
+            
+            for path in list(candidates):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del candidates[path]
+                    continue
+                previous = candidates[path]
+                if previous is None or previous[:2] != (stat.st_size, stat.st_mtime):
+                    candidates[path] = (stat.st_size, stat.st_mtime, now)
+                elif now - previous[2] >= settle_seconds and path not in yielded:
+                    yielded.add(path)
+                    del candidates[path]
+                    yield path
+            
+            stop_event.wait(poll_seconds)
+    finally:
+        if events:
+            events[0].stop()
+            events[0].join()
+
+
+def run_watch_daemon(folders, queue_dir, workers, process, scan_options=None,
+                     settle_seconds=WATCH_SETTLE_SECONDS):
+    """
+    Watch inbox folders and process new episodes through the full pipeline.
+    
+    Stable files go into the on-disk queue; `workers` threads claim jobs and
+    run `process` on them. Jobs interrupted by a restart are reclaimed once
+    their lease expires. Several machines can watch the same share with the
+    same queue folder. Stops on Ctrl+C.
+    """
+    scan_options = scan_options or {}
+    queue_open(queue_dir)
     
-    # Summary
     print(f"\n{'='*60}")
-    print(f"📊 BATCH PROCESSING COMPLETE")
+    print(f"🛰️  WATCH MODE - {workers} worker(s)")
     print(f"{'='*60}")
-    print(f"✅ Completed: {len(completed)}/{total}")
-    if failed:
-        print(f"❌ Failed: {len(failed)}/{total}")
-        for f in failed:
-            print(f"   - {os.path.basename(f)}")
-    print(f"{'='*60}\n")
+    print(f"Queue: {queue_dir} {queue_counts(queue_dir)}\n")
     
-    # Shutdown if requested (only after ALL files are done)
-    if shutdown_after and len(completed) > 0:
-        print("⏻️  System shutting down in 60 seconds...")
-        print("   (Run 'shutdown /a' to cancel)\n")
-        os.system("shutdown /s /t 60")
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(
+            target=queue_worker_loop,
+            args=(queue_dir, folders, process, stop_event, i + 1),
+            daemon=True
+        )
+        for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    
+    roots = [os.path.abspath(f) for f in folders]
+    try:
+        for path in watch_for_stable_files(
+            folders, stop_event, settle_seconds,
+            recursive=scan_options.get("recursive", True),
+            include=scan_options.get("include"),
+            exclude=scan_options.get("exclude")
+        ):
+            root = next((r for r in roots if os.path.abspath(path).startswith(r)), roots[0])
+            if queue_enqueue(queue_dir, path, root):
+                print(f"📥 Queued: {path}")
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopping watch mode (running jobs resume after their lease expires)...")
+    finally:
+        stop_event.set()
 
 
 # ========== GUI/CLI APPLICATION ==========
@@ -387,6 +4396,175 @@ def main():
         batch_kwargs['widget'] = 'DirChooser'
     input_group.add_argument('--batch-folder', **batch_kwargs)
     
+    watch_kwargs = {
+        'metavar': 'Watch Folder',
+        'action': 'append',
+        'help': 'Keep running and process new videos dropped into this folder (repeatable)'
+    }
+    if GUI_MODE:
+        watch_kwargs['widget'] = 'DirChooser'
+    input_group.add_argument('--watch-folder', **watch_kwargs)
+    
+    input_group.add_argument(
+        '--live',
+        metavar='Live Stream',
+        help="Subtitle a live MPEG-TS feed with low latency (udp://@:1234, pipe:0 or '-' for stdin)"
+    )
+    
+    # ========== OUTPUT & WATCH MODE OPTIONS ==========
+    output_group = parser.add_argument_group(
+        'Output & Watch Mode',
+        'Where results go and how watch mode runs'
+    )
+    
+    output_kwargs = {
+        'metavar': 'Output Folder',
+        'default': None,
+        'help': 'Write encoded/final files here (default: next to each input)'
+    }
+    if GUI_MODE:
+        output_kwargs['widget'] = 'DirChooser'
+    output_group.add_argument('--output-dir', **output_kwargs)
+    
+    output_group.add_argument(
+        '--renditions',
+        metavar='Renditions',
+        default=None,
+        help="Several outputs from one decode, e.g. '1080:6:30,720:10:34' "
+             "(resolution:preset[:crf]); replaces Resolution/Preset and shares one subtitle pass"
+    )
+    
+    follow_kwargs = {
+        'action': 'store_true',
+        'help': 'Single file: the input is still being recorded/downloaded - encode and '
+                'transcribe it as it grows and finish once it stops growing'
+    }
+    if GUI_MODE:
+        follow_kwargs['widget'] = 'CheckBox'
+        follow_kwargs['metavar'] = 'Follow Growing File'
+    output_group.add_argument('--follow', **follow_kwargs)
+    
+    output_group.add_argument(
+        '--follow-timeout',
+        metavar='Follow Timeout (s)',
+        type=float,
+        default=FOLLOW_IDLE_SECONDS,
+        help='Follow mode: seconds without new data before the input counts as complete'
+    )
+    
+    proxy_kwargs = {
+        'action': 'store_true',
+        'help': 'Deliver a fast low-res proxy with subtitles first; the full-quality encode '
+                'follows at idle priority and replaces it in place'
+    }
+    if GUI_MODE:
+        proxy_kwargs['widget'] = 'CheckBox'
+        proxy_kwargs['metavar'] = 'Proxy First'
+    output_group.add_argument('--proxy', **proxy_kwargs)
+    
+    output_group.add_argument(
+        '--proxy-resolution',
+        metavar='Proxy Resolution',
+        choices=['1080', '720', '480'],
+        default='720',
+        help='Resolution of the proxy encode'
+    )
+    
+    output_group.add_argument(
+        '--proxy-preset',
+        metavar='Proxy Preset',
+        choices=[str(p) for p in range(8, 14)],
+        default='12',
+        help='SVT-AV1-scale preset of the proxy encode (8-13)'
+    )
+    
+    previous_kwargs = {
+        'metavar': 'Previous Release Output',
+        'default': None,
+        'help': 'Single file: final output made from the v1 release of this episode - reuse its '
+                'unchanged GOPs and subtitles and only encode/transcribe what the v2 changed'
+    }
+    if GUI_MODE:
+        previous_kwargs['widget'] = 'FileChooser'
+    output_group.add_argument('--previous-release', **previous_kwargs)
+    
+    library_kwargs = {
+        'metavar': 'Season Segment Library',
+        'default': None,
+        'help': 'Folder shared by the episodes of a season - OP/ED and other footage repeated '
+                'across episodes is encoded once there and spliced into each episode'
+    }
+    if GUI_MODE:
+        library_kwargs['widget'] = 'DirChooser'
+    output_group.add_argument('--segment-library', **library_kwargs)
+    
+    queue_kwargs = {
+        'metavar': 'Queue Folder',
+        'default': None,
+        'help': 'Durable job queue for watch/distributed mode (default: .anime_subber_queue '
+                'in the watch or batch folder; must be on the share for distributed mode)'
+    }
+    if GUI_MODE:
+        queue_kwargs['widget'] = 'DirChooser'
+    output_group.add_argument('--queue-dir', **queue_kwargs)
+    
+    distributed_kwargs = {
+        'action': 'store_true',
+        'help': 'Batch folder on a shared drive: run the same command on several machines '
+                'and they split the files through the queue folder'
+    }
+    if GUI_MODE:
+        distributed_kwargs['widget'] = 'CheckBox'
+        distributed_kwargs['metavar'] = 'Distributed Batch'
+    output_group.add_argument('--distributed', **distributed_kwargs)
+    
+    output_group.add_argument(
+        '--daemon-workers',
+        metavar='Queue Workers',
+        type=int,
+        default=1,
+        help='Files processed concurrently in watch or distributed mode'
+    )
+    
+    output_group.add_argument(
+        '--settle-seconds',
+        metavar='Settle Time (s)',
+        type=int,
+        default=WATCH_SETTLE_SECONDS,
+        help='A new file must stop growing for this long before it is processed'
+    )
+    
+    # ========== LIBRARY SCAN OPTIONS ==========
+    scan_group = parser.add_argument_group(
+        'Library Scan',
+        'How --batch-folder finds videos'
+    )
+    
+    recursive_kwargs = {
+        'action': 'store_true',
+        'help': 'Also process videos in sub-folders (e.g. one folder per season)'
+    }
+    if GUI_MODE:
+        recursive_kwargs['widget'] = 'CheckBox'
+        recursive_kwargs['metavar'] = 'Include Sub-folders'
+    scan_group.add_argument('--recursive', **recursive_kwargs)
+    
+    scan_group.add_argument(
+        '--include',
+        metavar='Include Pattern',
+        action='append',
+        default=None,
+        help='Only process files matching this glob (name or relative path, e.g. "*S01E*"); repeatable'
+    )
+    
+    scan_group.add_argument(
+        '--exclude',
+        metavar='Exclude Pattern',
+        action='append',
+        default=None,
+        help='Skip files or folders matching this glob (e.g. "Extras"); repeatable'
+    )
+    
     # ========== HARDWARE & PERFORMANCE OPTIONS ==========
     hardware_group = parser.add_argument_group(
         'Hardware & Performance',
@@ -423,6 +4601,269 @@ def main():
         preset_kwargs['widget'] = 'Dropdown'
     hardware_group.add_argument('--preset', **preset_kwargs)
     
+    encoder_kwargs = {
+        'metavar': 'Video Encoder',
+        'choices': list(ENCODER_BACKENDS),
+        'default': 'svtav1',
+        'help': 'Encoder backend; the preset and CRF scales above are mapped onto its own options'
+    }
+    if GUI_MODE:
+        encoder_kwargs['widget'] = 'Dropdown'
+    hardware_group.add_argument('--encoder', **encoder_kwargs)
+    
+    bench_kwargs = {
+        'action': 'store_true',
+        'help': 'Encode a clip of the input with every encoder ffmpeg supports at this preset, '
+                'report speed, bitrate and SSIM, then exit'
+    }
+    if GUI_MODE:
+        bench_kwargs['widget'] = 'CheckBox'
+        bench_kwargs['metavar'] = 'Benchmark Encoders'
+    hardware_group.add_argument('--benchmark-encoders', **bench_kwargs)
+    
+    profile_kwargs = {
+        'action': 'store_true',
+        'help': 'Time decode, scaling and encoding separately on a clip of the input, '
+                'save the best decoder/filter threads and scaler for this kind of source, then exit'
+    }
+    if GUI_MODE:
+        profile_kwargs['widget'] = 'CheckBox'
+        profile_kwargs['metavar'] = 'Profile Pipeline'
+    hardware_group.add_argument('--profile-pipeline', **profile_kwargs)
+    
+    decimate_kwargs = {
+        'action': 'store_true',
+        'help': 'Drop duplicate frames (anime on twos/threes) before encoding and write '
+                'variable frame rate; reports frames removed and the speedup'
+    }
+    if GUI_MODE:
+        decimate_kwargs['widget'] = 'CheckBox'
+        decimate_kwargs['metavar'] = 'Decimate Duplicate Frames'
+    hardware_group.add_argument('--decimate', **decimate_kwargs)
+    
+    analyze_decimate_kwargs = {
+        'action': 'store_true',
+        'help': 'Measure the share of duplicate frames and the encode speedup of --decimate '
+                'on a clip of the input, then exit'
+    }
+    if GUI_MODE:
+        analyze_decimate_kwargs['widget'] = 'CheckBox'
+        analyze_decimate_kwargs['metavar'] = 'Analyze Decimation'
+    hardware_group.add_argument('--analyze-decimation', **analyze_decimate_kwargs)
+    
+    telecine_kwargs = {
+        'action': 'store_true',
+        'help': 'Detect telecined (3:2 pulldown) and interlaced sources on sampled clips and '
+                'apply inverse telecine or deinterlacing before encoding (cached per file)'
+    }
+    if GUI_MODE:
+        telecine_kwargs['widget'] = 'CheckBox'
+        telecine_kwargs['metavar'] = 'Detect Telecine/Interlacing'
+    hardware_group.add_argument('--detect-telecine', **telecine_kwargs)
+    
+    crop_kwargs = {
+        'action': 'store_true',
+        'help': 'Detect letterbox/pillarbox black bars on sampled clips and crop them before '
+                'scaling, with a safety margin (cached per file)'
+    }
+    if GUI_MODE:
+        crop_kwargs['widget'] = 'CheckBox'
+        crop_kwargs['metavar'] = 'Detect Crop'
+    hardware_group.add_argument('--detect-crop', **crop_kwargs)
+    
+    native_kwargs = {
+        'choices': ['report', 'auto'],
+        'help': 'Estimate the native (pre-upscale) production height from sampled frames: '
+                'report it with the expected savings, or auto = encode at it when below '
+                'the target resolution (cached per file)'
+    }
+    if GUI_MODE:
+        native_kwargs['widget'] = 'Dropdown'
+        native_kwargs['metavar'] = 'Native Resolution'
+    hardware_group.add_argument('--native-resolution', **native_kwargs)
+    
+    frame_stats_kwargs = {
+        'action': 'store_true',
+        'help': 'Decode each source once into a per-frame statistics index (cached per file); '
+                'telecine/crop detection read every frame from it instead of sampling clips, '
+                'and benchmarks pick a representative clip'
+    }
+    if GUI_MODE:
+        frame_stats_kwargs['widget'] = 'CheckBox'
+        frame_stats_kwargs['metavar'] = 'Frame Statistics Index'
+    hardware_group.add_argument('--frame-stats', **frame_stats_kwargs)
+    
+    stream_kwargs = {
+        'action': 'store_true',
+        'help': 'Decode audio as a stream in fixed windows (flat memory for long movies)'
+    }
+    if GUI_MODE:
+        stream_kwargs['widget'] = 'CheckBox'
+        stream_kwargs['metavar'] = 'Streaming Audio Decode'
+    hardware_group.add_argument('--stream-audio', **stream_kwargs)
+    
+    workers_kwargs = {
+        'metavar': 'Transcription Workers',
+        'default': None,
+        'help': 'Batch only: transcribe files in a background pool while encoding '
+                '("auto" = calibrate workers x threads on this machine, or a number). '
+                'Not used with --parallel-jobs, where the scheduler runs each transcription as its own stage'
+    }
+    hardware_group.add_argument('--transcribe-workers', **workers_kwargs)
+    
+    hardware_group.add_argument(
+        '--transcribe-threads',
+        metavar='Threads Per Worker',
+        type=int,
+        default=None,
+        help='CPU threads per transcription worker (default: split the CPU budget evenly)'
+    )
+    
+    hardware_group.add_argument(
+        '--reserve-cores',
+        metavar='Cores Reserved For Encoding',
+        type=int,
+        default=0,
+        help='Cores kept out of the transcription budget for the concurrent AV1 encode'
+    )
+    
+    hardware_group.add_argument(
+        '--parallel-jobs',
+        metavar='Parallel Files',
+        type=int,
+        default=1,
+        help='Batch only: files in flight at once; stages start only when CPU, GPU and '
+             'memory (learned from past runs) are free (replaces --transcribe-workers)'
+    )
+    
+    hardware_group.add_argument(
+        '--max-memory-gb',
+        metavar='Memory Budget (GB)',
+        type=float,
+        default=None,
+        help='Memory the scheduler may hand out (default: physical RAM minus 2 GB)'
+    )
+    
+    hardware_group.add_argument(
+        '--batch-order',
+        metavar='Batch Order',
+        choices=['scan', 'makespan'],
+        default='scan',
+        help="scan: start files as they are found | makespan: longest first so parallel jobs "
+             "finish together, with a live ETA for the whole batch"
+    )
+    
+    hardware_group.add_argument(
+        '--deadline',
+        metavar='Finish By',
+        default=None,
+        help="Finish by this time ('07:00' or '2026-02-07 07:00'): presets are planned per file "
+             "from measured speeds, never slower than --preset, and re-planned as the batch runs"
+    )
+    
+    # ========== AI SUBTITLE OPTIONS ==========
+    subtitle_group = parser.add_argument_group(
+        'AI Subtitles',
+        'Configure Whisper transcription'
+    )
+    
+    cascade_kwargs = {
+        'action': 'store_true',
+        'help': 'Draft with a fast model, re-decode only low-confidence segments with a larger one'
+    }
+    if GUI_MODE:
+        cascade_kwargs['widget'] = 'CheckBox'
+        cascade_kwargs['metavar'] = 'Cascade Transcription'
+    subtitle_group.add_argument('--cascade', **cascade_kwargs)
+    
+    draft_kwargs = {
+        'metavar': 'Draft Model',
+        'choices': ['tiny', 'base', 'small'],
+        'default': 'small',
+        'help': 'Fast Whisper model used for the cascade draft pass'
+    }
+    if GUI_MODE:
+        draft_kwargs['widget'] = 'Dropdown'
+    subtitle_group.add_argument('--draft-model', **draft_kwargs)
+    
+    refine_kwargs = {
+        'metavar': 'Refine Model',
+        'choices': ['medium', 'large-v2', 'large-v3'],
+        'default': 'medium',
+        'help': 'Larger Whisper model used to re-decode flagged segments'
+    }
+    if GUI_MODE:
+        refine_kwargs['widget'] = 'Dropdown'
+    subtitle_group.add_argument('--refine-model', **refine_kwargs)
+    
+    languages_kwargs = {
+        'metavar': 'Subtitle Languages',
+        'default': None,
+        'help': 'Comma-separated tracks from one ASR pass, e.g. "ja,en,es" '
+                '(Japanese transcript + offline text translation)'
+    }
+    subtitle_group.add_argument('--subtitle-languages', **languages_kwargs)
+    
+    cache_kwargs = {
+        'action': 'store_true',
+        'help': 'Cache decoded 16 kHz audio per file so re-runs skip decode (implies streaming)'
+    }
+    if GUI_MODE:
+        cache_kwargs['widget'] = 'CheckBox'
+        cache_kwargs['metavar'] = 'Audio Feature Cache'
+    subtitle_group.add_argument('--feature-cache', **cache_kwargs)
+    
+    cache_dir_kwargs = {
+        'metavar': 'Feature Cache Folder',
+        'default': None,
+        'help': 'Where to keep cached audio features (default: per-user cache folder)'
+    }
+    if GUI_MODE:
+        cache_dir_kwargs['widget'] = 'DirChooser'
+    subtitle_group.add_argument('--feature-cache-dir', **cache_dir_kwargs)
+    
+    subtitle_group.add_argument(
+        '--feature-cache-gb',
+        metavar='Feature Cache Size (GB)',
+        type=float,
+        default=20,
+        help='Least recently used entries are evicted above this size'
+    )
+    
+    subtitle_group.add_argument(
+        '--live-output',
+        metavar='Live Subtitle Output',
+        default='-',
+        help="Live mode: subtitle stream file, or '-' for stdout (cues flushed as they appear; "
+             "a corrected cue is re-sent with the same ID)"
+    )
+    
+    subtitle_group.add_argument(
+        '--live-format',
+        metavar='Live Subtitle Format',
+        choices=['vtt', 'srt'],
+        default='vtt',
+        help='Live mode: WebVTT or SRT cue stream'
+    )
+    
+    subtitle_group.add_argument(
+        '--live-window',
+        metavar='Live Window (s)',
+        type=float,
+        default=LIVE_WINDOW_SECONDS,
+        help='Live mode: longest stretch of audio re-recognised on each step'
+    )
+    
+    live_bench_kwargs = {
+        'action': 'store_true',
+        'help': 'Stream the input locally in real time through live mode and report '
+                'cue latency (median / 95th percentile), then exit'
+    }
+    if GUI_MODE:
+        live_bench_kwargs['widget'] = 'CheckBox'
+        live_bench_kwargs['metavar'] = 'Live Latency Benchmark'
+    subtitle_group.add_argument('--live-benchmark', **live_bench_kwargs)
+    
     # ========== POST-TASK ACTION ==========
     action_group = parser.add_argument_group(
         'Post-Task Action',
@@ -443,6 +4884,16 @@ def main():
     
     # ========== VALIDATE & PROCESS ==========
     
+    live_settings = {"window_seconds": args.live_window}
+    if args.live:
+        # Live stream mode runs until the feed ends or Ctrl+C
+        print(f"\n📡 Live Subtitle Mode: {args.live} → {args.live_output} ({args.live_format.upper()})", file=sys.stderr)
+        try:
+            run_live_subtitles(args.live, args.live_output, args.device, live_settings, args.live_format)
+        except KeyboardInterrupt:
+            pass
+        return
+    
     # Determine input files
     if args.input:
         # Single file mode
@@ -459,18 +4910,36 @@ def main():
             print(f"❌ Error: Folder not found: {args.batch_folder}")
             sys.exit(1)
         
-        files = get_video_files_from_folder(args.batch_folder)
+        # Stream the scan so work starts on the first file right away
+        files = iter_probed_files(scan_video_files(
+            args.batch_folder,
+            recursive=args.recursive,
+            include=args.include,
+            exclude=args.exclude
+        ))
+        head = list(islice(files, 2))
         
-        if not files:
+        if not head:
             print(f"❌ Error: No video files found in: {args.batch_folder}")
             print(f"   Supported formats: {', '.join(SUPPORTED_VIDEO_EXTENSIONS)}")
             sys.exit(1)
         
-        print(f"\n📁 Batch Folder Mode")
-        print(f"   Found {len(files)} video file(s)")
+        files = head if len(head) == 1 and not args.distributed else chain(head, files)
+        print(f"\n📁 Batch Folder Mode{' (recursive)' if args.recursive else ''}")
+        print(f"   First file: {head[0]}")
+    
+    elif args.watch_folder:
+        # Watch mode
+        for folder in args.watch_folder:
+            if not os.path.isdir(folder):
+                print(f"❌ Error: Folder not found: {folder}")
+                sys.exit(1)
+        
+        files = None
+        print("\n📁 Watch Folder Mode")
     
     else:
-        print("❌ Error: Must specify either --input or --batch-folder")
+        print("❌ Error: Must specify either --input, --batch-folder, --watch-folder or --live")
         sys.exit(1)
     
     # Display configuration
@@ -479,19 +4948,189 @@ def main():
     print(f"{'='*60}")
     print(f"AI Device:       {args.device.upper()}")
     print(f"Resolution:      {args.resolution}p" if args.resolution != 'source' else f"Resolution:      Keep Original")
-    print(f"SVT-AV1 Preset:  {args.preset} (0=slowest/best, 13=fastest)")
+    print(f"Encoder:         {ENCODER_BACKENDS[args.encoder]['label']}")
+    print(f"Preset:          {args.preset} (0=slowest/best, 13=fastest)")
+    print(f"Audio Decode:    {'Streaming' if args.stream_audio else 'Whole file'}")
+    if args.feature_cache:
+        print(f"Feature Cache:   {args.feature_cache_dir or get_cache_dir('features')} ({args.feature_cache_gb:g} GB)")
+    if args.subtitle_languages:
+        print(f"Subtitle Tracks: {args.subtitle_languages}")
+    if args.cascade:
+        print(f"Transcription:   Cascade ({args.draft_model} → {args.refine_model})")
+    deadline = None
+    if args.deadline:
+        try:
+            deadline = parse_deadline(args.deadline)
+        except ValueError:
+            print(f"❌ Error: Invalid --deadline: {args.deadline} (use HH:MM or YYYY-MM-DD HH:MM)")
+            sys.exit(1)
+        print(f"Deadline:        {time.strftime('%a %H:%M', time.localtime(deadline))}")
     print(f"Shutdown After:  {'Yes' if args.shutdown else 'No'}")
     print(f"{'='*60}\n")
     
+    if args.benchmark_encoders or args.profile_pipeline or args.live_benchmark or args.analyze_decimation:
+        if not files:
+            print("❌ Error: --benchmark-encoders / --profile-pipeline / --live-benchmark / "
+                  "--analyze-decimation need --input or --batch-folder")
+            sys.exit(1)
+        sample = files[0] if isinstance(files, list) else head[0]
+        if args.frame_stats:
+            get_frame_stats(sample)  # Benchmarks then measure a representative clip
+        if args.live_benchmark:
+            benchmark_live_latency(sample, args.device, live_settings)
+        if args.profile_pipeline:
+            profile_pipeline(sample, args.resolution, int(args.preset), args.encoder)
+        if args.analyze_decimation:
+            analyze_decimation(sample, args.resolution, int(args.preset), args.encoder)
+        if args.benchmark_encoders:
+            benchmark_encoders(sample, args.resolution, int(args.preset))
+        return
+    
+    renditions = None
+    if args.renditions:
+        try:
+            renditions = parse_renditions(args.renditions)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print("🎞️  Renditions:    " + ", ".join(
+            f"{r['resolution']}p P{r['preset']} CRF{r['crf']}" for r in renditions))
+    
+    proxy = None
+    if args.proxy:
+        if renditions:
+            print("⚠️  --proxy is ignored with --renditions")
+        else:
+            proxy = {"resolution": args.proxy_resolution, "preset": args.proxy_preset}
+            print(f"⚡ Proxy first:    {proxy['resolution']}p P{proxy['preset']}, archival encode replaces it")
+    
+    if args.follow and (not args.input or proxy):
+        print("⚠️  --follow only applies to a single --input without --proxy")
+    
+    analysis = {"telecine": args.detect_telecine, "crop": args.detect_crop, "native": args.native_resolution,
+                "frame_stats": args.frame_stats}
+    # Cropping, IVTC, decimation and native-resolution encodes change the
+    # frame grid, so frame-indexed splicing against other encodes can't apply
+    reshapes_frames = args.decimate or any(v for k, v in analysis.items() if k != "frame_stats")
+    
+    previous_release = args.previous_release
+    if previous_release and (not args.input or proxy or renditions or args.follow or reshapes_frames):
+        print("⚠️  --previous-release only applies to a single --input without "
+              "--proxy/--renditions/--follow/--decimate/--detect-*/--native-resolution")
+        previous_release = None
+    
+    segment_library = args.segment_library
+    if segment_library:
+        if renditions or proxy or reshapes_frames:
+            print("⚠️  --segment-library is ignored with --renditions/--proxy/--decimate/--detect-*/--native-resolution")
+            segment_library = None
+        else:
+            print(f"📚 Segment library: {segment_library}")
+    if args.decimate:
+        print("🎞️  Decimation:    duplicate frames dropped, variable frame rate output")
+    
+    if args.encoder not in available_encoders():
+        print(f"❌ Error: This ffmpeg was built without {ENCODER_BACKENDS[args.encoder]['codec']}")
+        print(f"   Available: {', '.join(available_encoders()) or 'none'}")
+        sys.exit(1)
+    
+    feature_cache = None
+    if args.feature_cache:
+        feature_cache = {
+            "dir": args.feature_cache_dir or get_cache_dir("features"),
+            "max_gb": args.feature_cache_gb
+        }
+        os.makedirs(feature_cache["dir"], exist_ok=True)
+    
+    transcribe_settings = {
+        "stream": args.stream_audio or args.feature_cache,
+        "feature_cache": feature_cache,
+        "cascade": args.cascade,
+        "draft_model": args.draft_model,
+        "refine_model": args.refine_model,
+        "languages": [l.strip() for l in args.subtitle_languages.split(",") if l.strip()]
+                     if args.subtitle_languages else None
+    }
+    
+    def process_queued(input_file):
+        if proxy:
+            return process_with_proxy(
+                input_file, args.device, args.resolution, args.preset, proxy, args.output_dir,
+                transcribe_settings=transcribe_settings, encoder=args.encoder,
+                decimate=args.decimate, analysis=analysis
+            )
+        return process_single_file(
+            input_file, args.device, args.resolution, args.preset, args.output_dir,
+            transcribe_settings=transcribe_settings,
+            encoder=args.encoder,
+            renditions=renditions,
+            segment_library=segment_library,
+            decimate=args.decimate,
+            analysis=analysis
+        )
+    
+    scan_options = {"recursive": args.recursive, "include": args.include, "exclude": args.exclude}
+    
     # Process files
-    if len(files) == 1:
-        # Single file processing
-        output_file = process_single_file(
-            files[0],
-            args.device,
-            args.resolution,
-            args.preset
+    if args.watch_folder:
+        # Watch folders until interrupted
+        run_watch_daemon(
+            args.watch_folder,
+            args.queue_dir or os.path.join(args.watch_folder[0], ".anime_subber_queue"),
+            args.daemon_workers,
+            process_queued,
+            scan_options,
+            args.settle_seconds
         )
+    
+    elif args.distributed:
+        # Several machines share the batch through the queue on the share
+        run_distributed_batch(
+            [args.batch_folder],
+            args.queue_dir or os.path.join(args.batch_folder, ".anime_subber_queue"),
+            args.daemon_workers,
+            process_queued,
+            scan_options
+        )
+    
+    elif isinstance(files, list) and len(files) == 1:
+        preset = args.preset
+        if deadline:
+            calibrate_encode_speed(files[0], args.resolution, args.encoder)
+            presets, projected = plan_presets(
+                [get_duration(files[0])], deadline - time.time(),
+                args.resolution, args.device, int(args.preset), encoder=args.encoder
+            )
+            preset = str(presets[0])
+            print(f"🗓️  Deadline plan: preset {preset}, projected {projected/60:.0f} min\n")
+        
+        # Single file processing
+        if previous_release:
+            output_file = reprocess_release(
+                files[0], previous_release, args.device, args.resolution, preset,
+                args.output_dir, transcribe_settings=transcribe_settings, encoder=args.encoder
+            )
+        elif proxy:
+            output_file = process_with_proxy(
+                files[0], args.device, args.resolution, preset, proxy, args.output_dir,
+                transcribe_settings=transcribe_settings, encoder=args.encoder,
+                decimate=args.decimate, analysis=analysis
+            )
+        else:
+            output_file = process_single_file(
+                files[0],
+                args.device,
+                args.resolution,
+                preset,
+                args.output_dir,
+                transcribe_settings=transcribe_settings,
+                encoder=args.encoder,
+                renditions=renditions,
+                follow=args.follow_timeout if args.follow else None,
+                segment_library=segment_library,
+                decimate=args.decimate,
+                analysis=analysis
+            )
         
         print(f"\n{'='*60}")
         print(f"✅ PROCESSING COMPLETE")
@@ -506,13 +5145,62 @@ def main():
             os.system("shutdown /s /t 60")
     
     else:
+        # Optional background transcription pool with a CPU thread budget
+        transcribe_pool = None
+        if args.transcribe_workers:
+            pool_cores = get_transcription_cores(args.reserve_cores)
+            cpu_budget = len(pool_cores)
+            if args.transcribe_workers == 'auto' and args.device == 'cpu':
+                workers, threads = calibrate_transcription_split(head[0], cpu_budget, cores=pool_cores)
+            else:
+                workers = 1 if args.transcribe_workers == 'auto' else int(args.transcribe_workers)
+                threads = args.transcribe_threads or max(cpu_budget // workers, 1)
+            transcribe_pool = {
+                "workers": workers,
+                "threads": args.transcribe_threads or threads,
+                "encode_threads": args.reserve_cores or None,
+                "cores": pool_cores
+            }
+            print(f"🎙️  Transcription pool: {transcribe_pool['workers']} worker(s) x "
+                  f"{transcribe_pool['threads']} thread(s), {args.reserve_cores} core(s) reserved for encoding\n")
+        
+        # Optional resource-aware scheduling of several files at once
+        scheduler = None
+        if args.parallel_jobs > 1:
+            scheduler = make_scheduler(
+                args.parallel_jobs,
+                accelerators=1 if args.device == 'cuda' else 0,
+                memory_mb=args.max_memory_gb * 1024 if args.max_memory_gb else None
+            )
+            capacity = scheduler["capacity"]
+            print(f"🧮 Scheduler: {args.parallel_jobs} files in flight | {capacity['cpu']} CPU, "
+                  f"{capacity['accel']} GPU, {capacity['memory_mb']/1024:.1f} GB\n")
+            if transcribe_pool:
+                print("⚠️  --transcribe-workers is ignored with --parallel-jobs (the scheduler handles transcription)\n")
+                transcribe_pool = None
+        
+        if deadline:
+            calibrate_encode_speed(head[0], args.resolution, args.encoder)
+        
         # Batch processing
         process_batch(
             files,
             args.device,
             args.resolution,
             args.preset,
-            args.shutdown
+            args.shutdown,
+            transcribe_settings,
+            transcribe_pool,
+            args.output_dir,
+            scheduler,
+            deadline,
+            args.batch_order,
+            args.encoder,
+            renditions,
+            proxy,
+            segment_library,
+            args.decimate,
+            analysis
         )
 
 
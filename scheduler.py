@@ -0,0 +1,249 @@
+"""
+===================================
+RESOURCE-AWARE SCHEDULER
+===================================
+scheduler.py
+
+Admits batch stages (encode, transcribe, mux) only when their CPU,
+accelerator and memory needs fit in the free capacity of this machine,
+and hands concurrent stages disjoint core sets. Stage memory is learned
+from the peak RSS measured on earlier runs (main_app's run_stage_command)
+and kept per machine in the cache folder, next to the measured speeds the
+deadline planner uses.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from storage import get_cache_dir, write_json_atomic
+
+# Default memory needs (MB) until a stage has been measured on this machine,
+# and the safety margin applied to measurements.
+DEFAULT_STAGE_MEMORY_MB = {
+    'encode:2160': 9000,
+    'encode:1440': 5000,
+    'encode:1080': 3500,
+    'encode:720': 2000,
+    'transcribe:cuda': 2500,
+    'transcribe:cpu': 3000,
+    'mux': 300,
+}
+MEMORY_SAFETY_MARGIN = 1.15
+SYSTEM_RESERVED_MEMORY_MB = 2048  # Left for the OS and desktop
+HARDWARE_ENCODER_SUFFIXES = ('_nvenc', '_qsv', '_amf')  # Encoder backends that run on the GPU
+
+# Held while a per-machine stage history (memory or speed) is read and rewritten
+HISTORY_LOCK = threading.Lock()
+
+
+def get_available_cores():
+    """Logical core ids this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_total_memory_mb():
+    """Physical memory of this machine in MB."""
+    if os.name == 'nt':
+        import ctypes
+        
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+        
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+        return status.ullTotalPhys // (1024 * 1024)
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+
+
+def encode_stage_key(resolution, preset=None, encoder="svtav1"):
+    """History key for an encode's measured memory (no preset) or speed (with preset)."""
+    key = f"encode:{resolution}" if encoder == "svtav1" else f"encode:{encoder}:{resolution}"
+    return key if preset is None else f"{key}:p{preset}"
+
+
+def _stage_memory_file():
+    return os.path.join(get_cache_dir("scheduler"), "stage_memory.json")
+
+
+def load_stage_memory():
+    """Peak memory measured for each stage key on earlier runs."""
+    try:
+        with open(_stage_memory_file(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_stage_memory(stage_key, peak_mb):
+    """Fold a measured peak into the per-stage history (moving average, never below the last peak / 2)."""
+    with HISTORY_LOCK:
+        history = load_stage_memory()
+        entry = history.get(stage_key)
+        if entry:
+            entry["peak_mb"] = max(0.7 * entry["peak_mb"] + 0.3 * peak_mb, peak_mb / 2)
+            entry["runs"] += 1
+        else:
+            entry = {"peak_mb": peak_mb, "runs": 1}
+        entry["last_mb"] = peak_mb
+        history[stage_key] = entry
+        write_json_atomic(_stage_memory_file(), history)
+
+
+def make_scheduler(max_jobs, cpus=None, accelerators=0, memory_mb=None):
+    """
+    Create a scheduler that admits stages only when CPU, accelerator and memory slots are free.
+    
+    Args:
+        max_jobs: Files in flight at once
+        cpus: CPU slots (default: all logical cores)
+        accelerators: GPU slots (1 when transcribing on CUDA)
+        memory_mb: Memory budget (default: physical RAM minus a reserve for the OS)
+    """
+    core_pool = get_available_cores()
+    capacity = {
+        "cpu": cpus or len(core_pool),
+        "accel": accelerators,
+        "memory_mb": memory_mb or max(get_total_memory_mb() - SYSTEM_RESERVED_MEMORY_MB, 1024),
+    }
+    return {
+        "max_jobs": max_jobs,
+        "capacity": capacity,
+        "free": dict(capacity),
+        # Concurrent stages get disjoint core sets (only when slots map onto real cores)
+        "free_cores": core_pool if capacity["cpu"] <= len(core_pool) else None,
+        "cond": threading.Condition(),
+        "waiting": {},  # priority -> stages waiting for resources
+        "history": load_stage_memory(),
+    }
+
+
+def _interpolate_by_pixels(points, height):
+    """Value at `height` from {height: value}, linear in pixel count between the two nearest heights."""
+    heights = sorted(points)
+    upper = next((h for h in heights[1:] if h >= height), heights[-1])
+    lower = heights[heights.index(upper) - 1]
+    share = (height ** 2 - lower ** 2) / (upper ** 2 - lower ** 2)
+    return max(points[lower] + share * (points[upper] - points[lower]), min(points.values()) / 4)
+
+
+def estimate_encode_memory(history, resolution, encoder="svtav1"):
+    """
+    Memory (MB) an encode at a target height needs, with the safety margin.
+    
+    A height measured on this machine is used as is. Other heights (such as
+    a native 874p) are interpolated by pixel count: between measured heights
+    of the same encoder when there are two or more, otherwise along the
+    built-in defaults, scaled to the one measured height if there is one.
+    """
+    key = encode_stage_key(resolution, encoder=encoder)
+    if key in history:
+        return history[key]["peak_mb"] * MEMORY_SAFETY_MARGIN
+    defaults = {int(k.split(":")[1]): v for k, v in DEFAULT_STAGE_MEMORY_MB.items() if k.startswith("encode:")}
+    if not str(resolution).isdigit():
+        return defaults[max(defaults)]   # 'source': the size is not known here
+    
+    height = int(resolution)
+    prefix = encode_stage_key("", encoder=encoder)
+    measured = {int(k[len(prefix):]): entry["peak_mb"] * MEMORY_SAFETY_MARGIN
+                for k, entry in history.items() if k.startswith(prefix) and k[len(prefix):].isdigit()}
+    if len(measured) >= 2:
+        return _interpolate_by_pixels(measured, height)
+    estimate = _interpolate_by_pixels(defaults, height)
+    for measured_height, mb in measured.items():
+        estimate *= mb / _interpolate_by_pixels(defaults, measured_height)
+    return estimate
+
+
+def stage_resource_needs(scheduler, stage, device="cuda", resolution="1080", encoder="svtav1"):
+    """
+    Declared needs of a stage: CPU slots, accelerator slots and memory.
+    
+    Memory comes from measurements of the same stage on earlier runs (with a
+    safety margin), falling back to built-in defaults; encodes at heights
+    without a measurement are interpolated (see estimate_encode_memory).
+    """
+    cpus = scheduler["capacity"]["cpu"]
+    if stage == "encode":
+        key = encode_stage_key(resolution, encoder=encoder)
+        # Hardware encoders only need a core to feed them
+        hardware = encoder.endswith(HARDWARE_ENCODER_SUFFIXES)
+        needs = {"cpu": 1 if hardware else max(cpus // 2, 1), "accel": 0,
+                 "memory_mb": estimate_encode_memory(scheduler["history"], resolution, encoder)}
+    else:
+        if stage == "transcribe":
+            key = f"transcribe:{device}"
+            needs = {"cpu": 1, "accel": 1} if device == "cuda" else {"cpu": max(cpus // 4, 1), "accel": 0}
+        else:
+            key = "mux"
+            needs = {"cpu": 0, "accel": 0}
+        measured = scheduler["history"].get(key)
+        needs["memory_mb"] = measured["peak_mb"] * MEMORY_SAFETY_MARGIN if measured else DEFAULT_STAGE_MEMORY_MB[key]
+    needs["key"] = key
+    return needs
+
+
+def acquire_resources(scheduler, needs, label, priority=0):
+    """
+    Block until the stage fits in the free capacity, then reserve it.
+    
+    Stages with a lower priority number go first: while any of them is
+    waiting, higher-numbered stages are not admitted even if they would fit.
+    """
+    # A stage bigger than the whole machine still runs, just alone
+    wanted = {r: min(needs[r], scheduler["capacity"][r]) for r in ("cpu", "accel", "memory_mb")}
+    waiting = scheduler["waiting"]
+    with scheduler["cond"]:
+        waiting[priority] = waiting.get(priority, 0) + 1
+        announced = False
+        while (any(wanted[r] > scheduler["free"][r] for r in wanted)
+               or any(count for p, count in waiting.items() if p < priority)):
+            if not announced:
+                print(f"⏳ Waiting for resources: {label} "
+                      f"({wanted['cpu']} CPU, {wanted['accel']} GPU, {wanted['memory_mb']/1024:.1f} GB)")
+                announced = True
+            scheduler["cond"].wait()
+        waiting[priority] -= 1
+        scheduler["cond"].notify_all()
+        for r in wanted:
+            scheduler["free"][r] -= wanted[r]
+        if scheduler["free_cores"] is not None and wanted["cpu"]:
+            wanted["cores"] = scheduler["free_cores"][:wanted["cpu"]]
+            del scheduler["free_cores"][:wanted["cpu"]]
+    return wanted
+
+
+def release_resources(scheduler, reserved):
+    """Return reserved capacity and wake waiting stages."""
+    with scheduler["cond"]:
+        for r in ("cpu", "accel", "memory_mb"):
+            scheduler["free"][r] += reserved[r]
+        if reserved.get("cores"):
+            scheduler["free_cores"] = sorted(scheduler["free_cores"] + reserved["cores"])
+        scheduler["cond"].notify_all()
+
+
+@contextmanager
+def reserved_resources(scheduler, stage, label, device="cuda", resolution="1080", encoder="svtav1",
+                       priority=0):
+    """Hold a stage's resources for the duration of a with-block (no-op without a scheduler)."""
+    if scheduler is None:
+        yield None
+        return
+    needs = stage_resource_needs(scheduler, stage, device, resolution, encoder)
+    reserved = acquire_resources(scheduler, needs, label, priority)
+    needs["cores"] = reserved.get("cores")
+    try:
+        yield needs
+    finally:
+        release_resources(scheduler, reserved)
@@ -15,8 +15,12 @@ This script:
 2. Shows time and size estimates
 3. Exits (doesn't encode full video)
 
+Encoders are main_app.py backend names (svtav1, aom, rav1e, x265,
+hevc_nvenc, ...); "all" compares every encoder your ffmpeg supports.
+Default: svtav1.
+
 USAGE (Direct Python):
-  python benchmark.py <input>
+  python benchmark.py <input> [encoder ...]
 
 USAGE (Wrapper Scripts - Recommended):
   Windows PowerShell: .\benchmark.ps1 input.mp4
@@ -24,6 +28,7 @@ USAGE (Wrapper Scripts - Recommended):
 
 EXAMPLES:
   python benchmark.py input.mp4
+  python benchmark.py input.mp4 svtav1 x265
   .\benchmark.ps1 video.mkv
   ./benchmark.sh sample.mp4
 """
@@ -33,6 +38,14 @@ import subprocess
 import os
 import time
 
+from encoder_backends import load_backends
+
+# ========== ENCODER BACKENDS ==========
+# The encoder table lives in main_app.py (one folder up): codec names and
+# how the SVT-AV1 preset/CRF scale used below maps onto each encoder.
+# BACKENDS/available are loaded once at startup (see encoder_backends.py).
+
+
 # ========== HELPER FUNCTIONS ==========
 
 def get_duration(file):
@@ -48,13 +61,15 @@ def get_duration(file):
     return float(subprocess.check_output(cmd).decode().strip())
 
 
-def estimate(input_file, res, preset, crf, total_duration):
+def estimate(input_file, res, preset, crf, total_duration, encoder="svtav1"):
     """
     Benchmark a specific encoding preset.
     
     Tests only 8 seconds to quickly estimate full encode time and output size.
+    Preset/CRF are on the SVT-AV1 scale and mapped onto the chosen encoder.
     See convert2.py for detailed documentation.
     """
+    backend = BACKENDS[encoder]
     ffmpeg_path = "ffmpeg"
     output_test = "test_bench.mkv"
     scale = f"scale=-2:{res}:flags=lanczos" if res != "source" else "null"
@@ -62,9 +77,8 @@ def estimate(input_file, res, preset, crf, total_duration):
     cmd = [
         ffmpeg_path, "-y", "-i", input_file, "-t", "8",
         "-vf", scale, 
-        "-c:v", "libsvtav1", 
-        "-preset", str(preset), 
-        "-crf", str(crf),
+        "-c:v", backend["codec"],
+        *backend["args"](preset, crf, None),
         "-c:a", "libopus", 
         output_test
     ]
@@ -92,12 +106,21 @@ def estimate(input_file, res, preset, crf, total_duration):
 # ========== MAIN EXECUTION ==========
 
 if len(sys.argv) < 2:
-    print("Usage: python bench.py input.mp4")
+    print("Usage: python bench.py input.mp4 [encoder ...]")
     sys.exit(1)
 
 input_vid = sys.argv[1]
 duration = get_duration(input_vid)
 
+BACKENDS, available = load_backends()
+encoders = sys.argv[2:] or ["svtav1"]
+if encoders == ["all"]:
+    encoders = available
+unknown = [name for name in encoders if name not in BACKENDS]
+if unknown:
+    print(f"❌ Unknown encoder(s): {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+    sys.exit(1)
+
 print(f"\n--- Benchmarking Ryzen 2600 ({duration/60:.1f} min video) ---\n")
 
 # Test 4 preset options
@@ -108,9 +131,12 @@ options = [
     ("720", 10, 40, "Ultra Fast")
 ]
 
-for i, (res, p, crf, label) in enumerate(options, 1):
-    h, s = estimate(input_vid, res, p, crf, duration)
-    print(f"{i}) {res:6} | {label:15} (P{p}/CRF{crf}) -> Est: {h:5.1f} hrs | {s:5.1f} GB")
+for encoder in encoders:
+    if len(encoders) > 1:
+        print(f"\n{BACKENDS[encoder]['label']}:")
+    for i, (res, p, crf, label) in enumerate(options, 1):
+        h, s = estimate(input_vid, res, p, crf, duration, encoder)
+        print(f"{i}) {res:6} | {label:15} (P{p}/CRF{crf}) -> Est: {h:5.1f} hrs | {s:5.1f} GB")
 
 print("\n📝 Next step: Use convert2.py to encode and pick your preferred option")
 print("   python convert2.py <input> <output>")
\ No newline at end of file
@@ -11,6 +11,8 @@ This script:
 3. Lets you pick the best option interactively
 4. Can auto-shutdown PC when done
 5. BATCH MODE: Supports wildcard patterns (*.mp4, videos/*.mkv)
+6. Encodes with any encoder your ffmpeg supports (SVT-AV1, libaom,
+   rav1e, x265, NVENC/QSV/AMF), using main_app.py's encoder table
 
 BEST FOR: When you want to optimize settings for your specific hardware
           and choose between speed vs quality tradeoffs
@@ -35,6 +37,8 @@ import os
 import time
 from glob import glob
 
+from encoder_backends import load_backends
+
 # ========== PATH HELPERS ==========
 
 def get_ffmpeg_path():
@@ -45,6 +49,31 @@ def get_ffmpeg_path():
         return local_ffmpeg
     return "ffmpeg"
 
+# ========== ENCODER BACKENDS ==========
+# The encoder table lives in main_app.py (one folder up): codec names and
+# how the SVT-AV1 preset/CRF scale used below maps onto each encoder.
+# BACKENDS/AVAILABLE are loaded once at startup (see encoder_backends.py).
+
+
+def choose_encoder(prompt):
+    """Let the user pick one of the available encoders (Enter = SVT-AV1)."""
+    if not AVAILABLE:
+        print("⚠ Could not list ffmpeg encoders, using SVT-AV1")
+        return "svtav1"
+    print("⚙️  Available encoders:")
+    for i, name in enumerate(AVAILABLE, 1):
+        print(f"  {i}) {BACKENDS[name]['label']}")
+    answer = input(f"{prompt} (1-{len(AVAILABLE)}, Enter = SVT-AV1): ").strip()
+    if answer.isdigit() and 1 <= int(answer) <= len(AVAILABLE):
+        return AVAILABLE[int(answer) - 1]
+    return "svtav1"
+
+
+def video_codec_args(encoder, preset, crf):
+    """ffmpeg video codec options for an encoder at an SVT-AV1 preset/CRF."""
+    backend = BACKENDS[encoder]
+    return ["-c:v", backend["codec"], *backend["args"](preset, crf, None)]
+
 # ========== HELPER FUNCTIONS ==========
 
 def get_duration(file):
@@ -58,11 +87,10 @@ def get_duration(file):
     return float(subprocess.check_output(cmd).decode().strip())
 
 
-def estimate(input_file, res, preset, crf, total_duration, use_gpu=False):
+def estimate(input_file, res, preset, crf, total_duration, encoder="svtav1"):
     """Benchmark a specific encoding preset on your hardware.
 
-    use_gpu=False  -> CPU encode with libsvtav1
-    use_gpu=True   -> GPU encode with hevc_nvenc (NVENC HEVC)
+    encoder is a main_app backend name; preset/CRF are on the SVT-AV1 scale.
     """
     ffmpeg_path = get_ffmpeg_path()
     output_test = "test_bench.mkv"
@@ -70,23 +98,7 @@ def estimate(input_file, res, preset, crf, total_duration, use_gpu=False):
     scale = f"scale=-2:{res}:flags=lanczos" if res != "source" else "null"
     
     cmd = [ffmpeg_path, "-y", "-i", input_file, "-t", "8", "-vf", scale]
-
-    if use_gpu:
-        gpu_preset = {"6": "slow", "8": "medium", "10": "fast"}.get(str(preset), "medium")
-        cmd += [
-            "-c:v", "hevc_nvenc",
-            "-preset", gpu_preset,
-            "-rc", "vbr_hq",
-            "-cq", str(crf),
-            "-b:v", "0",
-        ]
-    else:
-        cmd += [
-            "-c:v", "libsvtav1", 
-            "-preset", str(preset), 
-            "-crf", str(crf),
-        ]
-
+    cmd += video_codec_args(encoder, preset, crf)
     cmd += [
         "-c:a", "libopus", 
         output_test
@@ -122,37 +134,21 @@ def estimate(input_file, res, preset, crf, total_duration, use_gpu=False):
     return est_hours, est_gb
 
 
-def encode_file(input_vid, output_vid, settings, use_gpu=False):
+def encode_file(input_vid, output_vid, settings, encoder="svtav1"):
     """Encode a single file with chosen settings.
 
-    use_gpu=False  -> CPU encode with libsvtav1
-    use_gpu=True   -> GPU encode with hevc_nvenc (NVENC HEVC)
+    encoder is a main_app backend name; preset/CRF are on the SVT-AV1 scale.
     """
     ffmpeg_path = get_ffmpeg_path()
     
     scale = f"scale=-2:{settings['res']}:flags=lanczos" if settings['res'] != "source" else "null"
     
+    label = BACKENDS[encoder]["label"]
     cmd = [ffmpeg_path, "-i", input_vid, "-vf", scale]
-
-    if use_gpu:
-        gpu_preset = {"6": "slow", "8": "medium", "10": "fast"}.get(str(settings['p']), "medium")
-        cmd += [
-            "-c:v", "hevc_nvenc",
-            "-preset", gpu_preset,
-            "-rc", "vbr_hq",
-            "-cq", str(settings['crf']),
-            "-b:v", "0",
-            "-metadata", f"comment=Converted HEVC NVENC preset {gpu_preset} CQ{settings['crf']}",
-        ]
-    else:
-        cmd += [
-            "-c:v", "libsvtav1", 
-            "-preset", settings['p'], 
-            "-crf", settings['crf'],
-            "-svtav1-params", "tune=0:enable-overlays=1:lookahead=120",
-            "-metadata", f"comment=Converted SVT-AV1 P{settings['p']} CRF{settings['crf']}",
-        ]
-
+    cmd += video_codec_args(encoder, settings['p'], settings['crf'])
+    cmd += [
+        "-metadata", f"comment=Converted {label} P{settings['p']} CRF{settings['crf']}",
+    ]
     cmd += [
         "-c:a", "libopus", "-b:a", "128k",
         output_vid
@@ -183,6 +179,8 @@ if not files:
     print(f"❌ No files matched: {input_pattern}")
     sys.exit(1)
 
+BACKENDS, AVAILABLE = load_backends()
+
 if len(files) > 1:
     # BATCH MODE - Run smart benchmark once, apply choice to all
     print(f"\n{'='*60}")
@@ -196,20 +194,17 @@ if len(files) > 1:
     print(f"📁 Sample File: {sample_vid}")
     print(f"📊 Duration: {duration/60:.1f} minutes\n")
 
-    use_gpu = input("⚙️  Use GPU encoder (NVENC HEVC) instead of CPU SVT-AV1 for this batch? (y/n): ").strip().lower().startswith('y')
-    if use_gpu:
-        print("\n➡ Using GPU: HEVC NVENC encoder for all files in batch.\n")
-    else:
-        print("\n➡ Using CPU: SVT-AV1 encoder for all files in batch.\n")
+    encoder = choose_encoder("👉 Encoder for this batch")
+    print(f"\n➡ Using {BACKENDS[encoder]['label']} for all files in batch.\n")
 
     print("🔄 Running benchmarks on sample file (this may take 30-60 seconds)...\n")
 
-    h1, s1 = estimate(sample_vid, "source", 6, 30, duration, use_gpu=use_gpu)
-    h2, s2 = estimate(sample_vid, "source", 8, 36, duration, use_gpu=use_gpu)
-    h3, s3 = estimate(sample_vid, "720", 8, 32, duration, use_gpu=use_gpu)
-    h4, s4 = estimate(sample_vid, "720", 10, 40, duration, use_gpu=use_gpu)
-    h5, s5 = estimate(sample_vid, "720", 8, 40, duration, use_gpu=use_gpu)
-    h6, s6 = estimate(sample_vid, "720", 6, 40, duration, use_gpu=use_gpu)
+    h1, s1 = estimate(sample_vid, "source", 6, 30, duration, encoder=encoder)
+    h2, s2 = estimate(sample_vid, "source", 8, 36, duration, encoder=encoder)
+    h3, s3 = estimate(sample_vid, "720", 8, 32, duration, encoder=encoder)
+    h4, s4 = estimate(sample_vid, "720", 10, 40, duration, encoder=encoder)
+    h5, s5 = estimate(sample_vid, "720", 8, 40, duration, encoder=encoder)
+    h6, s6 = estimate(sample_vid, "720", 6, 40, duration, encoder=encoder)
 
     print("\n" + "="*60)
     print("📋 CHOOSE YOUR PREFERRED ENCODING OPTION FOR THE BATCH:\n")
@@ -252,7 +247,7 @@ if len(files) > 1:
         print(f"\n[{i}/{len(files)}] Encoding: {input_file}")
         print(f"Output: {output_file}\n")
 
-        encode_file(input_file, output_file, chosen_settings, use_gpu=use_gpu)
+        encode_file(input_file, output_file, chosen_settings, encoder=encoder)
         print(f"✅ Complete\n")
 
     print(f"\n{'='*60}")
@@ -274,20 +269,17 @@ else:
     print(f"\n📊 Video Duration: {duration/60:.1f} minutes")
     print(f"📁 Input File: {input_vid}\n")
 
-    use_gpu = input("⚙️  Use GPU encoder (NVENC HEVC) instead of CPU SVT-AV1? (y/n): ").strip().lower().startswith('y')
-    if use_gpu:
-        print("\n➡ Using GPU: HEVC NVENC encoder (much faster, larger files).\n")
-    else:
-        print("\n➡ Using CPU: SVT-AV1 encoder (slower, higher efficiency).\n")
+    encoder = choose_encoder("👉 Encoder")
+    print(f"\n➡ Using {BACKENDS[encoder]['label']}.\n")
 
     print("🔄 Running benchmarks (this may take 30-60 seconds)...\n")
 
-    h1, s1 = estimate(input_vid, "source", 6, 30, duration, use_gpu=use_gpu)
-    h2, s2 = estimate(input_vid, "source", 8, 36, duration, use_gpu=use_gpu)
-    h3, s3 = estimate(input_vid, "720", 8, 32, duration, use_gpu=use_gpu)
-    h4, s4 = estimate(input_vid, "720", 10, 40, duration, use_gpu=use_gpu)
-    h5, s5 = estimate(input_vid, "720", 8, 40, duration, use_gpu=use_gpu)
-    h6, s6 = estimate(input_vid, "720", 6, 40, duration, use_gpu=use_gpu)
+    h1, s1 = estimate(input_vid, "source", 6, 30, duration, encoder=encoder)
+    h2, s2 = estimate(input_vid, "source", 8, 36, duration, encoder=encoder)
+    h3, s3 = estimate(input_vid, "720", 8, 32, duration, encoder=encoder)
+    h4, s4 = estimate(input_vid, "720", 10, 40, duration, encoder=encoder)
+    h5, s5 = estimate(input_vid, "720", 8, 40, duration, encoder=encoder)
+    h6, s6 = estimate(input_vid, "720", 6, 40, duration, encoder=encoder)
 
     print("\n" + "="*60)
     print("📋 CHOOSE YOUR PREFERRED ENCODING OPTION:\n")
@@ -329,7 +321,7 @@ else:
         print(f"\n▶️  Starting Final Conversion (Option {choice})...")
         print(f"   Encoding to {c['res']}p | Preset {c['p']} | CRF {c['crf']}\n")
 
-        encode_file(input_vid, output_vid, c, use_gpu=use_gpu)
+        encode_file(input_vid, output_vid, c, encoder=encoder)
         
         print(f"\n✅ Conversion complete!")
         print(f"📁 Output: {output_vid}")
@@ -0,0 +1,40 @@
+"""
+===================================
+ENCODER BACKENDS (shared helper)
+===================================
+encoder_backends.py
+
+Gives the standalone scripts (benchmark.py, encode_smart.py) the encoder
+table that lives in main_app.py, one folder up: codec names and how the
+SVT-AV1 preset/CRF scale maps onto each encoder.
+
+USAGE (from a script in this folder):
+  from encoder_backends import load_backends
+  BACKENDS, AVAILABLE = load_backends()
+"""
+
+import os
+import sys
+
+_LOADED = None
+
+
+def load_backends():
+    """
+    Return main_app's ENCODER_BACKENDS and the names this ffmpeg supports.
+
+    main_app is imported (and ffmpeg's encoder list probed) once per process.
+    It is imported with a CLI argv, since a bare command line makes it load
+    the Gooey GUI.
+    """
+    global _LOADED
+    if _LOADED is None:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        argv = sys.argv
+        sys.argv = [argv[0], "--cli"]
+        try:
+            import main_app
+        finally:
+            sys.argv = argv
+        _LOADED = (main_app.ENCODER_BACKENDS, main_app.available_encoders())
+    return _LOADED
@@ -0,0 +1,162 @@
+"""
+===================================
+CROSS-EPISODE SEGMENT LIBRARY
+===================================
+segment_library.py
+
+OP/ED animation and recaps repeat frame-for-frame across a season. A
+per-season library folder keeps every episode's frame hashes and, for each
+span found in more than one episode, one encoded closed-GOP segment. Later
+episodes splice that bitstream in instead of encoding the footage again
+(main_app's encode_with_segment_library).
+
+Layout: index.json, episode_<fingerprint>.npy, segment_<id>.npy/.mkv
+The folder may be shared by several workers or machines: index updates
+hold an O_EXCL lock file, and alignment and segment encodes run outside it.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from hash_alignment import DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN, align_hashes, hash_distances
+from job_queue import queue_server_time, queue_worker_name
+
+SEGMENT_MIN_SECONDS = 20         # Shortest span shared between episodes worth encoding once
+SEGMENT_LOCK_STALE_SECONDS = 300 # An index lock this old was left by a crashed worker
+SEGMENT_LOCK_HEARTBEAT_SECONDS = 30  # The holder refreshes the lock's mtime this often
+
+
+@contextmanager
+def segment_library_lock(library_dir):
+    """
+    Hold the library's index lock (index.lock, created with O_EXCL).
+    
+    Works across processes and machines sharing the folder. The holder
+    refreshes the lock's mtime from a heartbeat thread, so a lock older than
+    SEGMENT_LOCK_STALE_SECONDS (by the share's clock) was left by a crashed
+    worker and is broken. On release the lock is only removed if it still
+    carries this holder's token.
+    """
+    lock_file = os.path.join(library_dir, "index.lock")
+    token = f"{queue_worker_name()}:{threading.get_ident()}:{time.time()}"
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if queue_server_time(library_dir) - os.path.getmtime(lock_file) > SEGMENT_LOCK_STALE_SECONDS:
+                    print(f"⚠️  Breaking stale segment library lock {lock_file}")
+                    os.remove(lock_file)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.2)
+    stop = threading.Event()
+    
+    def beat():
+        while not stop.wait(SEGMENT_LOCK_HEARTBEAT_SECONDS):
+            try:
+                os.utime(lock_file)
+            except FileNotFoundError:
+                return
+    
+    try:
+        os.write(fd, token.encode())
+        os.close(fd)
+        threading.Thread(target=beat, daemon=True).start()
+        yield
+    finally:
+        stop.set()
+        try:
+            with open(lock_file, encoding="utf-8") as handle:
+                owned = handle.read() == token
+            if owned:
+                os.remove(lock_file)
+        except FileNotFoundError:
+            pass
+
+
+def save_library_array(path, values):
+    """np.save() through a partial file, so lock-free readers never see half an array."""
+    import numpy as np
+    
+    partial_path = f"{path}.{socket.gethostname()}-{os.getpid()}.partial"
+    with open(partial_path, "wb") as handle:
+        np.save(handle, values)
+    os.replace(partial_path, path)
+
+
+def load_segment_library(library_dir):
+    """Read a segment library index (empty if the folder is new)."""
+    try:
+        with open(os.path.join(library_dir, "index.json"), encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {"episodes": {}, "segments": {}}
+
+
+def segment_library_key(encoder, preset, crf, resolution, info):
+    """Encode settings a library segment must share with an episode to be spliced into it."""
+    return f"{encoder}:p{preset}:crf{crf}:{resolution}:{info['width']}x{info['height']}@{info['fps']:.3f}"
+
+
+def match_library_segments(hashes, library, library_dir, key):
+    """
+    Find where already-encoded library segments occur in an episode.
+    
+    A segment is only placed where every one of its frames matches the
+    episode within DIFF_FRAME_DISTANCE, so per-episode changes (a different
+    credit line, an episode title) keep that span out of the splice.
+    
+    Returns:
+        (placements [(first_frame, frame_count, segment_id)], covered bool mask)
+    """
+    import numpy as np
+    
+    placements = []
+    covered = np.zeros(len(hashes), dtype=bool)
+    for segment_id, segment in library["segments"].items():
+        if segment["key"] != key:
+            continue
+        segment_hashes = np.load(os.path.join(library_dir, f"segment_{segment_id}.npy"))
+        count = len(segment_hashes)
+        for new_start, _, old_start in align_hashes(segment_hashes, hashes, DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN):
+            first = new_start - old_start
+            if first < 0 or first + count > len(hashes) or covered[first:first + count].any():
+                continue
+            if hash_distances(segment_hashes, hashes[first:first + count]).max() <= DIFF_FRAME_DISTANCE:
+                placements.append((first, count, segment_id))
+                covered[first:first + count] = True
+    return placements, covered
+
+
+def find_shared_spans(hashes, fingerprint, library, library_dir, covered, min_frames):
+    """
+    Find spans of an episode that also occur in earlier episodes of the library.
+    
+    Returns:
+        Sorted, disjoint (first_frame, end_frame) spans outside `covered`
+    """
+    import numpy as np
+    
+    shared = np.zeros(len(hashes), dtype=bool)
+    for other in library["episodes"]:
+        if other == fingerprint:
+            continue
+        other_hashes = np.load(os.path.join(library_dir, f"episode_{other}.npy"))
+        for new_start, new_end, _ in align_hashes(other_hashes, hashes, DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN):
+            if new_end - new_start >= min_frames:
+                shared[new_start:new_end] = True
+    shared &= ~covered
+    
+    spans = []
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], shared.astype(np.int8), [0]))))
+    for first, end in zip(edges[::2], edges[1::2]):
+        if end - first >= min_frames:
+            spans.append((int(first), int(end)))
+    return spans
@@ -0,0 +1,33 @@
+"""
+===================================
+STORAGE HELPERS
+===================================
+storage.py
+
+Per-user cache folders and crash-safe JSON writes, shared by main_app.py
+and its job queue, scheduler and segment library modules.
+"""
+
+import json
+import os
+import socket
+import threading
+
+
+def get_cache_dir(name):
+    """Return (and create) a per-user cache directory for the given feature."""
+    if os.name == 'nt':
+        base = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "AnimeSubber", "cache")
+    else:
+        base = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "anime-subber")
+    path = os.path.join(base, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_json_atomic(path, data):
+    """Write JSON next to its destination, then rename it into place."""
+    tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
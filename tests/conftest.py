@@ -0,0 +1,33 @@
+"""
+Shared fixtures.
+
+The repository root is put on sys.path so tests import its modules
+directly. main_app starts the Gooey GUI when it is run without arguments,
+so it is imported with a CLI argv for in-process tests.
+"""
+import os
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+
+@pytest.fixture(scope="session")
+def main_app():
+    argv = sys.argv
+    sys.argv = ["main_app.py", "--cli"]
+    try:
+        import main_app
+    finally:
+        sys.argv = argv
+    return main_app
+
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    """Point the per-user cache folders (get_cache_dir) at a temporary directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "cache"))
+    return tmp_path / "cache"
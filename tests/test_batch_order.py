@@ -0,0 +1,32 @@
+"""
+Batch order checks (--batch-order makespan).
+
+order_for_makespan() dispatches the longest files first, each to the slot
+that frees up first, and predicts when the last slot finishes.
+"""
+
+
+def test_longest_files_start_first(main_app):
+    files = ["short.mkv", "film.mkv", "episode.mkv"]
+    ordered, makespan = main_app.order_for_makespan(files, [300, 7200, 1400], slots=1)
+    assert ordered == ["film.mkv", "episode.mkv", "short.mkv"]
+    assert makespan == 8900
+
+
+def test_short_files_fill_the_gaps_next_to_a_long_one(main_app):
+    files = ["film.mkv"] + [f"ep{i}.mkv" for i in range(6)]
+    costs = [6000] + [1000] * 6
+    ordered, makespan = main_app.order_for_makespan(files, costs, slots=2)
+    assert ordered[0] == "film.mkv"
+    assert makespan == 6000   # The six episodes run on the other slot while the film encodes
+
+
+def test_makespan_is_never_below_the_longest_file_or_the_average_load(main_app):
+    costs = [5, 9, 3, 7, 7, 2, 8, 4]
+    for slots in range(1, 10):
+        _, makespan = main_app.order_for_makespan(list(range(len(costs))), costs, slots)
+        assert max(max(costs), sum(costs) / slots) <= makespan <= sum(costs)
+
+
+def test_empty_batch(main_app):
+    assert main_app.order_for_makespan([], [], slots=4) == ([], 0.0)
@@ -0,0 +1,41 @@
+"""
+Crop checks (--detect-crop).
+
+_stable_crop() turns a detected picture area into an ffmpeg crop with a
+safety margin and even sizes; _parse_crop() reads cropdetect's log.
+"""
+
+
+def crop(main_app, left, top, right, bottom, size=(1920, 1080)):
+    return main_app._stable_crop({"source": list(size), "crop": None, "saved": 0.0, "filter": None},
+                                 left, top, right, bottom)
+
+
+def test_letterbox_is_cropped_with_a_safety_margin(main_app):
+    result = crop(main_app, 0, 138, 1920, 942)
+    margin = main_app.CROP_SAFETY_PIXELS
+    assert result["crop"] == [1920, 804 + 2 * margin, 0, 138 - margin]
+    assert result["filter"] == "crop=1920:812:0:134"
+    assert result["saved"] == round(1 - 812 / 1080, 4)
+
+
+def test_pillarbox_crop_is_even_and_keeps_the_whole_picture(main_app):
+    left, right = 241, 1679
+    width, height, x, y = crop(main_app, left, 0, right, 1080)["crop"]
+    assert width % 2 == height % 2 == x % 2 == y % 2 == 0
+    assert x <= left and x + width >= right
+    assert (width, height, y) == (1448, 1080, 0)
+
+
+def test_thin_bars_are_not_worth_a_crop(main_app):
+    result = crop(main_app, 0, 8, 1920, 1080)
+    assert result["crop"] is None and result["filter"] is None
+    assert 0 < result["saved"] < main_app.CROP_MIN_SAVING
+
+
+def test_parse_crop_reads_the_last_suggestion(main_app):
+    log = ("[Parsed_cropdetect_0] x1:0 x2:1919 y1:140 y2:939 w:1920 h:800 crop=1920:800:0:140\n"
+           "[Parsed_cropdetect_0] x1:0 x2:1919 y1:138 y2:941 w:1920 h:804 crop=1920:804:0:138\n")
+    assert main_app._parse_crop(log) == (1920, 804, 0, 138)
+    assert main_app._parse_crop("no bars here") is None
+    assert main_app._parse_crop("crop=1920:804") is None
@@ -0,0 +1,50 @@
+"""
+Deadline planner checks (--deadline).
+
+plan_presets() with the built-in speeds (an empty per-machine history) and
+with a measured encode speed; parse_deadline() for clock and ISO times.
+"""
+from datetime import datetime
+
+DURATIONS = [2400, 1200]
+
+
+def plan(main_app, seconds_left, **kwargs):
+    return main_app.plan_presets(DURATIONS, seconds_left, "1080", "cpu", 4, include_transcription=False,
+                                 **kwargs)
+
+
+def test_every_file_keeps_the_best_preset_when_time_allows(main_app, cache_home):
+    presets, projected = main_app.plan_presets([1200] * 3, 10 ** 6, "1080", "cuda", 4)
+    assert presets == [4, 4, 4]
+    assert projected < 10 ** 6
+
+
+def test_a_tight_deadline_speeds_up_the_longest_file_first(main_app, cache_home):
+    # At the default 1.5x realtime (preset 8) the batch takes exactly 2400 s
+    assert plan(main_app, 2400) == ([8, 8], 2400.0)
+    presets, projected = plan(main_app, 2300)
+    assert projected <= 2300
+    assert presets[0] >= presets[1] and presets[0] - presets[1] <= 1
+
+
+def test_an_impossible_deadline_falls_back_to_the_fastest_preset(main_app, cache_home):
+    presets, projected = plan(main_app, 10)
+    assert presets == [main_app.PLANNER_FASTEST_PRESET] * 2
+    assert projected > 10
+
+
+def test_measured_speeds_and_parallel_slots_allow_slower_presets(main_app, cache_home):
+    two_slots = plan(main_app, 2400, slots=2)
+    assert two_slots == ([6, 5], 2230.8)
+
+    # Twice the default speed, measured on this machine, has the same effect
+    main_app.record_stage_speed(main_app.encode_stage_key("1080", 8), 3000, 1000)
+    assert plan(main_app, 2400) == two_slots
+
+
+def test_parse_deadline(main_app):
+    now = datetime(2026, 2, 6, 22, 30).timestamp()
+    assert main_app.parse_deadline("07:00", now) == datetime(2026, 2, 7, 7, 0).timestamp()
+    assert main_app.parse_deadline("23:15", now) == datetime(2026, 2, 6, 23, 15).timestamp()
+    assert main_app.parse_deadline("2026-02-08 06:00", now) == datetime(2026, 2, 8, 6, 0).timestamp()
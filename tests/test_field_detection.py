@@ -0,0 +1,39 @@
+"""
+Field type checks (--detect-telecine).
+
+_classify_fields() turns the share of combed frames and of repeated fields
+measured by idet into a field type and the filter that undoes it.
+"""
+NTSC = 30000 / 1001
+
+
+def test_clean_sources_are_progressive(main_app):
+    result = main_app._classify_fields(0.01, 0.4, NTSC)
+    assert result == {"type": "progressive", "combed": 0.01, "repeated": 0.4, "filter": None}
+
+
+def test_pulldown_at_ntsc_rates_is_telecined(main_app):
+    for fps in (NTSC, 30.0):
+        result = main_app._classify_fields(0.4, 0.38, fps)
+        assert result["type"] == "telecined"
+        assert result["filter"] == main_app.TELECINE_FILTER
+
+
+def test_partly_combed_ntsc_without_repeats_is_treated_as_telecine(main_app):
+    # Hybrid or badly cut pulldown: combing without the repeated-field pattern
+    assert main_app._classify_fields(0.3, 0.0, NTSC)["type"] == "telecined"
+
+
+def test_fully_combed_sources_are_interlaced(main_app):
+    result = main_app._classify_fields(0.9, 0.02, NTSC)
+    assert result["type"] == "interlaced"
+    assert result["filter"] == main_app.DEINTERLACE_FILTER
+
+
+def test_telecine_is_only_considered_at_ntsc_rates(main_app):
+    assert main_app._classify_fields(0.4, 0.38, 25.0)["type"] == "interlaced"
+    assert main_app._classify_fields(0.4, 0.38, 24000 / 1001)["type"] == "interlaced"
+
+
+def test_unknown_frame_rate_allows_telecine(main_app):
+    assert main_app._classify_fields(0.4, 0.38, None)["type"] == "telecined"
@@ -0,0 +1,98 @@
+"""
+Follow-mode check (--follow): a file that is still being written.
+
+A background ffmpeg writes live Matroska in real time (-re) while
+process_single_file() encodes and transcribes it with follow enabled, in a
+child process with a stub Whisper model. Both stages must read everything
+the writer produced and finish within the idle timeout (plus slack) of the
+writer stopping.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WRITE_SECONDS = 12
+FPS = 24
+FOLLOW_IDLE_SECONDS = 2
+WINDOW_SECONDS = 4
+FINISH_SLACK_SECONDS = 20   # Encode tail + mux on a slow single-core box
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+
+CHILD = textwrap.dedent("""
+    import json, sys, time
+    sys.argv = ["main_app.py", "--cli"]
+    sys.path.insert(0, {repo!r})
+    import main_app
+
+    class Segment:
+        def __init__(self, start):
+            self.start, self.end, self.text = start, start + 1.0, "line"
+            self.avg_logprob, self.compression_ratio, self.no_speech_prob = -0.1, 1.0, 0.0
+
+    class StubModel:
+        def transcribe(self, audio, **kwargs):
+            return [Segment(0.0)], None
+
+    main_app._WHISPER_MODELS[("small", "cpu", "int8", 0, 1)] = StubModel()
+    available = main_app.available_encoders()
+    encoder = next(name for name in ("svtav1", "x265", "aom") if name in available)
+    output = main_app.process_single_file(
+        {source!r}, "cpu", "source", 12, output_dir={out_dir!r}, encoder=encoder,
+        transcribe_settings={{"window_seconds": {window}}}, follow={idle}
+    )
+    print(json.dumps({{"output": output, "finished": time.time()}}))
+""")
+
+
+def count_frames(path):
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-i", path, "-map", "0:v:0",
+                             "-f", "null", "-"], capture_output=True, text=True)
+    return int(result.stderr.rsplit("frame=", 1)[1].split()[0])
+
+
+def test_follow_mode_finishes_after_writer_stops(tmp_path):
+    source = str(tmp_path / "growing.mkv")
+    writer = subprocess.Popen([
+        "ffmpeg", "-v", "error", "-y", "-re",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate={FPS}:duration={WRITE_SECONDS}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=16000:duration={WRITE_SECONDS}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(FPS), "-c:a", "aac",
+        "-flush_packets", "1", "-f", "matroska", "-live", "1", source
+    ])
+    try:
+        deadline = time.time() + 10
+        while not (os.path.exists(source) and os.path.getsize(source) > 0):
+            assert time.time() < deadline, "writer produced nothing"
+            time.sleep(0.1)
+
+        code = CHILD.format(repo=REPO, source=source, out_dir=str(tmp_path / "out"),
+                            window=WINDOW_SECONDS, idle=FOLLOW_IDLE_SECONDS)
+        child = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE, text=True)
+        assert writer.wait(timeout=WRITE_SECONDS * 5) == 0
+        writer_done = time.time()
+        stdout, stderr = child.communicate(timeout=300)
+    finally:
+        writer.kill()
+
+    assert child.returncode == 0, stderr
+    report = json.loads(stdout.strip().splitlines()[-1])
+    assert report["finished"] - writer_done < FOLLOW_IDLE_SECONDS + FINISH_SLACK_SECONDS
+
+    # The encode saw the whole file, not just what existed when it started
+    assert report["output"].endswith("_final.mkv")
+    assert count_frames(report["output"]) >= (WRITE_SECONDS - 1) * FPS
+
+    # So did the transcription: one stub cue per window
+    srt = str(tmp_path / "growing.srt")
+    with open(srt, encoding="utf-8") as f:
+        cues = f.read().count("-->")
+    assert cues >= WRITE_SECONDS // WINDOW_SECONDS - 1
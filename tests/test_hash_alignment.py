@@ -0,0 +1,89 @@
+"""
+Hash alignment checks (--previous-release, --segment-library).
+
+align_hashes() on synthetic 64-bit frame hashes: edits, re-encode noise and
+runs of black frames. plan_video_splice() on hand-made runs and keyframes.
+"""
+import random
+
+import numpy as np
+
+from hash_alignment import (
+    DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN, DIFF_MIN_COPY_FRAMES, align_hashes, hash_distances,
+    plan_video_splice,
+)
+
+
+def frames(count, seed):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
+
+
+def noisy(hashes, bits, seed):
+    rng = random.Random(seed)
+    return [value ^ sum(1 << b for b in rng.sample(range(64), bits)) for value in hashes]
+
+
+def align(old, new):
+    return align_hashes(old, new, DIFF_FRAME_DISTANCE, DIFF_FRAME_MIN_RUN)
+
+
+def test_identical_sequences_are_one_run():
+    old = frames(500, 1)
+    assert align(old, old) == [(0, 500, 0)]
+
+
+def test_re_encode_noise_is_tolerated():
+    old = frames(500, 1)
+    assert align(old, noisy(old, DIFF_FRAME_DISTANCE, 2)) == [(0, 500, 0)]
+
+
+def test_inserted_and_replaced_scenes_split_the_runs():
+    old = frames(600, 1)
+    new = old[:200] + frames(50, 2) + old[200:400] + frames(30, 3) + old[430:]
+    assert align(old, new) == [(0, 200, 0), (250, 450, 200), (480, 650, 430)]
+
+
+def test_nothing_matches_unrelated_content():
+    assert align(frames(300, 1), frames(300, 2)) == []
+
+
+def test_black_frames_in_front_of_a_match_join_the_run():
+    black = [0] * 30
+    old = frames(100, 1) + black + frames(100, 2)
+    new = frames(20, 3) + black + frames(100, 2)
+    assert align(old, new) == [(20, 150, 100)]
+
+
+def test_all_black_sequences_align_in_place():
+    assert align([0] * 50, [0] * 50) == [(0, 50, 0)]
+
+
+def test_hash_distances_counts_differing_bits():
+    a = np.array([0, 0b1011, 2 ** 64 - 1], dtype=np.uint64)
+    b = np.array([0, 0b0001, 0], dtype=np.uint64)
+    assert hash_distances(a, b).tolist() == [0, 2, 64]
+
+
+def test_splice_copies_between_keyframes_and_encodes_the_rest():
+    keyframes = [(i, f"{i / 24:.6f}") for i in range(0, 500, 100)]
+    runs = [(0, 200, 0), (260, 560, 200)]
+    assert plan_video_splice(runs, keyframes, new_frames=560, old_frames=500) == [
+        ("copy", 0, 200), ("encode", 200, 60), ("copy", 200, 300),
+    ]
+
+
+def test_splice_encodes_up_to_the_first_keyframe_of_a_run():
+    keyframes = [(i, str(i)) for i in range(0, 400, 100)]
+    assert plan_video_splice([(0, 300, 50)], keyframes, new_frames=300, old_frames=400) == [
+        ("encode", 0, 50), ("copy", 100, 200), ("encode", 250, 50),
+    ]
+
+
+def test_splice_encodes_runs_too_short_to_copy():
+    step = DIFF_MIN_COPY_FRAMES // 2
+    keyframes = [(i, str(i)) for i in range(0, 10 * step, step)]
+    runs = [(0, 2 * step - 1, 0)]   # Holds one keyframe interval, shorter than DIFF_MIN_COPY_FRAMES
+    assert plan_video_splice(runs, keyframes, new_frames=10 * step, old_frames=10 * step) == [
+        ("encode", 0, 10 * step),
+    ]
@@ -0,0 +1,182 @@
+"""
+Job queue checks (--distributed, --watch-folder).
+
+Several queue_worker_loop() processes share one queue folder on this
+machine, as nodes would share it over the network, with a stub stage in
+place of the pipeline. Every job must be finished exactly once, and a job
+whose worker died (an expired lease) must be reclaimed by the others.
+The remaining tests drive claims, reclaims and finishes in-process.
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import job_queue
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS = 9
+WORKERS = 3
+STAGE_SECONDS = 0.3
+
+CHILD = textwrap.dedent("""
+    import os, sys, threading, time
+    sys.path.insert(0, {repo!r})
+    import job_queue
+    job_queue.QUEUE_POLL_SECONDS = 0.2
+
+    def process(path):
+        with open({log!r}, "a", encoding="utf-8") as log:
+            log.write(os.path.basename(path) + "\\n")
+        time.sleep({stage})
+        return path + ".out"
+
+    print(job_queue.queue_worker_loop({queue!r}, [{root!r}], process, threading.Event(), {worker},
+                                      exit_when_empty=True))
+""")
+
+
+def make_inputs(root, count):
+    root.mkdir()
+    paths = []
+    for i in range(count):
+        path = root / f"episode_{i:02d}.mkv"
+        path.write_bytes(b"x" * (i + 1))
+        paths.append(str(path))
+    return paths
+
+
+def read_jobs(queue_dir, state):
+    folder = os.path.join(queue_dir, state)
+    jobs = []
+    for name in os.listdir(folder):
+        assert name.endswith(".json"), name   # No stray partial or claim files
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            jobs.append(json.load(f))
+    return jobs
+
+
+def expire_lease(queue_dir, job):
+    past = time.time() - 10 * job_queue.QUEUE_LEASE_SECONDS
+    os.utime(os.path.join(queue_dir, "running", f"{job['id']}.json"), (past, past))
+
+
+def test_workers_finish_every_job_once_and_reclaim_expired_leases(tmp_path):
+    root, queue_dir, log = tmp_path / "library", str(tmp_path / "queue"), str(tmp_path / "stages.log")
+    paths = make_inputs(root, JOBS)
+    job_queue.queue_open(queue_dir)
+    assert all(job_queue.queue_enqueue(queue_dir, path, str(root)) for path in paths)
+    assert not any(job_queue.queue_enqueue(queue_dir, path, str(root)) for path in paths)
+
+    # A worker that claimed a job and died: its lease is never renewed
+    dead = job_queue.queue_claim(queue_dir)
+    expire_lease(queue_dir, dead)
+
+    workers = [
+        subprocess.Popen([sys.executable, "-c", CHILD.format(repo=REPO, log=log, stage=STAGE_SECONDS,
+                                                             queue=queue_dir, root=str(root), worker=i + 1)],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for i in range(WORKERS)
+    ]
+    completed = 0
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr
+        completed += int(stdout.strip().splitlines()[-1])
+
+    assert completed == JOBS
+    with open(log, encoding="utf-8") as f:
+        stages = sorted(f.read().split())
+    assert stages == sorted(os.path.basename(path) for path in paths)
+
+    done = {job["id"]: job for job in read_jobs(queue_dir, "done")}
+    assert len(done) == JOBS
+    assert done[dead["id"]]["attempts"] == 2
+    assert done[dead["id"]]["lease"] != dead["lease"]
+    assert not any(read_jobs(queue_dir, state) for state in ("pending", "running", "failed"))
+
+
+def test_finish_is_dropped_after_the_job_was_reclaimed(tmp_path):
+    root, queue_dir = tmp_path / "library", str(tmp_path / "queue")
+    path, = make_inputs(root, 1)
+    job_queue.queue_open(queue_dir)
+    job_queue.queue_enqueue(queue_dir, path, str(root))
+
+    first = job_queue.queue_claim(queue_dir)
+    expire_lease(queue_dir, first)
+    assert job_queue.queue_reclaim_expired(queue_dir) == 1
+    second = job_queue.queue_claim(queue_dir)
+    assert second["id"] == first["id"] and second["lease"] != first["lease"]
+
+    # The stale worker may not overwrite the new owner's job
+    assert not job_queue.queue_finish(queue_dir, first, False, error="stale")
+    assert [job["lease"] for job in read_jobs(queue_dir, "running")] == [second["lease"]]
+    assert job_queue.queue_holds_lease(queue_dir, second)
+
+    assert job_queue.queue_finish(queue_dir, second, True, output="out.mkv")
+    done, = read_jobs(queue_dir, "done")
+    assert done["lease"] == second["lease"] and done["output"] == "out.mkv"
+    assert not read_jobs(queue_dir, "failed")
+
+
+def test_reclaimed_job_is_finished_by_its_worker_until_claimed_again(tmp_path):
+    root, queue_dir = tmp_path / "library", str(tmp_path / "queue")
+    path, = make_inputs(root, 1)
+    job_queue.queue_open(queue_dir)
+    job_queue.queue_enqueue(queue_dir, path, str(root))
+
+    job = job_queue.queue_claim(queue_dir)
+    expire_lease(queue_dir, job)
+    job_queue.queue_reclaim_expired(queue_dir)
+
+    assert job_queue.queue_finish(queue_dir, job, True, output="out.mkv")
+    assert job_queue.queue_claim(queue_dir) is None
+    assert [j["id"] for j in read_jobs(queue_dir, "done")] == [job["id"]]
+
+
+def test_claim_takes_the_oldest_pending_job(tmp_path):
+    root, queue_dir = tmp_path / "library", str(tmp_path / "queue")
+    paths = make_inputs(root, 3)
+    job_queue.queue_open(queue_dir)
+    for age, path in zip((10, 30, 20), paths):
+        job_queue.queue_enqueue(queue_dir, path, str(root))
+        job_id = job_queue.queue_job_id(os.path.basename(path), path)
+        past = time.time() - age
+        os.utime(os.path.join(queue_dir, "pending", f"{job_id}.json"), (past, past))
+
+    claimed = [job_queue.queue_claim(queue_dir)["rel_path"] for _ in paths]
+    assert claimed == ["episode_01.mkv", "episode_02.mkv", "episode_00.mkv"]
+    assert job_queue.queue_claim(queue_dir) is None
+    assert job_queue.queue_counts(queue_dir) == {"pending": 0, "running": 3, "done": 0, "failed": 0}
+
+
+def test_reclaim_only_takes_back_expired_leases(tmp_path):
+    root, queue_dir = tmp_path / "library", str(tmp_path / "queue")
+    for path in make_inputs(root, 2):
+        job_queue.queue_enqueue(job_queue.queue_open(queue_dir), path, str(root))
+    stale, fresh = job_queue.queue_claim(queue_dir), job_queue.queue_claim(queue_dir)
+    expire_lease(queue_dir, stale)
+
+    assert job_queue.queue_reclaim_expired(queue_dir) == 1
+    assert job_queue.queue_holds_lease(queue_dir, fresh)
+    assert not job_queue.queue_holds_lease(queue_dir, stale)
+    assert [job["id"] for job in read_jobs(queue_dir, "pending")] == [stale["id"]]
+
+
+def test_jobs_resolve_under_each_nodes_own_mount(tmp_path):
+    share, mount = tmp_path / "share", tmp_path / "mnt"
+    (share / "season").mkdir(parents=True)
+    (mount / "season").mkdir(parents=True)
+    path = share / "season" / "ep1.mkv"
+    path.write_bytes(b"x")
+    (mount / "season" / "ep1.mkv").write_bytes(b"x")
+    queue_dir = job_queue.queue_open(str(tmp_path / "queue"))
+    job_queue.queue_enqueue(queue_dir, str(path), str(share))
+
+    job = job_queue.queue_claim(queue_dir)
+    assert job["rel_path"] == "season/ep1.mkv"
+    assert job_queue.resolve_job_path(job, [str(tmp_path / "missing"), str(mount)]) == \
+        os.path.join(str(mount), "season", "ep1.mkv")
+    assert job_queue.resolve_job_path(job, [str(tmp_path / "missing")]) is None
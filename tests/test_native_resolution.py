@@ -0,0 +1,56 @@
+"""
+Native-resolution checks (--native-resolution).
+
+detect_native_resolution() on synthetic 1080-line luma frames in place of
+decoded samples: line art drawn at a lower height and upscaled with each
+production kernel, drawn at 1080 directly, and blank frames.
+"""
+import numpy as np
+import pytest
+
+SOURCE_HEIGHT = 1080
+WIDTH = 640
+SAMPLES = 4
+
+
+def drawing(rng, rows):
+    """Smooth random shading (a random walk down each column), like drawn and graded footage."""
+    walk = np.cumsum(rng.normal(0, 1, (rows, WIDTH)), axis=0)
+    walk -= walk.min(axis=0)
+    walk /= walk.max(axis=0)
+    return walk * 200 + 20
+
+
+def to_frame(values):
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def use_frames(main_app, monkeypatch, frames):
+    monkeypatch.setattr(main_app, "extract_sample_frames", lambda input_file: frames)
+
+
+@pytest.mark.parametrize("native, kernel", [(720, "bicubic"), (810, "bilinear"), (900, "bicubic")])
+def test_upscaled_sources_report_their_native_height(main_app, monkeypatch, native, kernel):
+    rng = np.random.default_rng(native)
+    upscale = main_app._upscale_matrix(native, SOURCE_HEIGHT, main_app.NATIVE_KERNELS[kernel])
+    use_frames(main_app, monkeypatch, [to_frame(upscale @ drawing(rng, native)) for _ in range(SAMPLES)])
+
+    result = main_app.detect_native_resolution("episode.mkv")
+    assert (result["source"], result["height"], result["kernel"]) == (SOURCE_HEIGHT, native, kernel)
+    assert result["ratio"] <= main_app.NATIVE_MAX_ERROR_RATIO
+
+
+def test_sources_drawn_at_full_height_look_native(main_app, monkeypatch):
+    rng = np.random.default_rng(0)
+    use_frames(main_app, monkeypatch, [to_frame(drawing(rng, SOURCE_HEIGHT)) for _ in range(SAMPLES)])
+
+    result = main_app.detect_native_resolution("episode.mkv")
+    assert result["source"] == SOURCE_HEIGHT
+    assert result["height"] is None and result["kernel"] is None
+
+
+def test_blank_frames_are_not_analysed(main_app, monkeypatch):
+    use_frames(main_app, monkeypatch, [np.full((SOURCE_HEIGHT, WIDTH), 16, dtype=np.uint8)])
+
+    result = main_app.detect_native_resolution("episode.mkv")
+    assert result["frames"] == 0 and result["height"] is None
@@ -0,0 +1,24 @@
+"""
+Rendition list checks (--renditions).
+"""
+import pytest
+
+
+def test_parse_renditions(main_app):
+    assert main_app.parse_renditions("1080:6:30, 720:10:34,source:4") == [
+        {"resolution": "1080", "preset": 6, "crf": 30},
+        {"resolution": "720", "preset": 10, "crf": 34},
+        {"resolution": "source", "preset": 4, "crf": 30},
+    ]
+
+
+@pytest.mark.parametrize("text", ["1080", "1080:6:30:1", "hd:6", "1080:fast", "720:8,1080:6,720:10"])
+def test_invalid_rendition_lists_are_rejected(main_app, text):
+    with pytest.raises(ValueError):
+        main_app.parse_renditions(text)
+
+
+def test_rendition_suffix(main_app):
+    assert [main_app.rendition_suffix(r) for r in main_app.parse_renditions("720:8,source:4")] == [
+        "_720p", "_source",
+    ]
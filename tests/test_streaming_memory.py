@@ -0,0 +1,86 @@
+"""
+Peak-memory check for the streaming audio path (--stream-audio).
+
+An hour of synthetic audio is decoded through iter_pcm_windows() and through
+transcribe_streaming() with a stub Whisper model, each in a fresh Python
+process so the measured peak RSS is only the pipeline's own.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+resource = pytest.importorskip("resource")
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DURATION_SECONDS = 3600
+RSS_BOUND_MB = 64        # A full decode of the hour would hold ~230 MB of float32
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+
+CHILD = textwrap.dedent("""
+    import json, resource, sys
+    sys.argv = ["main_app.py", "--cli"]
+    sys.path.insert(0, {repo!r})
+    import numpy
+    import main_app
+
+    class Segment:
+        def __init__(self, start):
+            self.start, self.end, self.text = start, start + 1.0, "line"
+            self.avg_logprob, self.compression_ratio, self.no_speech_prob = -0.1, 1.0, 0.0
+
+    class StubModel:
+        def transcribe(self, audio, **kwargs):
+            return [Segment(0.0)], None
+
+    def peak_mb():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    baseline = peak_mb()
+    if {mode!r} == "windows":
+        samples = sum(len(audio) for _, audio in main_app.iter_pcm_windows({audio!r}))
+        result = samples / main_app.PCM_SAMPLE_RATE
+    else:
+        main_app._WHISPER_MODELS[("small", "cpu", "int8", 0, 1)] = StubModel()
+        result = main_app.transcribe_streaming({audio!r}, {srt!r}, device="cpu")
+    print(json.dumps({{"result": result, "growth_mb": peak_mb() - baseline}}))
+""")
+
+
+@pytest.fixture(scope="module")
+def long_audio(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("stream") / "long.flac")
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y", "-f", "lavfi",
+        "-i", f"sine=frequency=440:sample_rate=16000:duration={DURATION_SECONDS}",
+        "-ac", "1", "-c:a", "flac", path
+    ], check=True)
+    return path
+
+
+def run_child(mode, audio, srt=""):
+    code = CHILD.format(repo=REPO, mode=mode, audio=audio, srt=srt)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_pcm_windows_memory_is_flat(long_audio):
+    report = run_child("windows", long_audio)
+    assert report["result"] == pytest.approx(DURATION_SECONDS, abs=1)
+    assert report["growth_mb"] < RSS_BOUND_MB
+
+
+def test_streaming_transcription_memory_is_flat(long_audio, tmp_path):
+    srt = str(tmp_path / "long.srt")
+    report = run_child("transcribe", long_audio, srt)
+    windows = -(-DURATION_SECONDS // 120)
+    assert report["result"] >= windows - 1   # One stub cue per window
+    assert report["growth_mb"] < RSS_BOUND_MB
+    assert os.path.getsize(srt) > 0